@@ -1,29 +1,40 @@
+import json
 from datetime import datetime
+from typing import Optional
 
 from app.db import get_session
 from app.models import Conversation, ConversationMessage
 from app.schemas import (
+    BranchComparison,
     BranchCreate,
     ConversationCreate,
     ConversationDetailResponse,
     ConversationMessageCreate,
+    ConversationPage,
     MessageCreateResult,
+    PathSiblingsResponse,
 )
 from app.services.conversation_service import (
-    build_message_path,
-    create_message_with_assistant,
+    acreate_message_with_assistant,
+    aregenerate_message,
+    load_path_window,
+    stream_message_with_assistant,
     to_path_view,
 )
-from app.services.conversation_service import (
-    regenerate_message as regenerate_message_service,
-)
-from app.services.openai_runner import OpenAIRunner
+from app.services.message_tree import lowest_common_ancestor, sibling_positions
+from app.services.openai_runner import OpenAIRunner, get_runner
+from app.services.pagination import DEFAULT_PAGE_SIZE, paginate
 from fastapi import Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
 
 
-def list_conversations(session: Session = Depends(get_session)) -> list[Conversation]:
-    return session.exec(select(Conversation).order_by(Conversation.updated_at.desc())).all()
+def list_conversations(
+    session: Session = Depends(get_session), limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None
+) -> ConversationPage:
+    statement = select(Conversation).order_by(Conversation.updated_at.desc())
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return ConversationPage(items=items, next_cursor=next_cursor)
 
 
 def create_conversation(payload: ConversationCreate, session: Session = Depends(get_session)) -> Conversation:
@@ -34,54 +45,120 @@ def create_conversation(payload: ConversationCreate, session: Session = Depends(
     return conversation
 
 
-def get_conversation(conversation_id: str, session: Session = Depends(get_session)) -> ConversationDetailResponse:
+def _selected_path_window(
+    session: Session, conversation_id: str, *, limit: int, before: Optional[str], after: Optional[str]
+) -> tuple[Conversation, list[ConversationMessage], Optional[str], Optional[str]]:
     conversation = session.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="conversation not found")
-    messages = session.exec(
-        select(ConversationMessage).where(ConversationMessage.conversation_id == conversation_id)
-    ).all()
-    selected_path: list[ConversationMessage] = []
+    leaf = None
     if conversation.selected_leaf_message_id:
-        selected_path = build_message_path(
-            {message.id: message for message in messages}, conversation.selected_leaf_message_id
-        )
+        leaf = session.get(ConversationMessage, conversation.selected_leaf_message_id)
+    if not leaf:
+        return conversation, [], None, None
+    return conversation, *load_path_window(session, leaf, limit=limit, before=before, after=after)
+
+
+def get_conversation(
+    conversation_id: str,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+) -> ConversationDetailResponse:
+    conversation, window, before_cursor, after_cursor = _selected_path_window(
+        session, conversation_id, limit=limit, before=before, after=after
+    )
     return ConversationDetailResponse(
         id=conversation.id,
         title=conversation.title,
         selected_leaf_message_id=conversation.selected_leaf_message_id,
-        selected_path_messages=[to_path_view(message) for message in selected_path],
+        selected_path_messages=[to_path_view(session, message) for message in window],
+        before_cursor=before_cursor,
+        after_cursor=after_cursor,
     )
 
 
-def create_conversation_message(
-    conversation_id: str, payload: ConversationMessageCreate, session: Session = Depends(get_session)
+def get_path_siblings(
+    conversation_id: str,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+) -> PathSiblingsResponse:
+    conversation, window, before_cursor, after_cursor = _selected_path_window(
+        session, conversation_id, limit=limit, before=before, after=after
+    )
+    return PathSiblingsResponse(
+        conversation_id=conversation.id,
+        items=sibling_positions(session, window),
+        before_cursor=before_cursor,
+        after_cursor=after_cursor,
+    )
+
+
+async def create_conversation_message(
+    conversation_id: str,
+    payload: ConversationMessageCreate,
+    session: Session = Depends(get_session),
+    runner: OpenAIRunner = Depends(get_runner),
 ) -> MessageCreateResult:
-    return create_message_with_assistant(
+    return await acreate_message_with_assistant(
+        session,
+        conversation_id=conversation_id,
+        text=payload.text,
+        parent_message_id=payload.parent_message_id,
+        runner=runner,
+    )
+
+
+def stream_conversation_message(
+    conversation_id: str,
+    payload: ConversationMessageCreate,
+    session: Session = Depends(get_session),
+    runner: OpenAIRunner = Depends(get_runner),
+) -> StreamingResponse:
+    created, events = stream_message_with_assistant(
         session,
         conversation_id=conversation_id,
         text=payload.text,
         parent_message_id=payload.parent_message_id,
-        runner=OpenAIRunner(),
+        runner=runner,
     )
 
+    def event_stream():
+        try:
+            yield f"event: created\ndata: {json.dumps(created.model_dump())}\n\n"
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            # Finalizes the turn as cancelled when the client leaves before the stream is done.
+            events.close()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
-def regenerate_message(message_id: str, session: Session = Depends(get_session)) -> ConversationMessage:
-    return regenerate_message_service(session, message_id, OpenAIRunner())
 
+async def regenerate_message(
+    message_id: str, session: Session = Depends(get_session), runner: OpenAIRunner = Depends(get_runner)
+) -> ConversationMessage:
+    return await aregenerate_message(session, message_id, runner)
 
-def branch_from_message(
-    message_id: str, payload: BranchCreate, session: Session = Depends(get_session)
+
+async def branch_from_message(
+    message_id: str,
+    payload: BranchCreate,
+    session: Session = Depends(get_session),
+    runner: OpenAIRunner = Depends(get_runner),
 ) -> MessageCreateResult:
     target_message = session.get(ConversationMessage, message_id)
     if not target_message:
         raise HTTPException(status_code=404, detail="message not found")
-    created = create_message_with_assistant(
+    created = await acreate_message_with_assistant(
         session,
         conversation_id=target_message.conversation_id,
         text=payload.text,
         parent_message_id=target_message.id,
-        runner=OpenAIRunner(),
+        runner=runner,
     )
     conversation = session.get(Conversation, target_message.conversation_id)
     if conversation:
@@ -91,12 +168,36 @@ def branch_from_message(
     return created
 
 
+def compare_branches(
+    message_id: str, other_message_id: str, session: Session = Depends(get_session)
+) -> BranchComparison:
+    message = session.get(ConversationMessage, message_id)
+    other = session.get(ConversationMessage, other_message_id)
+    if not message or not other:
+        raise HTTPException(status_code=404, detail="message not found")
+    common = lowest_common_ancestor(session, message, other)
+    if not common:
+        raise HTTPException(status_code=400, detail="messages do not share a conversation tree")
+    return BranchComparison(
+        message_id=message.id,
+        other_message_id=other.id,
+        common_ancestor_id=common.id,
+        message_is_ancestor=common.id == message.id,
+        other_is_ancestor=common.id == other.id,
+        message_distance=message.depth - common.depth,
+        other_distance=other.depth - common.depth,
+    )
+
+
 def register_routes(app):
-    app.get("/api/conversations", response_model=list[Conversation])(list_conversations)
+    app.get("/api/conversations", response_model=ConversationPage)(list_conversations)
     app.post("/api/conversations", response_model=Conversation)(create_conversation)
     app.get("/api/conversations/{conversation_id}", response_model=ConversationDetailResponse)(get_conversation)
+    app.get("/api/conversations/{conversation_id}/siblings", response_model=PathSiblingsResponse)(get_path_siblings)
     app.post("/api/conversations/{conversation_id}/messages", response_model=MessageCreateResult)(
         create_conversation_message
     )
+    app.post("/api/conversations/{conversation_id}/messages/stream")(stream_conversation_message)
     app.post("/api/messages/{message_id}/regenerate", response_model=ConversationMessage)(regenerate_message)
     app.post("/api/messages/{message_id}/branch", response_model=MessageCreateResult)(branch_from_message)
+    app.get("/api/messages/{message_id}/compare/{other_message_id}", response_model=BranchComparison)(compare_branches)
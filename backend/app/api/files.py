@@ -1,12 +1,18 @@
 from datetime import datetime
+from typing import Optional
 from uuid import uuid4
 
 from app.db import get_session
 from app.models import Conversation, ConversationRun, FileRecord, FileSummary
-from app.schemas import FileRegisterCreate, FileView, RightPanelResponse, UploadUrlCreate
-from app.services.file_service import get_or_create_binding
-from app.services.file_service import summarize_file as summarize_file_service
-from app.services.openai_runner import OpenAIRunner
+from app.schemas import FileRegisterCreate, FileView, FileViewPage, RightPanelResponse, UploadUrlCreate
+from app.services.file_service import (
+    FILE_SUMMARY_PRECOMPUTE,
+    asummarize_file,
+    get_or_create_binding,
+    schedule_summary_precompute,
+)
+from app.services.openai_runner import OpenAIRunner, get_runner
+from app.services.pagination import DEFAULT_PAGE_SIZE, paginate
 from fastapi import Depends, HTTPException
 from sqlmodel import Session, select
 
@@ -16,7 +22,11 @@ def create_upload_url(payload: UploadUrlCreate):
     return {"storage_backend": "local", "storage_key": key, "upload_method": "direct_register"}
 
 
-def register_file(payload: FileRegisterCreate, session: Session = Depends(get_session)) -> FileRecord:
+def register_file(
+    payload: FileRegisterCreate,
+    session: Session = Depends(get_session),
+    runner: OpenAIRunner = Depends(get_runner),
+) -> FileRecord:
     conversation = session.get(Conversation, payload.conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="conversation not found")
@@ -27,16 +37,27 @@ def register_file(payload: FileRegisterCreate, session: Session = Depends(get_se
         storage_key=payload.storage_key,
         mime_type=payload.mime_type,
         size_bytes=payload.size_bytes,
+        content_sha256=payload.content_sha256,
     )
     session.add(file_record)
     session.commit()
     session.refresh(file_record)
     get_or_create_binding(session, payload.conversation_id, file_record.id)
+    if FILE_SUMMARY_PRECOMPUTE:
+        schedule_summary_precompute(session.engine, file_record.id, runner)
     return file_record
 
 
-def list_conversation_files(conversation_id: str, session: Session = Depends(get_session)) -> list[FileView]:
-    files = session.exec(select(FileRecord).where(FileRecord.conversation_id == conversation_id)).all()
+def list_conversation_files(
+    conversation_id: str,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> FileViewPage:
+    statement = (
+        select(FileRecord).where(FileRecord.conversation_id == conversation_id).order_by(FileRecord.created_at.asc())
+    )
+    files, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
     views: list[FileView] = []
     for file_record in files:
         binding = get_or_create_binding(session, conversation_id, file_record.id)
@@ -52,7 +73,7 @@ def list_conversation_files(conversation_id: str, session: Session = Depends(get
                 included_in_context=binding.included_in_context,
             )
         )
-    return views
+    return FileViewPage(items=views, next_cursor=next_cursor)
 
 
 def include_file(conversation_id: str, file_id: str, session: Session = Depends(get_session)):
@@ -75,21 +96,31 @@ def exclude_file(conversation_id: str, file_id: str, session: Session = Depends(
     return binding
 
 
-def summarize_file(conversation_id: str, file_id: str, session: Session = Depends(get_session)) -> FileSummary:
-    return summarize_file_service(session, conversation_id, file_id, OpenAIRunner())
+async def summarize_file(
+    conversation_id: str,
+    file_id: str,
+    session: Session = Depends(get_session),
+    runner: OpenAIRunner = Depends(get_runner),
+    force: bool = False,
+) -> FileSummary:
+    return await asummarize_file(session, conversation_id, file_id, runner, force=force)
 
 
-def get_conversation_right_panel(conversation_id: str, session: Session = Depends(get_session)) -> RightPanelResponse:
+def get_conversation_right_panel(
+    conversation_id: str, session: Session = Depends(get_session), runner: OpenAIRunner = Depends(get_runner)
+) -> RightPanelResponse:
     runs = session.exec(
         select(ConversationRun)
         .where(ConversationRun.conversation_id == conversation_id)
         .order_by(ConversationRun.created_at.desc())
+        .limit(10)
     ).all()
     files = list_conversation_files(conversation_id, session)
     latest_file_summary = session.exec(
         select(FileSummary)
         .where(FileSummary.conversation_id == conversation_id)
         .order_by(FileSummary.created_at.desc())
+        .limit(1)
     ).first()
     return RightPanelResponse(
         results={
@@ -101,24 +132,25 @@ def get_conversation_right_panel(conversation_id: str, session: Session = Depend
                     "summary": run.summary,
                     "error_text": run.error_text,
                 }
-                for run in runs[:10]
+                for run in runs
             ],
             "latest_artifacts": [],
         },
-        files=files,
+        files=files.items,
+        files_next_cursor=files.next_cursor,
         summaries={
             "conversation_summary": None,
             "branch_summary": None,
             "latest_file_summary": latest_file_summary.content if latest_file_summary else None,
         },
-        agent={"model": OpenAIRunner().model_name, "store": False},
+        agent={"model": runner.model_name, "store": False},
     )
 
 
 def register_routes(app):
     app.post("/api/files/upload-url")(create_upload_url)
     app.post("/api/files/register", response_model=FileRecord)(register_file)
-    app.get("/api/conversations/{conversation_id}/files", response_model=list[FileView])(list_conversation_files)
+    app.get("/api/conversations/{conversation_id}/files", response_model=FileViewPage)(list_conversation_files)
     app.post("/api/conversations/{conversation_id}/files/{file_id}/include")(include_file)
     app.post("/api/conversations/{conversation_id}/files/{file_id}/exclude")(exclude_file)
     app.post("/api/conversations/{conversation_id}/files/{file_id}/summarize", response_model=FileSummary)(
@@ -1,23 +1,45 @@
+from typing import Optional
+
 from app.db import get_session
 from app.models import ConversationArtifact, ConversationRun
+from app.schemas import ConversationArtifactPage, ConversationRunPage
+from app.services.pagination import DEFAULT_PAGE_SIZE, paginate
 from fastapi import Depends
 from sqlmodel import Session, select
 
 
-def list_conversation_runs(conversation_id: str, session: Session = Depends(get_session)) -> list[ConversationRun]:
-    return session.exec(select(ConversationRun).where(ConversationRun.conversation_id == conversation_id)).all()
+def list_conversation_runs(
+    conversation_id: str,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> ConversationRunPage:
+    statement = (
+        select(ConversationRun)
+        .where(ConversationRun.conversation_id == conversation_id)
+        .order_by(ConversationRun.created_at.asc())
+    )
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return ConversationRunPage(items=items, next_cursor=next_cursor)
 
 
 def list_conversation_artifacts(
-    conversation_id: str, session: Session = Depends(get_session)
-) -> list[ConversationArtifact]:
-    return session.exec(
-        select(ConversationArtifact).where(ConversationArtifact.conversation_id == conversation_id)
-    ).all()
+    conversation_id: str,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> ConversationArtifactPage:
+    statement = (
+        select(ConversationArtifact)
+        .where(ConversationArtifact.conversation_id == conversation_id)
+        .order_by(ConversationArtifact.created_at.asc())
+    )
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return ConversationArtifactPage(items=items, next_cursor=next_cursor)
 
 
 def register_routes(app):
-    app.get("/api/conversations/{conversation_id}/runs", response_model=list[ConversationRun])(list_conversation_runs)
-    app.get("/api/conversations/{conversation_id}/artifacts", response_model=list[ConversationArtifact])(
+    app.get("/api/conversations/{conversation_id}/runs", response_model=ConversationRunPage)(list_conversation_runs)
+    app.get("/api/conversations/{conversation_id}/artifacts", response_model=ConversationArtifactPage)(
         list_conversation_artifacts
     )
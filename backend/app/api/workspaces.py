@@ -1,18 +1,22 @@
 import json
 from datetime import datetime
-from typing import Generator
+from typing import Generator, Optional
 
 from app.db import get_session
 from app.models import Artifact, Message, Run, Workspace
 from app.schemas import (
+    ArtifactPage,
     ArtifactVersionChain,
     ChatCreate,
     FeatureCatalog,
     RunComplete,
     RunCompleteResponse,
     RunCreate,
+    RunPage,
     WorkspaceCreate,
+    WorkspacePage,
 )
+from app.services.pagination import DEFAULT_PAGE_SIZE, paginate
 from fastapi import Depends, File, HTTPException, UploadFile
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
@@ -26,8 +30,12 @@ def create_workspace(payload: WorkspaceCreate, session: Session = Depends(get_se
     return workspace
 
 
-def list_workspaces(session: Session = Depends(get_session)) -> list[Workspace]:
-    return session.exec(select(Workspace).order_by(Workspace.created_at.desc())).all()
+def list_workspaces(
+    session: Session = Depends(get_session), limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None
+) -> WorkspacePage:
+    statement = select(Workspace).order_by(Workspace.created_at.desc())
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return WorkspacePage(items=items, next_cursor=next_cursor)
 
 
 def get_workspace(workspace_id: int, session: Session = Depends(get_session)) -> Workspace:
@@ -54,8 +62,15 @@ def upload_file(workspace_id: int, file: UploadFile = File(...), session: Sessio
     return artifact
 
 
-def list_artifacts(workspace_id: int, session: Session = Depends(get_session)) -> list[Artifact]:
-    return session.exec(select(Artifact).where(Artifact.workspace_id == workspace_id)).all()
+def list_artifacts(
+    workspace_id: int,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> ArtifactPage:
+    statement = select(Artifact).where(Artifact.workspace_id == workspace_id).order_by(Artifact.created_at.asc())
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return ArtifactPage(items=items, next_cursor=next_cursor)
 
 
 def create_run(workspace_id: int, payload: RunCreate, session: Session = Depends(get_session)) -> Run:
@@ -81,6 +96,7 @@ def complete_run(run_id: int, payload: RunComplete, session: Session = Depends(g
         select(Artifact)
         .where(Artifact.workspace_id == run.workspace_id, Artifact.version_group == payload.output_filename)
         .order_by(Artifact.version_no.desc())
+        .limit(1)
     ).first()
     next_version = 1 if latest_in_group is None else latest_in_group.version_no + 1
     artifact = Artifact(
@@ -125,6 +141,7 @@ def get_artifact_version_chain(artifact_id: int, session: Session = Depends(get_
             Artifact.version_no < artifact.version_no,
         )
         .order_by(Artifact.version_no.desc())
+        .limit(1)
     ).first()
     next_artifact = session.exec(
         select(Artifact)
@@ -134,13 +151,20 @@ def get_artifact_version_chain(artifact_id: int, session: Session = Depends(get_
             Artifact.version_no > artifact.version_no,
         )
         .order_by(Artifact.version_no.asc())
+        .limit(1)
     ).first()
     return ArtifactVersionChain(artifact=artifact, previous_artifact=previous_artifact, next_artifact=next_artifact)
 
 
-def list_runs(workspace_id: int, session: Session = Depends(get_session)) -> list[Run]:
+def list_runs(
+    workspace_id: int,
+    session: Session = Depends(get_session),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+) -> RunPage:
     statement = select(Run).where(Run.workspace_id == workspace_id).order_by(Run.created_at.desc())
-    return session.exec(statement).all()
+    items, next_cursor = paginate(session, statement, limit=limit, cursor=cursor)
+    return RunPage(items=items, next_cursor=next_cursor)
 
 
 def get_run(run_id: int, session: Session = Depends(get_session)) -> Run:
@@ -200,15 +224,15 @@ def get_feature_catalog() -> FeatureCatalog:
 
 def register_routes(app):
     app.post("/api/workspaces", response_model=Workspace)(create_workspace)
-    app.get("/api/workspaces", response_model=list[Workspace])(list_workspaces)
+    app.get("/api/workspaces", response_model=WorkspacePage)(list_workspaces)
     app.get("/api/workspaces/{workspace_id}", response_model=Workspace)(get_workspace)
     app.post("/api/workspaces/{workspace_id}/upload", response_model=Artifact)(upload_file)
-    app.get("/api/workspaces/{workspace_id}/artifacts", response_model=list[Artifact])(list_artifacts)
+    app.get("/api/workspaces/{workspace_id}/artifacts", response_model=ArtifactPage)(list_artifacts)
     app.post("/api/workspaces/{workspace_id}/runs", response_model=Run)(create_run)
     app.post("/api/runs/{run_id}/complete", response_model=RunCompleteResponse)(complete_run)
     app.post("/api/artifacts/{artifact_id}/publish", response_model=Artifact)(publish_artifact)
     app.get("/api/artifacts/{artifact_id}/chain", response_model=ArtifactVersionChain)(get_artifact_version_chain)
-    app.get("/api/workspaces/{workspace_id}/runs", response_model=list[Run])(list_runs)
+    app.get("/api/workspaces/{workspace_id}/runs", response_model=RunPage)(list_runs)
     app.get("/api/runs/{run_id}", response_model=Run)(get_run)
     app.post("/api/workspaces/{workspace_id}/chat")(chat_trigger)
     app.get("/api/runs/{run_id}/events")(run_events)
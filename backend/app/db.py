@@ -1,14 +1,20 @@
 import os
 from typing import Generator
 
+from app.services.message_tree import backfill_tree_pointers
 from sqlmodel import Session, SQLModel, create_engine
 
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./workspace.db")
+# "memory" keeps rows in process; "sqlite" stores them in DATABASE_URL and pushes queries down to SQL.
+DATABASE_BACKEND = os.getenv("DATABASE_BACKEND", "memory")
+# Optional write-ahead log for the memory backend; rows are replayed from it by init_db().
+DATABASE_WAL_PATH = os.getenv("DATABASE_WAL_PATH")
 
-def build_engine(database_url: str):
-    return create_engine(database_url, echo=False)
+
+def build_engine(database_url: str, backend: str = DATABASE_BACKEND, wal_path: str | None = DATABASE_WAL_PATH):
+    return create_engine(database_url, echo=False, backend=backend, wal_path=wal_path)
 
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./workspace.db")
 engine = build_engine(DATABASE_URL)
 
 
@@ -19,3 +25,9 @@ def get_session() -> Generator[Session, None, None]:
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        backfill_tree_pointers(session)
+
+
+def close_db() -> None:
+    engine.close()
@@ -1,10 +1,13 @@
 from app.api.conversations import (
     branch_from_message,
+    compare_branches,
     create_conversation,
     create_conversation_message,
     get_conversation,
+    get_path_siblings,
     list_conversations,
     regenerate_message,
+    stream_conversation_message,
 )
 from app.api.conversations import (
     register_routes as register_conversation_routes,
@@ -47,7 +50,7 @@ from app.api.workspaces import (
 from app.api.workspaces import (
     register_routes as register_workspace_routes,
 )
-from app.db import engine, init_db
+from app.db import close_db, engine, init_db
 from app.models import Artifact, Conversation, ConversationMessage, FileRecord, Workspace
 from app.schemas import (
     BranchCreate,
@@ -59,6 +62,7 @@ from app.schemas import (
     RunCreate,
     WorkspaceCreate,
 )
+from app.services.openai_runner import close_runner, get_runner
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -77,10 +81,17 @@ def startup() -> None:
     init_db()
 
 
+@app.on_event("shutdown")
+def shutdown() -> None:
+    close_db()
+    close_runner()
+
+
 __all__ = [
     "app",
     "engine",
     "init_db",
+    "get_runner",
     "Workspace",
     "Artifact",
     "Conversation",
@@ -111,9 +122,12 @@ __all__ = [
     "list_conversations",
     "create_conversation",
     "get_conversation",
+    "get_path_siblings",
     "create_conversation_message",
     "regenerate_message",
+    "stream_conversation_message",
     "branch_from_message",
+    "compare_branches",
     "create_upload_url",
     "register_file",
     "list_conversation_files",
@@ -2,10 +2,12 @@ from datetime import datetime
 from typing import Optional
 from uuid import uuid4
 
-from sqlmodel import Field, SQLModel
+from sqlmodel import Field, Index, SQLModel
 
 
 class Workspace(SQLModel, table=True):
+    __table_args__ = (Index("ix_workspace_created", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     owner_user_id: str = "demo"
@@ -14,8 +16,13 @@ class Workspace(SQLModel, table=True):
 
 
 class Artifact(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_artifact_version_chain", "workspace_id", "version_group", "version_no"),
+        Index("ix_artifact_created", "workspace_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    workspace_id: int
+    workspace_id: int = Field(index=True)
     path: str
     type: str
     version_group: str
@@ -27,8 +34,10 @@ class Artifact(SQLModel, table=True):
 
 
 class Run(SQLModel, table=True):
+    __table_args__ = (Index("ix_run_created", "workspace_id", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    workspace_id: int
+    workspace_id: int = Field(index=True)
     skill_name: str
     status: str = "queued"
     prompt: str
@@ -42,7 +51,7 @@ class Run(SQLModel, table=True):
 
 class Message(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    workspace_id: int
+    workspace_id: int = Field(index=True)
     run_id: Optional[int] = None
     role: str
     content: str
@@ -50,6 +59,8 @@ class Message(SQLModel, table=True):
 
 
 class Conversation(SQLModel, table=True):
+    __table_args__ = (Index("ix_conversation_updated", "updated_at"),)
+
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
     title: str
     owner_user_id: Optional[str] = None
@@ -59,21 +70,42 @@ class Conversation(SQLModel, table=True):
 
 
 class ConversationMessage(SQLModel, table=True):
+    __table_args__ = (Index("ix_conversation_message_children", "conversation_id", "parent_message_id", "created_at"),)
+
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    conversation_id: str = Field()
-    parent_message_id: Optional[str] = Field(default=None)
+    conversation_id: str = Field(index=True)
+    parent_message_id: Optional[str] = Field(default=None, index=True)
+    depth: int = 0
+    # Binary-lifting pointers: entry k is the id of the 2**k-th ancestor.
+    skip_ids_json: str = "[]"
     role: str
     content_json: str
+    # Text parts joined at write time so path views never parse content_json.
+    plain_text: Optional[str] = None
     status: str = "completed"
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class MessagePart(SQLModel, table=True):
+    __tablename__ = "message_part"
+
+    id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
+    message_id: str = Field(index=True)
+    part_type: str
+    mime_type: Optional[str] = None
+    text: Optional[str] = None
+    data: Optional[str] = None
+    size: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class ConversationRun(SQLModel, table=True):
     __tablename__ = "conversation_run"
+    __table_args__ = (Index("ix_conversation_run_recent", "conversation_id", "created_at"),)
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    conversation_id: str = Field()
+    conversation_id: str = Field(index=True)
     message_id: Optional[str] = Field(default=None)
     branch_leaf_message_id: Optional[str] = None
     run_type: str
@@ -82,6 +114,11 @@ class ConversationRun(SQLModel, table=True):
     summary: Optional[str] = None
     error_text: Optional[str] = None
     warnings_json: str = "[]"
+    response_cache_hits: int = 0
+    response_cache_misses: int = 0
+    # Time spent waiting for admission before the model call started; lower priority values go first.
+    queue_wait_ms: int = 0
+    queue_priority: Optional[int] = None
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -90,14 +127,16 @@ class ConversationRun(SQLModel, table=True):
 
 class FileRecord(SQLModel, table=True):
     __tablename__ = "file_record"
+    __table_args__ = (Index("ix_file_record_created", "conversation_id", "created_at"),)
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    conversation_id: str = Field()
+    conversation_id: str = Field(index=True)
     filename: str
     storage_backend: str
     storage_key: str
     mime_type: Optional[str] = None
     size_bytes: Optional[int] = None
+    content_sha256: Optional[str] = None
     editor_type: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -107,8 +146,8 @@ class FileBinding(SQLModel, table=True):
     __tablename__ = "file_binding"
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    conversation_id: str = Field()
-    file_id: str = Field()
+    conversation_id: str = Field(index=True)
+    file_id: str = Field(index=True)
     branch_id: Optional[str] = None
     included_in_context: bool = False
     summary_mode: str = "none"
@@ -120,23 +159,31 @@ class FileBinding(SQLModel, table=True):
 
 class FileSummary(SQLModel, table=True):
     __tablename__ = "file_summary"
+    __table_args__ = (
+        Index("ix_file_summary_recent", "conversation_id", "created_at"),
+        Index("ix_file_summary_file", "file_id", "summary_type", "created_at"),
+        Index("ix_file_summary_source", "source_key", "summary_type", "created_at"),
+    )
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    file_id: str = Field()
-    conversation_id: str = Field()
+    file_id: str = Field(index=True)
+    conversation_id: str = Field(index=True)
     branch_id: Optional[str] = None
     summary_type: str
     content: str
+    # storage_key:content_sha256 of the summarized file, when the hash is known; lets other conversations reuse it.
+    source_key: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class ConversationArtifact(SQLModel, table=True):
     __tablename__ = "conversation_artifact"
+    __table_args__ = (Index("ix_conversation_artifact_created", "conversation_id", "created_at"),)
 
     id: str = Field(default_factory=lambda: str(uuid4()), primary_key=True)
-    conversation_id: str = Field()
-    run_id: str = Field()
+    conversation_id: str = Field(index=True)
+    run_id: str = Field(index=True)
     message_id: Optional[str] = None
     file_id: Optional[str] = None
     artifact_type: str
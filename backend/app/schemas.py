@@ -1,6 +1,6 @@
 from typing import Any, Optional
 
-from app.models import Artifact
+from app.models import Artifact, Conversation, ConversationArtifact, ConversationRun, Run, Workspace
 from pydantic import BaseModel
 from pydantic import Field as PydanticField
 
@@ -50,7 +50,13 @@ class ConversationCreate(BaseModel):
 
 class ContentPart(BaseModel):
     type: str = "text"
-    text: str
+    text: Optional[str] = None
+    # Base64 payload for non-text parts.
+    data: Optional[str] = None
+    mime_type: Optional[str] = None
+    # Set instead of text/data when the payload lives in a MessagePart row.
+    ref: Optional[str] = None
+    size: Optional[int] = None
 
 
 class MessageContent(BaseModel):
@@ -73,6 +79,31 @@ class MessagePathView(BaseModel):
     text: str
 
 
+class BranchComparison(BaseModel):
+    message_id: str
+    other_message_id: str
+    common_ancestor_id: str
+    message_is_ancestor: bool
+    other_is_ancestor: bool
+    message_distance: int
+    other_distance: int
+
+
+class SiblingPosition(BaseModel):
+    message_id: str
+    sibling_count: int
+    ordinal: int
+    previous_sibling_id: Optional[str] = None
+    next_sibling_id: Optional[str] = None
+
+
+class PathSiblingsResponse(BaseModel):
+    conversation_id: str
+    items: list[SiblingPosition]
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
+
+
 class MessageCreateResult(BaseModel):
     user_message_id: str
     assistant_message_id: str
@@ -84,6 +115,8 @@ class ConversationDetailResponse(BaseModel):
     title: str
     selected_leaf_message_id: Optional[str]
     selected_path_messages: list[MessagePathView]
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
 
 
 class UploadUrlCreate(BaseModel):
@@ -98,6 +131,7 @@ class FileRegisterCreate(BaseModel):
     storage_key: str
     mime_type: Optional[str] = None
     size_bytes: Optional[int] = None
+    content_sha256: Optional[str] = None
 
 
 class FileView(BaseModel):
@@ -114,5 +148,42 @@ class FileView(BaseModel):
 class RightPanelResponse(BaseModel):
     results: dict[str, Any]
     files: list[FileView]
+    # Set when the conversation has more files than one page; continue with GET .../files?cursor=.
+    files_next_cursor: Optional[str] = None
     summaries: dict[str, Optional[str]]
     agent: dict[str, Any]
+
+
+class WorkspacePage(BaseModel):
+    items: list[Workspace]
+    next_cursor: Optional[str] = None
+
+
+class ArtifactPage(BaseModel):
+    items: list[Artifact]
+    next_cursor: Optional[str] = None
+
+
+class RunPage(BaseModel):
+    items: list[Run]
+    next_cursor: Optional[str] = None
+
+
+class ConversationPage(BaseModel):
+    items: list[Conversation]
+    next_cursor: Optional[str] = None
+
+
+class ConversationRunPage(BaseModel):
+    items: list[ConversationRun]
+    next_cursor: Optional[str] = None
+
+
+class ConversationArtifactPage(BaseModel):
+    items: list[ConversationArtifact]
+    next_cursor: Optional[str] = None
+
+
+class FileViewPage(BaseModel):
+    items: list[FileView]
+    next_cursor: Optional[str] = None
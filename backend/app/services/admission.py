@@ -0,0 +1,203 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterator
+
+from fastapi import HTTPException
+
+MODEL_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+MODEL_TENANT_RATE_PER_SECOND = float(os.getenv("OPENAI_TENANT_RATE_PER_SECOND", "2"))
+MODEL_TENANT_BURST = int(os.getenv("OPENAI_TENANT_BURST", "10"))
+MODEL_ADMISSION_TIMEOUT_SECONDS = float(os.getenv("OPENAI_ADMISSION_TIMEOUT_SECONDS", "30"))
+
+# Lower values are admitted first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> float:
+        # Takes one token and returns 0, or returns how many seconds until one is available.
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class Admission:
+    queued_seconds: float = 0.0
+
+
+class _Waiter:
+    def __init__(self, tenant: str | None, grant: Callable[[], None]):
+        self.tenant = tenant
+        self.grant = grant
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: float | None = None
+        self.cancelled = False
+
+
+class AdmissionScheduler:
+    # Admits model calls in priority order while keeping at most max_concurrency in flight and spending one
+    # token per call from the caller's tenant bucket. A waiter whose tenant is out of tokens is passed over,
+    # so one busy tenant cannot hold up the others. Calls without a tenant only count against the global cap.
+    def __init__(
+        self,
+        max_concurrency: int = MODEL_MAX_CONCURRENCY,
+        tenant_rate: float = MODEL_TENANT_RATE_PER_SECOND,
+        tenant_burst: int = MODEL_TENANT_BURST,
+        timeout: float = MODEL_ADMISSION_TIMEOUT_SECONDS,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.tenant_rate = tenant_rate
+        self.tenant_burst = tenant_burst
+        self.timeout = timeout
+        self.active = 0
+        self._queue: list[tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._timer_due = 0.0
+
+    @property
+    def queued(self) -> int:
+        with self._lock:
+            return sum(1 for _, _, waiter in self._queue if not waiter.cancelled)
+
+    def _enqueue(self, tenant: str | None, priority: int, grant: Callable[[], None]) -> _Waiter:
+        waiter = _Waiter(tenant, grant)
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._sequence), waiter))
+            granted = self._dispatch()
+        self._notify(granted)
+        return waiter
+
+    def _dispatch(self) -> list[_Waiter]:
+        # Caller holds the lock; the returned waiters are granted outside it.
+        now = time.monotonic()
+        granted: list[_Waiter] = []
+        deferred = []
+        retry_in: float | None = None
+        while self._queue and self.active < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if waiter.cancelled:
+                continue
+            delay = self._bucket(waiter.tenant).take(now) if waiter.tenant else 0.0
+            if delay > 0:
+                deferred.append(entry)
+                retry_in = delay if retry_in is None else min(retry_in, delay)
+                continue
+            self.active += 1
+            waiter.admitted_at = now
+            granted.append(waiter)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+        if retry_in is not None:
+            self._wake_in(retry_in)
+        return granted
+
+    def _bucket(self, tenant: str) -> TokenBucket:
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            bucket = self._buckets[tenant] = TokenBucket(self.tenant_rate, self.tenant_burst)
+        return bucket
+
+    def _wake_in(self, delay: float) -> None:
+        due = time.monotonic() + delay
+        if self._timer is not None and self._timer.is_alive() and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._wake)
+        self._timer.daemon = True
+        self._timer_due = due
+        self._timer.start()
+
+    def _wake(self) -> None:
+        with self._lock:
+            self._timer = None
+            granted = self._dispatch()
+        self._notify(granted)
+
+    def _notify(self, granted: list[_Waiter]) -> None:
+        for waiter in granted:
+            try:
+                waiter.grant()
+            except RuntimeError:
+                # The waiting event loop is gone; hand the slot to the next waiter.
+                self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self.active -= 1
+            granted = self._dispatch()
+        self._notify(granted)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        # Returns True when the waiter was admitted after all and now holds a slot.
+        with self._lock:
+            if waiter.admitted_at is not None:
+                return True
+            waiter.cancelled = True
+            return False
+
+    def _admission(self, waiter: _Waiter) -> Admission:
+        return Admission(queued_seconds=waiter.admitted_at - waiter.enqueued_at)
+
+    def _rejected(self) -> HTTPException:
+        return HTTPException(status_code=429, detail="model capacity exhausted, retry later")
+
+    @contextmanager
+    def admit(self, tenant: str | None, priority: int = PRIORITY_INTERACTIVE) -> Iterator[Admission]:
+        ready = threading.Event()
+        waiter = self._enqueue(tenant, priority, ready.set)
+        if not ready.wait(self.timeout) and not self._abandon(waiter):
+            raise self._rejected()
+        try:
+            yield self._admission(waiter)
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def aadmit(self, tenant: str | None, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[Admission]:
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def grant() -> None:
+            loop.call_soon_threadsafe(lambda: ready.done() or ready.set_result(None))
+
+        waiter = self._enqueue(tenant, priority, grant)
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), self.timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise self._rejected() from None
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self._release()
+            raise
+        try:
+            yield self._admission(waiter)
+        finally:
+            self._release()
+
+
+admission_scheduler = AdmissionScheduler()
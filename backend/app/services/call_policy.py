@@ -0,0 +1,300 @@
+import asyncio
+import http.client
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, TypeVar
+
+from fastapi import HTTPException
+
+OPENAI_CALL_DEADLINE_SECONDS = float(os.getenv("OPENAI_CALL_DEADLINE_SECONDS", "120"))
+OPENAI_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_ATTEMPT_TIMEOUT_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "0.5"))
+OPENAI_RETRY_MAX_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_SECONDS", "8"))
+# Hedging is off unless enabled: a second request is sent once the first outlives the recent p95 latency.
+OPENAI_HEDGE_REQUESTS = os.getenv("OPENAI_HEDGE_REQUESTS", "0") == "1"
+OPENAI_HEDGE_MIN_SAMPLES = int(os.getenv("OPENAI_HEDGE_MIN_SAMPLES", "20"))
+OPENAI_BREAKER_FAILURE_THRESHOLD = int(os.getenv("OPENAI_BREAKER_FAILURE_THRESHOLD", "5"))
+OPENAI_BREAKER_RESET_SECONDS = float(os.getenv("OPENAI_BREAKER_RESET_SECONDS", "30"))
+OPENAI_CALL_WORKERS = int(os.getenv("OPENAI_CALL_WORKERS", "32"))
+
+RETRYABLE_STATUSES = {408, 409, 429}
+
+T = TypeVar("T")
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUSES or status >= 500
+    return isinstance(exc, (TimeoutError, ConnectionError, http.client.HTTPException))
+
+
+class CircuitBreaker:
+    # Opens after failure_threshold consecutive upstream failures and rejects calls for reset_seconds; then a
+    # single probe call is let through, which either closes the breaker or opens it again.
+    def __init__(
+        self,
+        failure_threshold: int = OPENAI_BREAKER_FAILURE_THRESHOLD,
+        reset_seconds: float = OPENAI_BREAKER_RESET_SECONDS,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _rejected(self) -> HTTPException:
+        return HTTPException(status_code=503, detail="model upstream unavailable, retry later")
+
+    def check(self) -> None:
+        # Fails fast while open, without claiming the half-open probe; used before any work is queued.
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at < self.reset_seconds:
+                raise self._rejected()
+
+    def before_call(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "open" or (self.state == "half_open" and self._probing):
+                raise self._rejected()
+            if self.state == "half_open":
+                self._probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float, min_samples: int) -> float | None:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class CallPolicy:
+    # Wraps one upstream call with an overall deadline, a per-attempt timeout, retries with full-jitter
+    # exponential backoff, optional hedging and a circuit breaker. Every retry and hedge is appended to the
+    # caller's warnings list so it ends up in the run's warnings_json.
+    def __init__(
+        self,
+        deadline: float = OPENAI_CALL_DEADLINE_SECONDS,
+        attempt_timeout: float = OPENAI_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        retry_base: float = OPENAI_RETRY_BASE_SECONDS,
+        retry_max: float = OPENAI_RETRY_MAX_SECONDS,
+        hedge: bool = OPENAI_HEDGE_REQUESTS,
+        hedge_min_samples: int = OPENAI_HEDGE_MIN_SAMPLES,
+        breaker: CircuitBreaker | None = None,
+        workers: int = OPENAI_CALL_WORKERS,
+    ):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max(0, max_retries)
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._workers = workers
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, workers))
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Blocking attempts run on worker threads so a stuck call can be abandoned once its timeout passes.
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="model-call")
+            return self._pool
+
+    def _hedge_delay(self) -> float | None:
+        if not self.hedge:
+            return None
+        return self.latency.percentile(0.95, self.hedge_min_samples)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (attempt - 1)))
+
+    def observe(self, error: BaseException | None) -> None:
+        if error is not None and is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _next_delay(self, attempt: int, error: BaseException, deadline: float, warnings: list[str]) -> float | None:
+        # Returns the backoff before the next attempt, or None when the error should be raised.
+        if not is_retryable(error) or attempt > self.max_retries:
+            return None
+        delay = self._backoff(attempt)
+        if time.monotonic() + delay >= deadline:
+            return None
+        warnings.append(f"model call attempt {attempt} failed ({error}); retrying in {delay:.2f}s")
+        return delay
+
+    def call(self, fn: Callable[[], T], warnings: list[str]) -> T:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = self._attempt(fn, deadline, warnings)
+            except Exception as exc:
+                self.observe(exc)
+                delay = self._next_delay(attempt, exc, deadline, warnings)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.observe(None)
+            return result
+
+    def _submit(self, fn: Callable[[], T], timeout: float) -> Future | None:
+        # At most `workers` attempts are queued or running at once, so hung calls cannot pile up behind the
+        # executor (and the connection pool behind it). Returns None when no slot frees up in time.
+        if not self._slots.acquire(timeout=max(0.0, timeout)):
+            return None
+        try:
+            future = self._executor().submit(fn)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _attempt(self, fn: Callable[[], T], deadline: float, warnings: list[str]) -> T:
+        started = time.monotonic()
+        attempt_deadline = min(deadline, started + self.attempt_timeout)
+        hedge_after = self._hedge_delay()
+        first = self._submit(fn, attempt_deadline - started)
+        if first is None:
+            raise TimeoutError(f"no model call worker became free within {time.monotonic() - started:.2f}s")
+        started_at: dict[Future, float] = {first: started}
+        pending = {first}
+        error: BaseException | None = None
+        try:
+            while pending:
+                wake_at = attempt_deadline
+                if hedge_after is not None and len(started_at) == 1:
+                    wake_at = min(wake_at, started + hedge_after)
+                done, pending = wait(pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self.latency.add(time.monotonic() - started_at[future])
+                        if len(started_at) > 1:
+                            winner = "hedged" if started_at[future] > started else "original"
+                            warnings.append(f"{winner} model request answered first")
+                        return future.result()
+                    error = future.exception()
+                now = time.monotonic()
+                if now >= attempt_deadline:
+                    break
+                if pending and hedge_after is not None and len(started_at) == 1 and now - started >= hedge_after:
+                    hedged = self._submit(fn, 0)
+                    if hedged is None:
+                        # Every worker is busy; keep waiting on the original instead of queueing a hedge.
+                        hedge_after = None
+                        continue
+                    warnings.append(f"hedged model request sent after {now - started:.2f}s (p95 {hedge_after:.2f}s)")
+                    started_at[hedged] = now
+                    pending.add(hedged)
+        finally:
+            # Attempts that have not started yet are dropped; running ones finish in the background.
+            for future in pending:
+                future.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"model call timed out after {time.monotonic() - started:.2f}s")
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], warnings: list[str]) -> T:
+        deadline = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = await self._aattempt(fn, deadline, warnings)
+            except Exception as exc:
+                self.observe(exc)
+                delay = self._next_delay(attempt, exc, deadline, warnings)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.observe(None)
+            return result
+
+    async def _aattempt(self, fn: Callable[[], Awaitable[T]], deadline: float, warnings: list[str]) -> T:
+        started = time.monotonic()
+        attempt_deadline = min(deadline, started + self.attempt_timeout)
+        hedge_after = self._hedge_delay()
+        started_at: dict[asyncio.Future, float] = {asyncio.ensure_future(fn()): started}
+        pending = set(started_at)
+        error: BaseException | None = None
+        try:
+            while pending:
+                wake_at = attempt_deadline
+                if hedge_after is not None and len(started_at) == 1:
+                    wake_at = min(wake_at, started + hedge_after)
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wake_at - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        self.latency.add(time.monotonic() - started_at[task])
+                        if len(started_at) > 1:
+                            winner = "hedged" if started_at[task] > started else "original"
+                            warnings.append(f"{winner} model request answered first")
+                        return task.result()
+                    error = task.exception()
+                now = time.monotonic()
+                if now >= attempt_deadline:
+                    break
+                if pending and hedge_after is not None and len(started_at) == 1 and now - started >= hedge_after:
+                    warnings.append(f"hedged model request sent after {now - started:.2f}s (p95 {hedge_after:.2f}s)")
+                    hedged = asyncio.ensure_future(fn())
+                    started_at[hedged] = now
+                    pending.add(hedged)
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"model call timed out after {time.monotonic() - started:.2f}s")
+
+
+call_policy = CallPolicy()
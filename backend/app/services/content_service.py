@@ -1,23 +1,111 @@
 import json
+import os
+from typing import Any, Callable, Optional
 
-from app.schemas import ContentPart, MessageContent
+from app.models import ConversationMessage, MessagePart
+from app.schemas import ContentPart
+from sqlmodel import Session
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Parts with a larger payload (in characters) are stored in their own MessagePart row and referenced by id.
+INLINE_PART_LIMIT = int(os.getenv("MESSAGE_INLINE_PART_LIMIT", "65536"))
+
+
+def encode_content(content: dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(content).decode()
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_content(content_json: str) -> Any:
+    if orjson is not None:
+        return orjson.loads(content_json)
+    return json.loads(content_json)
 
 
 def serialize_message_text(text: str) -> str:
-    return json.dumps({"parts": [{"type": "text", "text": text}]}, ensure_ascii=False)
+    return encode_content({"parts": [{"type": "text", "text": text}]})
+
+
+def serialize_message_parts(message_id: str, parts: list[ContentPart]) -> tuple[str, list[MessagePart]]:
+    stored: list[dict[str, Any]] = []
+    out_of_line: list[MessagePart] = []
+    for part in parts:
+        payload = part.text if part.text is not None else part.data or ""
+        if len(payload) <= INLINE_PART_LIMIT:
+            stored.append({key: value for key, value in part.model_dump().items() if value is not None})
+            continue
+        row = MessagePart(
+            message_id=message_id,
+            part_type=part.type,
+            mime_type=part.mime_type,
+            text=part.text,
+            data=part.data,
+            size=len(payload),
+        )
+        out_of_line.append(row)
+        stored.append({"type": part.type, "ref": row.id, "size": row.size})
+    return encode_content({"parts": stored}), out_of_line
+
 
+def set_message_text(session: Session, message: ConversationMessage, text: str) -> None:
+    message.content_json, out_of_line = serialize_message_parts(message.id, [ContentPart(type="text", text=text)])
+    # The denormalized copy only covers inline text; out-of-line text is resolved from MessagePart when read,
+    # so the message row stays bounded.
+    message.plain_text = None if out_of_line else text
+    for row in out_of_line:
+        session.add(row)
 
-def parse_message_content(content_json: str) -> MessageContent:
-    data = json.loads(content_json)
-    parts = [ContentPart(**part) for part in data.get("parts", [])]
-    return MessageContent(parts=parts)
 
+def set_stream_preview(message: ConversationMessage, text: str) -> bool:
+    # While a reply streams, readers see it through plain_text, capped like any inline part. Returns False once
+    # the cap is reached and later flushes would not change the row.
+    message.plain_text = text[:INLINE_PART_LIMIT]
+    return len(text) < INLINE_PART_LIMIT
 
-def message_text(content_json: str) -> str:
+
+def build_text_message(session: Session, text: str, **fields: Any) -> ConversationMessage:
+    message = ConversationMessage(content_json="", **fields)
+    set_message_text(session, message, text)
+    return message
+
+
+def part_resolver(session: Session) -> Callable[[str], str]:
+    def resolve(ref: str) -> str:
+        row = session.get(MessagePart, ref)
+        return (row.text or "") if row else ""
+
+    return resolve
+
+
+def message_text(content_json: str, resolve: Optional[Callable[[str], str]] = None) -> str:
+    # Works on the decoded dicts directly: only text parts are looked at and nothing else is materialized.
     try:
-        content = parse_message_content(content_json)
-    except (json.JSONDecodeError, ValueError, TypeError):
+        data = decode_content(content_json)
+    except (ValueError, TypeError):
+        return content_json
+    parts = data.get("parts", []) if isinstance(data, dict) else None
+    if not isinstance(parts, list) or not all(isinstance(part, dict) for part in parts):
         return content_json
 
-    texts = [part.text for part in content.parts if part.type == "text"]
+    texts: list[str] = []
+    for part in parts:
+        if part.get("type", "text") != "text":
+            continue
+        if isinstance(part.get("text"), str):
+            texts.append(part["text"])
+        elif part.get("text") is not None:
+            return content_json
+        elif part.get("ref") and resolve is not None:
+            texts.append(resolve(part["ref"]))
     return "\n".join(texts)
+
+
+def stored_message_text(message: ConversationMessage, session: Optional[Session] = None) -> str:
+    if message.plain_text is not None:
+        return message.plain_text
+    return message_text(message.content_json, part_resolver(session) if session is not None else None)
@@ -1,15 +1,70 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from typing import Any, Iterator
 
 from app.models import Conversation, ConversationMessage, ConversationRun, FileBinding, FileRecord
 from app.schemas import MessageCreateResult, MessagePathView
-from app.services.content_service import message_text, serialize_message_text
-from app.services.openai_runner import OpenAIRunner
+from app.services.admission import PRIORITY_INTERACTIVE
+from app.services.content_service import (
+    build_text_message,
+    set_message_text,
+    set_stream_preview,
+    stored_message_text,
+)
+from app.services.message_tree import ancestor_at_depth, attach_to_parent, is_ancestor, load_parent, walk_up
+from app.services.openai_runner import OpenAIResult, OpenAIRunner
+from app.services.pagination import check_limit
+from app.services.run_warnings import record_cleanup_warnings
 from fastapi import HTTPException
 from sqlmodel import Session, select
 
 MODEL_NAME = os.getenv("OPENAI_MODEL", "gpt-5.4")
+MESSAGE_PATH_CACHE_SIZE = int(os.getenv("MESSAGE_PATH_CACHE_SIZE", "1024"))
+# A streaming assistant message is written back once this many characters or seconds have accumulated.
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "1024"))
+STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "0.5"))
+
+
+# Root-to-leaf message ids keyed by leaf id. Messages never change parent once written, so entries never go
+# stale; appending a child to a cached leaf derives the child's path without touching storage.
+class MessagePathCache:
+    def __init__(self, max_entries: int = MESSAGE_PATH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._paths: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, leaf_id: str) -> tuple[str, ...] | None:
+        with self._lock:
+            path = self._paths.get(leaf_id)
+            if path is not None:
+                self._paths.move_to_end(leaf_id)
+            return path
+
+    def put(self, leaf_id: str, path: tuple[str, ...]) -> None:
+        with self._lock:
+            self._paths[leaf_id] = path
+            self._paths.move_to_end(leaf_id)
+            while len(self._paths) > self.max_entries:
+                self._paths.popitem(last=False)
+
+    def extend(self, parent_id: str | None, child_id: str) -> None:
+        if parent_id is None:
+            self.put(child_id, (child_id,))
+            return
+        parent_path = self.get(parent_id)
+        if parent_path is not None:
+            self.put(child_id, parent_path + (child_id,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._paths.clear()
+
+
+message_path_cache = MessagePathCache()
 
 
 def build_message_path(messages_by_id: dict[str, ConversationMessage], leaf_id: str) -> list[ConversationMessage]:
@@ -25,12 +80,47 @@ def build_message_path(messages_by_id: dict[str, ConversationMessage], leaf_id:
     return path
 
 
-def to_path_view(message: ConversationMessage) -> MessagePathView:
+def _path_anchor(session: Session, leaf: ConversationMessage, message_id: str) -> ConversationMessage:
+    anchor = session.get(ConversationMessage, message_id)
+    if not anchor or not is_ancestor(session, anchor, leaf):
+        raise HTTPException(status_code=400, detail="message is not on the selected path")
+    return anchor
+
+
+def load_path_window(
+    session: Session, leaf: ConversationMessage, *, limit: int, before: str | None = None, after: str | None = None
+) -> tuple[list[ConversationMessage], str | None, str | None]:
+    check_limit(limit)
+    if before and after:
+        raise HTTPException(status_code=400, detail="pass either before or after, not both")
+    # Window bounds are depths on the selected path: [start, end).
+    end = leaf.depth + 1
+    if before:
+        end = _path_anchor(session, leaf, before).depth
+    start = max(end - limit, 0)
+    if after:
+        start = _path_anchor(session, leaf, after).depth + 1
+        end = min(start + limit, leaf.depth + 1)
+    if end <= start:
+        return [], None, None
+    path_ids = message_path_cache.get(leaf.id)
+    if path_ids is not None:
+        window = [session.get(ConversationMessage, message_id) for message_id in path_ids[start:end]]
+    else:
+        window = walk_up(session, ancestor_at_depth(session, leaf, end - 1), end - start)
+        if start == 0 and end == leaf.depth + 1:
+            message_path_cache.put(leaf.id, tuple(message.id for message in window))
+    before_cursor = window[0].id if start > 0 else None
+    after_cursor = window[-1].id if end <= leaf.depth else None
+    return window, before_cursor, after_cursor
+
+
+def to_path_view(session: Session, message: ConversationMessage) -> MessagePathView:
     return MessagePathView(
         id=message.id,
         parent_message_id=message.parent_message_id,
         role=message.role,
-        text=message_text(message.content_json),
+        text=stored_message_text(message, session),
     )
 
 
@@ -55,23 +145,18 @@ def list_included_files(session: Session, conversation_id: str) -> list[dict]:
     return files
 
 
-def create_message_with_assistant(
-    session: Session, *, conversation_id: str, text: str, parent_message_id: str | None, runner: OpenAIRunner
-) -> MessageCreateResult:
+def _prepare_turn(
+    session: Session, conversation_id: str, text: str, parent_message_id: str | None
+) -> tuple[Conversation, ConversationMessage, ConversationRun]:
     conversation = session.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="conversation not found")
     user_parent_id = parent_message_id or conversation.selected_leaf_message_id
-    user_message = ConversationMessage(
-        conversation_id=conversation_id,
-        parent_message_id=user_parent_id,
-        role="user",
-        content_json=serialize_message_text(text),
+    parent = load_parent(session, conversation_id, user_parent_id)
+    user_message = build_text_message(
+        session, text, conversation_id=conversation_id, parent_message_id=user_parent_id, role="user"
     )
-    session.add(user_message)
-    session.commit()
-    session.refresh(user_message)
-
+    attach_to_parent(session, user_message, parent)
     run = ConversationRun(
         conversation_id=conversation_id,
         message_id=user_message.id,
@@ -81,54 +166,209 @@ def create_message_with_assistant(
         model_name=MODEL_NAME,
         started_at=datetime.utcnow(),
     )
+    session.add(user_message)
     session.add(run)
-    session.commit()
+    return conversation, user_message, run
 
-    result = runner.chat(prompt=text, files=list_included_files(session, conversation_id))
-    assistant_message = ConversationMessage(
-        conversation_id=conversation_id,
+
+def _complete_turn(
+    session: Session,
+    conversation: Conversation,
+    user_message: ConversationMessage,
+    run: ConversationRun,
+    result: OpenAIResult,
+) -> ConversationMessage:
+    assistant_message = build_text_message(
+        session,
+        result.text,
+        conversation_id=conversation.id,
         parent_message_id=user_message.id,
         role="assistant",
-        content_json=serialize_message_text(result.text),
     )
+    attach_to_parent(session, assistant_message, user_message)
     session.add(assistant_message)
-    session.commit()
-    session.refresh(assistant_message)
 
     run.status = "completed"
     run.finished_at = datetime.utcnow()
     run.summary = "chat completed"
     run.branch_leaf_message_id = assistant_message.id
     run.warnings_json = json.dumps(result.warnings)
+    run.response_cache_hits = result.cache_hits
+    run.response_cache_misses = result.cache_misses
+    run.queue_wait_ms = round(result.queued_seconds * 1000)
+    run.queue_priority = PRIORITY_INTERACTIVE
     run.updated_at = datetime.utcnow()
     conversation.selected_leaf_message_id = assistant_message.id
     conversation.updated_at = datetime.utcnow()
-    session.add(run)
     session.add(conversation)
-    session.commit()
-    session.refresh(run)
+    return assistant_message
+
+
+def _turn_created(
+    user_message: ConversationMessage, assistant_message: ConversationMessage, run: ConversationRun
+) -> MessageCreateResult:
+    message_path_cache.extend(user_message.parent_message_id, user_message.id)
+    message_path_cache.extend(user_message.id, assistant_message.id)
     return MessageCreateResult(
         user_message_id=user_message.id, assistant_message_id=assistant_message.id, run_id=run.id
     )
 
 
-def regenerate_message(session: Session, message_id: str, runner: OpenAIRunner) -> ConversationMessage:
+def create_message_with_assistant(
+    session: Session, *, conversation_id: str, text: str, parent_message_id: str | None, runner: OpenAIRunner
+) -> MessageCreateResult:
+    # One transaction per turn: if the model call fails nothing is written, not even a dangling "running" run.
+    with session.begin():
+        conversation, user_message, run = _prepare_turn(session, conversation_id, text, parent_message_id)
+        # A chat answer depends on the conversation, so it is never served from the shared response cache.
+        result = runner.chat(
+            prompt=text,
+            files=list_included_files(session, conversation_id),
+            use_cache=False,
+            tenant=conversation.owner_user_id,
+        )
+        assistant_message = _complete_turn(session, conversation, user_message, run, result)
+    record_cleanup_warnings(session.engine, run.id, result.cleanup)
+    return _turn_created(user_message, assistant_message, run)
+
+
+async def acreate_message_with_assistant(
+    session: Session, *, conversation_id: str, text: str, parent_message_id: str | None, runner: OpenAIRunner
+) -> MessageCreateResult:
+    with session.begin():
+        conversation, user_message, run = _prepare_turn(session, conversation_id, text, parent_message_id)
+        result = await runner.achat(
+            prompt=text,
+            files=list_included_files(session, conversation_id),
+            use_cache=False,
+            tenant=conversation.owner_user_id,
+        )
+        assistant_message = _complete_turn(session, conversation, user_message, run, result)
+    record_cleanup_warnings(session.engine, run.id, result.cleanup)
+    return _turn_created(user_message, assistant_message, run)
+
+
+def stream_message_with_assistant(
+    session: Session, *, conversation_id: str, text: str, parent_message_id: str | None, runner: OpenAIRunner
+) -> tuple[MessageCreateResult, Iterator[tuple[str, dict[str, Any]]]]:
+    # The turn is visible before the first token: the assistant message starts empty with status "streaming".
+    with session.begin():
+        conversation, user_message, run = _prepare_turn(session, conversation_id, text, parent_message_id)
+        assistant_message = build_text_message(
+            session,
+            "",
+            conversation_id=conversation_id,
+            parent_message_id=user_message.id,
+            role="assistant",
+            status="streaming",
+        )
+        attach_to_parent(session, assistant_message, user_message)
+        session.add(assistant_message)
+        run.branch_leaf_message_id = assistant_message.id
+        conversation.selected_leaf_message_id = assistant_message.id
+        conversation.updated_at = datetime.utcnow()
+        session.add(conversation)
+    created = _turn_created(user_message, assistant_message, run)
+    stream = runner.chat_stream(
+        prompt=text, files=list_included_files(session, conversation_id), tenant=conversation.owner_user_id
+    )
+    events = _stream_assistant(Session(session.engine), stream, assistant_message, run)
+    # Run the generator up to its first yield, so closing it (or dropping it) even before the first event is read
+    # still marks the turn cancelled.
+    next(events)
+    return created, events
+
+
+def _stream_assistant(
+    session: Session, stream: Any, assistant_message: ConversationMessage, run: ConversationRun
+) -> Iterator[tuple[str, dict[str, Any]]]:
+    # Runs after the request handler returned, so it owns a session of its own.
+    with session:
+        pending_chars = 0
+        flushed_chars = 0
+        last_flush = time.monotonic()
+        previewing = True
+        deltas = iter(stream)
+        try:
+            yield  # primed by stream_message_with_assistant
+            for delta in deltas:
+                yield "delta", {"text": delta}
+                pending_chars += len(delta)
+                # Each flush rewrites the row, so the size threshold grows with the text already written; that
+                # keeps total writes linear in the reply length. The full text is stored when the stream ends.
+                due = pending_chars >= max(STREAM_FLUSH_CHARS, flushed_chars)
+                if previewing and (due or time.monotonic() - last_flush >= STREAM_FLUSH_SECONDS):
+                    previewing = set_stream_preview(assistant_message, stream.text)
+                    assistant_message.updated_at = datetime.utcnow()
+                    session.add(assistant_message)
+                    session.commit()
+                    flushed_chars += pending_chars
+                    pending_chars = 0
+                    last_flush = time.monotonic()
+        except GeneratorExit:
+            # The client went away mid-stream: stop the upstream call and keep what arrived so far.
+            close = getattr(deltas, "close", None)
+            if close is not None:
+                close()
+            _finish_stream(
+                session, stream, assistant_message, run, status="cancelled", summary="chat cancelled by client"
+            )
+            raise
+        except Exception as exc:  # noqa: BLE001
+            _finish_stream(session, stream, assistant_message, run, status="failed", summary=f"chat failed: {exc}")
+            yield "error", {"detail": str(exc)}
+            return
+        _finish_stream(session, stream, assistant_message, run, status="completed", summary="chat completed")
+        yield "done", {"status": "completed", "assistant_message_id": assistant_message.id}
+
+
+def _finish_stream(
+    session: Session,
+    stream: Any,
+    assistant_message: ConversationMessage,
+    run: ConversationRun,
+    *,
+    status: str,
+    summary: str,
+) -> None:
+    with session.begin():
+        set_message_text(session, assistant_message, stream.text)
+        assistant_message.status = status
+        assistant_message.updated_at = datetime.utcnow()
+        run.status = status
+        run.summary = summary
+        run.finished_at = datetime.utcnow()
+        run.warnings_json = json.dumps(stream.warnings)
+        run.queue_wait_ms = round(stream.queued_seconds * 1000)
+        run.queue_priority = PRIORITY_INTERACTIVE
+        run.updated_at = datetime.utcnow()
+        session.add(assistant_message)
+        session.add(run)
+    record_cleanup_warnings(session.engine, run.id, stream.cleanup)
+
+
+def _regenerate_target(session: Session, message_id: str) -> tuple[ConversationMessage, str | None]:
     target_message = session.get(ConversationMessage, message_id)
     if not target_message:
         raise HTTPException(status_code=404, detail="message not found")
     if target_message.role != "user":
         raise HTTPException(status_code=400, detail="regenerate target must be a user message")
+    conversation = session.get(Conversation, target_message.conversation_id)
+    return target_message, conversation.owner_user_id if conversation else None
+
 
-    result = runner.chat(prompt=message_text(target_message.content_json), files=[])
-    assistant = ConversationMessage(
+def _record_regenerate(
+    session: Session, target_message: ConversationMessage, result: OpenAIResult
+) -> ConversationMessage:
+    assistant = build_text_message(
+        session,
+        result.text,
         conversation_id=target_message.conversation_id,
         parent_message_id=target_message.id,
         role="assistant",
-        content_json=serialize_message_text(result.text),
     )
+    attach_to_parent(session, assistant, target_message)
     session.add(assistant)
-    session.commit()
-    session.refresh(assistant)
 
     run = ConversationRun(
         conversation_id=target_message.conversation_id,
@@ -139,6 +379,8 @@ def regenerate_message(session: Session, message_id: str, runner: OpenAIRunner)
         model_name=MODEL_NAME,
         summary="regenerate completed",
         warnings_json=json.dumps(result.warnings),
+        queue_wait_ms=round(result.queued_seconds * 1000),
+        queue_priority=PRIORITY_INTERACTIVE,
         started_at=datetime.utcnow(),
         finished_at=datetime.utcnow(),
     )
@@ -151,4 +393,21 @@ def regenerate_message(session: Session, message_id: str, runner: OpenAIRunner)
         session.add(conversation)
 
     session.commit()
+    record_cleanup_warnings(session.engine, run.id, result.cleanup)
+    message_path_cache.extend(target_message.id, assistant.id)
     return assistant
+
+
+def regenerate_message(session: Session, message_id: str, runner: OpenAIRunner) -> ConversationMessage:
+    target_message, tenant = _regenerate_target(session, message_id)
+    # Regenerating asks for a different answer, so the response cache is bypassed.
+    result = runner.chat(prompt=stored_message_text(target_message, session), files=[], use_cache=False, tenant=tenant)
+    return _record_regenerate(session, target_message, result)
+
+
+async def aregenerate_message(session: Session, message_id: str, runner: OpenAIRunner) -> ConversationMessage:
+    target_message, tenant = _regenerate_target(session, message_id)
+    result = await runner.achat(
+        prompt=stored_message_text(target_message, session), files=[], use_cache=False, tenant=tenant
+    )
+    return _record_regenerate(session, target_message, result)
@@ -1,11 +1,27 @@
+import asyncio
 import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
 
 from app.models import Conversation, ConversationRun, FileBinding, FileRecord, FileSummary
-from app.services.openai_runner import OpenAIRunner
+from app.services.admission import PRIORITY_BACKGROUND
+from app.services.openai_runner import OpenAIResult, OpenAIRunner
+from app.services.run_warnings import record_cleanup_warnings
 from fastapi import HTTPException
 from sqlmodel import Session, select
 
+SUMMARY_TYPE = "short"
+FILE_SUMMARY_PRECOMPUTE = os.getenv("FILE_SUMMARY_PRECOMPUTE", "0") == "1"
+_precompute_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FILE_SUMMARY_PRECOMPUTE_WORKERS", "2")), thread_name_prefix="summary-precompute"
+)
+# How long a summarize request waits for an in-flight precompute before making the model call itself.
+FILE_SUMMARY_PRECOMPUTE_WAIT_SECONDS = float(os.getenv("FILE_SUMMARY_PRECOMPUTE_WAIT_SECONDS", "30"))
+_precompute_in_flight: dict[str, Future] = {}
+_precompute_lock = threading.Lock()
+
 
 def get_or_create_binding(session: Session, conversation_id: str, file_id: str) -> FileBinding:
     statement = select(FileBinding).where(
@@ -22,7 +38,56 @@ def get_or_create_binding(session: Session, conversation_id: str, file_id: str)
     return binding
 
 
-def summarize_file(session: Session, conversation_id: str, file_id: str, runner: OpenAIRunner) -> FileSummary:
+def summary_source_key(file_record: FileRecord) -> str | None:
+    if not file_record.content_sha256:
+        return None
+    return f"{file_record.storage_key}:{file_record.content_sha256}"
+
+
+def _latest_summary(session: Session, column, value: str, summary_type: str) -> FileSummary | None:
+    return session.exec(
+        select(FileSummary)
+        .where(column == value, FileSummary.summary_type == summary_type)
+        .order_by(FileSummary.created_at.desc())
+        .limit(1)
+    ).first()
+
+
+def find_reusable_summary(
+    session: Session, file_record: FileRecord, summary_type: str = SUMMARY_TYPE
+) -> FileSummary | None:
+    source_key = summary_source_key(file_record)
+    current = _latest_summary(session, FileSummary.file_id, file_record.id, summary_type)
+    if current and current.created_at >= file_record.updated_at and current.source_key == source_key:
+        return current
+    if source_key is None:
+        return None
+    # Same bytes at the same storage key were summarized elsewhere: copy the text, skip the model call.
+    shared = _latest_summary(session, FileSummary.source_key, source_key, summary_type)
+    if not shared:
+        return None
+    summary = FileSummary(
+        file_id=file_record.id,
+        conversation_id=file_record.conversation_id,
+        summary_type=summary_type,
+        content=shared.content,
+        source_key=source_key,
+    )
+    session.add(summary)
+    session.commit()
+    session.refresh(summary)
+    return summary
+
+
+def _file_payload(file_record: FileRecord) -> dict:
+    return {
+        "filename": file_record.filename,
+        "content": f"placeholder content for {file_record.filename}".encode(),
+        "content_type": file_record.mime_type,
+    }
+
+
+def _summary_input(session: Session, conversation_id: str, file_id: str) -> tuple[Conversation, FileRecord]:
     conversation = session.get(Conversation, conversation_id)
     if not conversation:
         raise HTTPException(status_code=404, detail="conversation not found")
@@ -34,15 +99,24 @@ def summarize_file(session: Session, conversation_id: str, file_id: str, runner:
     binding = get_or_create_binding(session, conversation_id, file_id)
     if not binding.included_in_context:
         raise HTTPException(status_code=400, detail="file must be included before summarize")
+    return conversation, file_record
 
-    file_payload = {
-        "filename": file_record.filename,
-        "content": f"placeholder content for {file_record.filename}".encode(),
-        "content_type": file_record.mime_type,
+
+def _summary_request(file_record: FileRecord, tenant: str | None) -> dict:
+    # Summaries are background work: they queue behind interactive chat turns.
+    return {
+        "prompt": f"Summarize file: {file_record.filename}",
+        "files": [_file_payload(file_record)],
+        "tenant": tenant,
+        "priority": PRIORITY_BACKGROUND,
     }
-    result = runner.chat(prompt=f"Summarize file: {file_record.filename}", files=[file_payload])
+
+
+def _record_summary(
+    session: Session, file_record: FileRecord, result: OpenAIResult, runner: OpenAIRunner
+) -> FileSummary:
     run = ConversationRun(
-        conversation_id=conversation_id,
+        conversation_id=file_record.conversation_id,
         message_id=None,
         branch_leaf_message_id=None,
         run_type="summarize_file",
@@ -50,18 +124,104 @@ def summarize_file(session: Session, conversation_id: str, file_id: str, runner:
         model_name=runner.model_name,
         summary=f"summary generated for {file_record.filename}",
         warnings_json=json.dumps(result.warnings),
+        response_cache_hits=result.cache_hits,
+        response_cache_misses=result.cache_misses,
+        queue_wait_ms=round(result.queued_seconds * 1000),
+        queue_priority=PRIORITY_BACKGROUND,
         started_at=datetime.utcnow(),
         finished_at=datetime.utcnow(),
     )
     session.add(run)
 
     summary = FileSummary(
-        file_id=file_id,
-        conversation_id=conversation_id,
-        summary_type="short",
+        file_id=file_record.id,
+        conversation_id=file_record.conversation_id,
+        summary_type=SUMMARY_TYPE,
         content=result.text,
+        source_key=summary_source_key(file_record),
     )
     session.add(summary)
     session.commit()
+    record_cleanup_warnings(session.engine, run.id, result.cleanup)
     session.refresh(summary)
     return summary
+
+
+def summarize_file(
+    session: Session, conversation_id: str, file_id: str, runner: OpenAIRunner, force: bool = False
+) -> FileSummary:
+    conversation, file_record = _summary_input(session, conversation_id, file_id)
+    if not force:
+        future = _precompute_in_flight.get(file_id)
+        if future is not None:
+            wait([future], timeout=FILE_SUMMARY_PRECOMPUTE_WAIT_SECONDS)
+        existing = find_reusable_summary(session, file_record)
+        if existing:
+            return existing
+    result = runner.chat(**_summary_request(file_record, conversation.owner_user_id))
+    return _record_summary(session, file_record, result, runner)
+
+
+async def asummarize_file(
+    session: Session, conversation_id: str, file_id: str, runner: OpenAIRunner, force: bool = False
+) -> FileSummary:
+    conversation, file_record = _summary_input(session, conversation_id, file_id)
+    if not force:
+        future = _precompute_in_flight.get(file_id)
+        if future is not None:
+            await asyncio.wait([asyncio.wrap_future(future)], timeout=FILE_SUMMARY_PRECOMPUTE_WAIT_SECONDS)
+        existing = find_reusable_summary(session, file_record)
+        if existing:
+            return existing
+    result = await runner.achat(**_summary_request(file_record, conversation.owner_user_id))
+    return _record_summary(session, file_record, result, runner)
+
+
+def _precompute_summary(engine, file_id: str, runner: OpenAIRunner) -> FileSummary | None:
+    with Session(engine) as session:
+        file_record = session.get(FileRecord, file_id)
+        if not file_record:
+            return None
+        existing = find_reusable_summary(session, file_record)
+        if existing:
+            return existing
+        conversation = session.get(Conversation, file_record.conversation_id)
+        tenant = conversation.owner_user_id if conversation else None
+        started_at = datetime.utcnow()
+        try:
+            result = runner.chat(**_summary_request(file_record, tenant))
+        except Exception as exc:
+            # Nobody awaits a precompute, so the failure is kept on a run the right panel shows.
+            session.add(
+                ConversationRun(
+                    conversation_id=file_record.conversation_id,
+                    run_type="summarize_file",
+                    status="failed",
+                    model_name=runner.model_name,
+                    summary=f"summary precompute failed for {file_record.filename}",
+                    error_text=str(exc),
+                    queue_priority=PRIORITY_BACKGROUND,
+                    started_at=started_at,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            session.commit()
+            raise
+        return _record_summary(session, file_record, result, runner)
+
+
+def schedule_summary_precompute(engine, file_id: str, runner: OpenAIRunner) -> Future:
+    # A summarize request arriving while this runs waits for it instead of paying for a second model call.
+    with _precompute_lock:
+        future = _precompute_in_flight.get(file_id)
+        if future is not None:
+            return future
+        future = _precompute_in_flight[file_id] = _precompute_pool.submit(_precompute_summary, engine, file_id, runner)
+
+    def forget(done: Future) -> None:
+        with _precompute_lock:
+            if _precompute_in_flight.get(file_id) is done:
+                del _precompute_in_flight[file_id]
+
+    future.add_done_callback(forget)
+    return future
@@ -0,0 +1,144 @@
+import json
+from typing import Optional
+
+from app.models import ConversationMessage
+from app.schemas import SiblingPosition
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+
+def skip_ids(message: ConversationMessage) -> list[str]:
+    return json.loads(message.skip_ids_json)
+
+
+def attach_to_parent(session: Session, message: ConversationMessage, parent: Optional[ConversationMessage]) -> None:
+    if parent is None:
+        message.depth = 0
+        message.skip_ids_json = "[]"
+        return
+    pointers = [parent.id]
+    ancestor = parent
+    while True:
+        ancestor_skips = skip_ids(ancestor)
+        level = len(pointers) - 1
+        if level >= len(ancestor_skips):
+            break
+        pointers.append(ancestor_skips[level])
+        ancestor = session.get(ConversationMessage, pointers[-1])
+    message.depth = parent.depth + 1
+    message.skip_ids_json = json.dumps(pointers)
+
+
+def backfill_tree_pointers(session: Session) -> int:
+    # Messages written before depth/skip pointers existed read back as depth 0 with no pointers. Rebuild them
+    # top-down (a parent before its children, since attach_to_parent reads the parent's pointers) and commit
+    # each row so the next lookup sees it.
+    stale = {
+        message.id: message
+        for message in session.exec(select(ConversationMessage).where(ConversationMessage.skip_ids_json == "[]")).all()
+        if message.parent_message_id
+    }
+    repaired = 0
+    while stale:
+        chain = [stale.pop(next(iter(stale)))]
+        while chain[-1].parent_message_id in stale:
+            chain.append(stale.pop(chain[-1].parent_message_id))
+        for message in reversed(chain):
+            attach_to_parent(session, message, session.get(ConversationMessage, message.parent_message_id))
+            session.add(message)
+            session.commit()
+            repaired += 1
+    return repaired
+
+
+def load_parent(
+    session: Session, conversation_id: str, parent_message_id: Optional[str]
+) -> Optional[ConversationMessage]:
+    if parent_message_id is None:
+        return None
+    parent = session.get(ConversationMessage, parent_message_id)
+    if not parent or parent.conversation_id != conversation_id:
+        raise HTTPException(status_code=404, detail="parent message not found")
+    return parent
+
+
+def walk_up(session: Session, message: Optional[ConversationMessage], count: int) -> list[ConversationMessage]:
+    path: list[ConversationMessage] = []
+    current = message
+    while current and len(path) < count:
+        path.append(current)
+        current = session.get(ConversationMessage, current.parent_message_id) if current.parent_message_id else None
+    path.reverse()
+    return path
+
+
+def ancestor_at_depth(session: Session, message: ConversationMessage, depth: int) -> Optional[ConversationMessage]:
+    if depth < 0 or depth > message.depth:
+        return None
+    steps = message.depth - depth
+    current = message
+    level = steps.bit_length() - 1
+    while steps:
+        if steps >= 1 << level:
+            current = session.get(ConversationMessage, skip_ids(current)[level])
+            steps -= 1 << level
+        level -= 1
+    return current
+
+
+def is_ancestor(session: Session, ancestor: ConversationMessage, descendant: ConversationMessage) -> bool:
+    lifted = ancestor_at_depth(session, descendant, ancestor.depth)
+    return lifted is not None and lifted.id == ancestor.id
+
+
+def lowest_common_ancestor(
+    session: Session, left: ConversationMessage, right: ConversationMessage
+) -> Optional[ConversationMessage]:
+    if left.conversation_id != right.conversation_id:
+        return None
+    if left.depth > right.depth:
+        left = ancestor_at_depth(session, left, right.depth)
+    elif right.depth > left.depth:
+        right = ancestor_at_depth(session, right, left.depth)
+    if left.id == right.id:
+        return left
+    for level in reversed(range(len(skip_ids(left)))):
+        left_skips, right_skips = skip_ids(left), skip_ids(right)
+        if level < len(left_skips) and left_skips[level] != right_skips[level]:
+            left = session.get(ConversationMessage, left_skips[level])
+            right = session.get(ConversationMessage, right_skips[level])
+    if not left.parent_message_id or left.parent_message_id != right.parent_message_id:
+        return None
+    return session.get(ConversationMessage, left.parent_message_id)
+
+
+def list_children(
+    session: Session, conversation_id: str, parent_message_id: Optional[str]
+) -> list[ConversationMessage]:
+    return session.exec(
+        select(ConversationMessage)
+        .where(
+            ConversationMessage.conversation_id == conversation_id,
+            ConversationMessage.parent_message_id == parent_message_id,
+        )
+        .order_by(ConversationMessage.created_at.asc())
+    ).all()
+
+
+def sibling_positions(session: Session, path: list[ConversationMessage]) -> list[SiblingPosition]:
+    positions: list[SiblingPosition] = []
+    for message in path:
+        sibling_ids = [
+            sibling.id for sibling in list_children(session, message.conversation_id, message.parent_message_id)
+        ]
+        ordinal = sibling_ids.index(message.id)
+        positions.append(
+            SiblingPosition(
+                message_id=message.id,
+                sibling_count=len(sibling_ids),
+                ordinal=ordinal + 1,
+                previous_sibling_id=sibling_ids[ordinal - 1] if ordinal > 0 else None,
+                next_sibling_id=sibling_ids[ordinal + 1] if ordinal + 1 < len(sibling_ids) else None,
+            )
+        )
+    return positions
@@ -0,0 +1,245 @@
+import http.client
+import json
+import os
+import re
+import selectors
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from urllib.parse import quote, urlsplit
+from uuid import uuid4
+
+DEFAULT_OPENAI_BASE_URL = "https://api.openai.com/v1"
+# Either setting switches the process-wide runner from the offline stub to the HTTP client.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_POOL_MAX_CONNECTIONS = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "10"))
+OPENAI_POOL_IDLE_SECONDS = float(os.getenv("OPENAI_POOL_IDLE_SECONDS", "60"))
+OPENAI_HTTP_TIMEOUT_SECONDS = float(os.getenv("OPENAI_HTTP_TIMEOUT_SECONDS", "60"))
+
+# Errors that mean a kept-alive socket was closed by the server while it sat idle in the pool.
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+# Requests that may be sent twice without changing the outcome.
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class OpenAIHTTPError(Exception):
+    def __init__(self, status: int, body: str):
+        super().__init__(f"upstream returned {status}: {body[:200]}")
+        self.status = status
+        self.body = body
+
+
+class HTTPConnectionPool:
+    # Keep-alive connections to a single origin. At most max_connections are open at once; callers beyond that
+    # wait for a free slot. Connections idle for longer than idle_timeout are closed instead of reused.
+    def __init__(
+        self,
+        base_url: str,
+        max_connections: int = OPENAI_POOL_MAX_CONNECTIONS,
+        timeout: float = OPENAI_HTTP_TIMEOUT_SECONDS,
+        idle_timeout: float = OPENAI_POOL_IDLE_SECONDS,
+    ):
+        parsed = urlsplit(base_url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ValueError(f"unsupported base url: {base_url}")
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.connections_opened = 0
+        self._idle: list[tuple[float, http.client.HTTPConnection]] = []
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> http.client.HTTPConnection:
+        connection_class = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        with self._lock:
+            self.connections_opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _dropped(self, connection: http.client.HTTPConnection) -> bool:
+        # An idle keep-alive socket has nothing to read; if it is readable the server closed it (or sent garbage).
+        # A selector rather than select.select(), which fails on descriptors numbered 1024 and up.
+        if connection.sock is None:
+            return False
+        try:
+            with selectors.DefaultSelector() as selector:
+                selector.register(connection.sock, selectors.EVENT_READ)
+                return bool(selector.select(0))
+        except (OSError, ValueError):
+            return True
+
+    def _checkout(self) -> tuple[http.client.HTTPConnection, bool]:
+        self._slots.acquire()
+        try:
+            return self._reuse_or_connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _reuse_or_connect(self) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        stale = []
+        connection = None
+        with self._lock:
+            while self._idle:
+                idle_since, candidate = self._idle.pop()
+                if now - idle_since < self.idle_timeout and not self._dropped(candidate):
+                    connection = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if connection is not None:
+            return connection, True
+        return self._connect(), False
+
+    def _checkin(self, connection: http.client.HTTPConnection, reusable: bool) -> None:
+        with self._lock:
+            if reusable and not self._closed:
+                self._idle.append((time.monotonic(), connection))
+                connection = None
+        if connection is not None:
+            connection.close()
+        self._slots.release()
+
+    @contextmanager
+    def open(
+        self, method: str, path: str, body: bytes | None = None, headers: dict | None = None
+    ) -> Iterator[http.client.HTTPResponse]:
+        # Yields the response with its body unread; the connection goes back to the pool unless the caller raised
+        # or the server asked to close it. A reused connection that turns out to be closed is replaced, but a
+        # non-idempotent request is only resent if it never left this process.
+        while True:
+            connection, reused = self._checkout()
+            sent = False
+            try:
+                connection.request(method, f"{self.base_path}{path}", body=body, headers=headers or {})
+                sent = True
+                response = connection.getresponse()
+            except _STALE_CONNECTION_ERRORS:
+                self._checkin(connection, reusable=False)
+                if reused and (not sent or method in _IDEMPOTENT_METHODS):
+                    continue
+                raise
+            except BaseException:
+                self._checkin(connection, reusable=False)
+                raise
+            break
+        try:
+            yield response
+            # Drain whatever the caller left unread so the connection can carry the next request.
+            response.read()
+        except BaseException:
+            self._checkin(connection, reusable=False)
+            raise
+        self._checkin(connection, reusable=not response.will_close)
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None, headers: dict | None = None
+    ) -> tuple[int, bytes]:
+        with self.open(method, path, body=body, headers=headers) as response:
+            return response.status, response.read()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for _, connection in idle:
+            connection.close()
+
+
+def _form_filename(filename: str) -> str:
+    # Content-Disposition parameters for a file part: a sanitized ASCII fallback plus the exact name as an
+    # RFC 5987 extended value, so quotes, line breaks and non-ASCII names cannot break the multipart framing.
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', "_", filename) or "file"
+    return f"filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+_MIME_TYPE = re.compile(r"[A-Za-z0-9][A-Za-z0-9!#$&^_.+-]*/[A-Za-z0-9][A-Za-z0-9!#$&^_.+-]*")
+
+
+def _form_content_type(content_type: str | None) -> str:
+    # The type comes from user-registered file metadata; anything but a bare type/subtype is not trusted.
+    if content_type and _MIME_TYPE.fullmatch(content_type):
+        return content_type
+    return "application/octet-stream"
+
+
+def _output_text(response: dict) -> str:
+    return "".join(
+        content.get("text", "")
+        for item in response.get("output") or []
+        for content in item.get("content") or []
+        if content.get("type") == "output_text"
+    )
+
+
+class HTTPOpenAIClient:
+    # Blocking Responses/Files API client that sends every call through one shared connection pool.
+    def __init__(self, pool: HTTPConnectionPool, api_key: str | None = None):
+        self.pool = pool
+        self.api_key = api_key
+
+    def _headers(self, content_type: str | None = "application/json") -> dict:
+        headers = {"Connection": "keep-alive"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _call(self, method: str, path: str, body: bytes | None = None, content_type: str | None = None) -> dict:
+        status, data = self.pool.request(method, path, body=body, headers=self._headers(content_type))
+        text = data.decode("utf-8", errors="replace")
+        if status >= 400:
+            raise OpenAIHTTPError(status, text)
+        return json.loads(text) if text else {}
+
+    def create_response(self, payload: dict) -> dict:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        response = self._call("POST", "/responses", body, "application/json")
+        if "output_text" not in response:
+            response["output_text"] = _output_text(response)
+        return response
+
+    def stream_response(self, payload: dict) -> Iterator[str]:
+        body = json.dumps({**payload, "stream": True}, ensure_ascii=False).encode("utf-8")
+        with self.pool.open("POST", "/responses", body=body, headers=self._headers()) as response:
+            if response.status >= 400:
+                raise OpenAIHTTPError(response.status, response.read().decode("utf-8", errors="replace"))
+            for raw_line in response:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    continue
+                event = json.loads(data)
+                if event.get("type") == "response.output_text.delta":
+                    yield event.get("delta", "")
+
+    def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        boundary = uuid4().hex
+        body = b"".join(
+            [
+                f'--{boundary}\r\nContent-Disposition: form-data; name="purpose"\r\n\r\nuser_data\r\n'.encode(),
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; {_form_filename(filename)}\r\n'.encode(),
+                f"Content-Type: {_form_content_type(content_type)}\r\n\r\n".encode(),
+                content,
+                f"\r\n--{boundary}--\r\n".encode(),
+            ]
+        )
+        return self._call("POST", "/files", body, f"multipart/form-data; boundary={boundary}")["id"]
+
+    def delete_file(self, file_id: str) -> None:
+        self._call("DELETE", f"/files/{file_id}")
+
+    def close(self) -> None:
+        self.pool.close()
@@ -1,7 +1,41 @@
+import asyncio
+import functools
+import hashlib
+import heapq
+import itertools
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass, field
-from typing import Protocol
+from typing import Awaitable, Callable, Iterator, Protocol
+
+from app.services.admission import PRIORITY_INTERACTIVE, Admission, AdmissionScheduler, admission_scheduler
+from app.services.call_policy import CallPolicy, call_policy
+from app.services.openai_http import (
+    DEFAULT_OPENAI_BASE_URL,
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_POOL_MAX_CONNECTIONS,
+    HTTPConnectionPool,
+    HTTPOpenAIClient,
+)
+
+UPLOAD_CONCURRENCY = int(os.getenv("OPENAI_UPLOAD_CONCURRENCY", "4"))
+FILE_DELETE_MAX_ATTEMPTS = int(os.getenv("OPENAI_FILE_DELETE_MAX_ATTEMPTS", "3"))
+FILE_DELETE_RETRY_SECONDS = float(os.getenv("OPENAI_FILE_DELETE_RETRY_SECONDS", "0.5"))
+UPLOAD_CACHE_TTL_SECONDS = float(os.getenv("OPENAI_UPLOAD_CACHE_TTL_SECONDS", "900"))
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv("OPENAI_UPLOAD_CACHE_MAX_ENTRIES", "256"))
+# How long close_runner() waits for the drained uploads to be deleted remotely.
+UPLOAD_CACHE_DRAIN_SECONDS = float(os.getenv("OPENAI_UPLOAD_CACHE_DRAIN_SECONDS", "5"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("OPENAI_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("OPENAI_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_MAX_DISK_ENTRIES = int(os.getenv("OPENAI_RESPONSE_CACHE_MAX_DISK_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_DISK_BYTES = int(os.getenv("OPENAI_RESPONSE_CACHE_MAX_DISK_BYTES", str(256 * 1024 * 1024)))
+RESPONSE_CACHE_DIR = os.getenv("OPENAI_RESPONSE_CACHE_DIR")
 
 
 class OpenAIClientProtocol(Protocol):
@@ -12,10 +46,353 @@ class OpenAIClientProtocol(Protocol):
     def delete_file(self, file_id: str) -> None: ...
 
 
+class ResponseCacheProtocol(Protocol):
+    def get(self, key: str) -> str | None: ...
+
+    def put(self, key: str, text: str) -> None: ...
+
+
+class AsyncOpenAIClientProtocol(Protocol):
+    async def create_response(self, payload: dict) -> dict: ...
+
+    async def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str: ...
+
+    async def delete_file(self, file_id: str) -> None: ...
+
+
+class CleanupTicket:
+    # Tracks background deletion of one call's uploads. Listeners see every failure exactly once, including
+    # failures that happened before they subscribed.
+    def __init__(self, pending: int = 0):
+        self.warnings: list[str] = []
+        self._pending = pending
+        self._listeners: list[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if pending == 0:
+            self._done.set()
+
+    def add_warning(self, warning: str) -> None:
+        with self._lock:
+            self.warnings.append(warning)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(warning)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+            existing = list(self.warnings)
+        for warning in existing:
+            listener(warning)
+
+    def finish_one(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            if self._pending <= 0:
+                self._done.set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+
+class FileDeletionQueue:
+    # One daemon worker deletes uploaded files after the response has been returned; failed deletes are
+    # retried with exponential backoff and reported on the ticket once attempts run out.
+    def __init__(self, max_attempts: int = FILE_DELETE_MAX_ATTEMPTS, retry_delay: float = FILE_DELETE_RETRY_SECONDS):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._jobs: list[tuple[float, int, Callable[[str], None], str, int, CleanupTicket]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+    def submit(self, delete: Callable[[str], None], file_ids: list[str]) -> CleanupTicket:
+        ticket = CleanupTicket(len(file_ids))
+        if not file_ids:
+            return ticket
+        with self._condition:
+            for file_id in file_ids:
+                self._push(time.monotonic(), delete, file_id, 1, ticket)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="file-deletion-queue", daemon=True)
+                self._worker.start()
+            self._condition.notify()
+        return ticket
+
+    def _push(self, due: float, delete: Callable[[str], None], file_id: str, attempt: int, ticket: CleanupTicket):
+        heapq.heappush(self._jobs, (due, next(self._sequence), delete, file_id, attempt, ticket))
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._jobs or self._jobs[0][0] > time.monotonic():
+                    self._condition.wait(self._jobs[0][0] - time.monotonic() if self._jobs else None)
+                _, _, delete, file_id, attempt, ticket = heapq.heappop(self._jobs)
+            try:
+                delete(file_id)
+            except Exception as exc:  # noqa: BLE001
+                if attempt < self.max_attempts:
+                    with self._condition:
+                        due = time.monotonic() + self.retry_delay * 2 ** (attempt - 1)
+                        self._push(due, delete, file_id, attempt + 1, ticket)
+                    continue
+                ticket.add_warning(f"cleanup failed for {file_id} after {attempt} attempts: {exc}")
+            ticket.finish_one()
+
+
+deletion_queue = FileDeletionQueue()
+
+
+def upload_key(file_obj: dict) -> tuple[str, str]:
+    return hashlib.sha256(file_obj["content"]).hexdigest(), file_obj["filename"]
+
+
+class _CachedUpload:
+    def __init__(self):
+        self.remote_id: str | None = None
+        self.error: BaseException | None = None
+        self.delete: Callable[[str], None] | None = None
+        self.refs = 1
+        self.idle_since = 0.0
+        self.ready = threading.Event()
+
+
+class UploadCache:
+    # Remote file ids keyed by (content sha256, filename). A file stays uploaded while any call holds a
+    # reference; once idle for ttl seconds, or pushed out by max_entries, the remote copy is deleted. A timer
+    # wakes the sweep when the oldest idle entry expires, so expiry does not wait for the next release.
+    # One cache must only be shared by runners talking to the same remote account.
+    def __init__(
+        self,
+        ttl: float = UPLOAD_CACHE_TTL_SECONDS,
+        max_entries: int = UPLOAD_CACHE_MAX_ENTRIES,
+        deletions: FileDeletionQueue | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.deletions = deletions or deletion_queue
+        self._entries: dict[tuple[str, str], _CachedUpload] = {}
+        self._keys_by_remote_id: dict[str, tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+        self._timer_due = 0.0
+
+    def _claim(self, key: tuple[str, str]) -> tuple[_CachedUpload, bool]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.refs += 1
+                return entry, False
+            entry = self._entries[key] = _CachedUpload()
+            return entry, True
+
+    def _publish(self, key: tuple[str, str], entry: _CachedUpload, remote_id: str, delete: Callable[[str], None]):
+        with self._lock:
+            entry.remote_id = remote_id
+            entry.delete = delete
+            self._keys_by_remote_id[remote_id] = key
+        entry.ready.set()
+
+    def _fail(self, key: tuple[str, str], entry: _CachedUpload, error: BaseException) -> None:
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+            entry.error = error
+        entry.ready.set()
+
+    def _joined(self, entry: _CachedUpload) -> str:
+        if entry.error is not None:
+            raise entry.error
+        return entry.remote_id
+
+    def acquire(self, key: tuple[str, str], upload: Callable[[], str], delete: Callable[[str], None]) -> str:
+        entry, owner = self._claim(key)
+        if not owner:
+            entry.ready.wait()
+            return self._joined(entry)
+        try:
+            remote_id = upload()
+        except BaseException as exc:
+            self._fail(key, entry, exc)
+            raise
+        self._publish(key, entry, remote_id, delete)
+        return remote_id
+
+    async def aacquire(
+        self, key: tuple[str, str], upload: Callable[[], Awaitable[str]], delete: Callable[[str], None]
+    ) -> str:
+        entry, owner = self._claim(key)
+        if not owner:
+            await asyncio.to_thread(entry.ready.wait)
+            return self._joined(entry)
+        try:
+            remote_id = await upload()
+        except BaseException as exc:
+            self._fail(key, entry, exc)
+            raise
+        self._publish(key, entry, remote_id, delete)
+        return remote_id
+
+    def release(self, remote_ids: list[str]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for remote_id in remote_ids:
+                entry = self._entries.get(self._keys_by_remote_id.get(remote_id))
+                if entry is not None and entry.remote_id == remote_id:
+                    entry.refs -= 1
+                    entry.idle_since = now
+        self.sweep()
+
+    def sweep(self) -> None:
+        self._evict(drain=False)
+
+    def drain(self) -> list[CleanupTicket]:
+        # Deletes every idle upload now, regardless of ttl; entries still held by a call are left to their release.
+        return self._evict(drain=True)
+
+    def _evict(self, drain: bool) -> list[CleanupTicket]:
+        now = time.monotonic()
+        with self._lock:
+            idle = sorted(
+                ((entry.idle_since, key) for key, entry in self._entries.items() if entry.refs <= 0),
+                key=lambda item: item[0],
+            )
+            overflow = max(0, len(self._entries) - self.max_entries)
+            evicted = []
+            next_expiry = None
+            for position, (idle_since, key) in enumerate(idle):
+                if not drain and position >= overflow and now - idle_since < self.ttl:
+                    next_expiry = idle_since + self.ttl
+                    break
+                entry = self._entries.pop(key)
+                self._keys_by_remote_id.pop(entry.remote_id, None)
+                evicted.append(entry)
+            self._wake_at(next_expiry)
+        return [self.deletions.submit(entry.delete, [entry.remote_id]) for entry in evicted]
+
+    def _wake_at(self, due: float | None) -> None:
+        # Caller holds the lock.
+        if due is None:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            return
+        if self._timer is not None and self._timer.is_alive() and self._timer_due <= due:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(max(0.0, due - time.monotonic()), self.sweep)
+        self._timer.daemon = True
+        self._timer_due = due
+        self._timer.start()
+
+
+upload_cache = UploadCache()
+
+
+class TieredResponseCache:
+    # In-process LRU in front of an optional directory of <key>.json files; both tiers expire entries after
+    # ttl seconds and trim the oldest entries beyond their size limit. Disk hits are promoted to memory.
+    # The directory is scanned once at startup; after that its entry count and size are tracked in memory, so
+    # a put only deletes files when the disk tier is over budget.
+    def __init__(
+        self,
+        directory: str | None = RESPONSE_CACHE_DIR,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_disk_entries: int = RESPONSE_CACHE_MAX_DISK_ENTRIES,
+        max_disk_bytes: int = RESPONSE_CACHE_MAX_DISK_BYTES,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Disk entries oldest write first, with their file sizes.
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".json")]
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                self._disk[entry.name[: -len(".json")]] = entry.stat().st_size
+                self._disk_bytes += entry.stat().st_size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as handle:
+                expires_at, text = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if expires_at <= now:
+            with self._disk_lock:
+                self._forget_disk(key)
+            return None
+        self._remember(key, expires_at, text)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, text)
+        if not self.directory:
+            return
+        path = self._path(key)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        data = json.dumps([expires_at, text], ensure_ascii=False).encode("utf-8")
+        with open(temporary, "wb") as handle:
+            handle.write(data)
+        size = len(data)
+        os.replace(temporary, path)
+        with self._disk_lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            while self._disk and (len(self._disk) > self.max_disk_entries or self._disk_bytes > self.max_disk_bytes):
+                self._forget_disk(next(iter(self._disk)))
+
+    def _remember(self, key: str, expires_at: float, text: str) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, text)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _forget_disk(self, key: str) -> None:
+        # Caller holds the disk lock.
+        self._disk_bytes -= self._disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+response_cache = TieredResponseCache()
+
+
 @dataclass
 class OpenAIResult:
     text: str
     warnings: list[str] = field(default_factory=list)
+    cleanup: CleanupTicket = field(default_factory=CleanupTicket)
+    cache_hits: int = 0
+    cache_misses: int = 0
+    queued_seconds: float = 0.0
 
 
 class StubOpenAIClient:
@@ -23,6 +400,11 @@ class StubOpenAIClient:
         user_text = payload.get("input", "")
         return {"output_text": f"MVP assistant response: {user_text}"}
 
+    def stream_response(self, payload: dict) -> Iterator[str]:
+        text = self.create_response(payload)["output_text"]
+        for index, word in enumerate(text.split(" ")):
+            yield word if index == 0 else f" {word}"
+
     def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
         return f"stub-{filename}"
 
@@ -30,35 +412,363 @@ class StubOpenAIClient:
         _ = file_id
 
 
+class ThreadedAsyncClient:
+    # Adapts a blocking client to the async protocol. Calls run on an executor of its own, sized to the client's
+    # connection pool: more threads would only wait for a connection, and the loop's default executor is shared
+    # with everything else in the process.
+    def __init__(self, client: OpenAIClientProtocol, workers: int | None = None):
+        self.client = client
+        pool = getattr(client, "pool", None)
+        self.workers = max(1, workers or getattr(pool, "max_connections", OPENAI_POOL_MAX_CONNECTIONS))
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="model-client")
+            return self._pool
+
+    async def _run(self, fn: Callable, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(), functools.partial(fn, *args, **kwargs))
+
+    async def create_response(self, payload: dict) -> dict:
+        return await self._run(self.client.create_response, payload)
+
+    async def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        return await self._run(self.client.upload_file, filename=filename, content=content, content_type=content_type)
+
+    async def delete_file(self, file_id: str) -> None:
+        await self._run(self.client.delete_file, file_id)
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncStubOpenAIClient(ThreadedAsyncClient):
+    def __init__(self):
+        super().__init__(StubOpenAIClient())
+
+    async def create_response(self, payload: dict) -> dict:
+        return self.client.create_response(payload)
+
+    async def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        return self.client.upload_file(filename=filename, content=content, content_type=content_type)
+
+    async def delete_file(self, file_id: str) -> None:
+        self.client.delete_file(file_id)
+
+
+def _response_text(response: dict) -> str:
+    return response.get("output_text") or json.dumps(response, ensure_ascii=False)
+
+
 class OpenAIRunner:
-    def __init__(self, client: OpenAIClientProtocol | None = None, model_name: str | None = None):
+    def __init__(
+        self,
+        client: OpenAIClientProtocol | None = None,
+        model_name: str | None = None,
+        async_client: AsyncOpenAIClientProtocol | None = None,
+        deletions: FileDeletionQueue | None = None,
+        upload_concurrency: int = UPLOAD_CONCURRENCY,
+        upload_cache: UploadCache | None = None,
+        response_cache: ResponseCacheProtocol | None = None,
+        admission: AdmissionScheduler | None = None,
+        policy: CallPolicy | None = None,
+    ):
         self.client = client or StubOpenAIClient()
+        if async_client is None:
+            async_client = ThreadedAsyncClient(client) if client is not None else AsyncStubOpenAIClient()
+        self.async_client = async_client
         self.model_name = model_name or os.getenv("OPENAI_MODEL", "gpt-5.4")
+        self.deletions = deletions or deletion_queue
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.upload_cache = upload_cache
+        self.response_cache = response_cache
+        self.admission = admission
+        self.policy = policy
 
-    def chat(self, *, prompt: str, files: list[dict]) -> OpenAIResult:
-        uploaded_ids: list[str] = []
-        warnings: list[str] = []
-        try:
+    def _admit(self, tenant: str | None, priority: int):
+        if self.admission is None:
+            return nullcontext(Admission())
+        return self.admission.admit(tenant, priority)
+
+    def _aadmit(self, tenant: str | None, priority: int):
+        if self.admission is None:
+            return nullcontext(Admission())
+        return self.admission.aadmit(tenant, priority)
+
+    def _check_breaker(self) -> None:
+        # An open breaker rejects the call before it queues for admission or uploads any file.
+        if self.policy is not None:
+            self.policy.breaker.check()
+
+    def _create_response(self, payload: dict, warnings: list[str]) -> dict:
+        if self.policy is None:
+            return self.client.create_response(payload)
+        return self.policy.call(lambda: self.client.create_response(payload), warnings)
+
+    async def _acreate_response(self, payload: dict, warnings: list[str]) -> dict:
+        if self.policy is None:
+            return await self.async_client.create_response(payload)
+        return await self.policy.acall(lambda: self.async_client.create_response(payload), warnings)
+
+    def _upload_one(self, file_obj: dict) -> str:
+        def upload() -> str:
+            return self.client.upload_file(
+                filename=file_obj["filename"],
+                content=file_obj["content"],
+                content_type=file_obj.get("content_type"),
+            )
+
+        if self.upload_cache is None:
+            return upload()
+        return self.upload_cache.acquire(upload_key(file_obj), upload, self.client.delete_file)
+
+    def _release(self, uploaded_ids: list[str], delete: Callable[[str], None]) -> CleanupTicket:
+        if self.upload_cache is None:
+            return self.deletions.submit(delete, uploaded_ids)
+        self.upload_cache.release(uploaded_ids)
+        return CleanupTicket()
+
+    def _upload(self, files: list[dict], uploaded_ids: list[str]) -> None:
+        # Successful uploads land in uploaded_ids even when a sibling fails, so the caller can clean them up.
+        if len(files) <= 1 or self.upload_concurrency == 1:
             for file_obj in files:
-                file_id = self.client.upload_file(
+                uploaded_ids.append(self._upload_one(file_obj))
+            return
+        with ThreadPoolExecutor(max_workers=min(self.upload_concurrency, len(files))) as pool:
+            futures = [pool.submit(self._upload_one, file_obj) for file_obj in files]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        uploaded_ids.extend(future.result() for future in futures if future.exception() is None)
+        if errors:
+            raise errors[0]
+
+    async def _aupload(self, files: list[dict], uploaded_ids: list[str]) -> None:
+        semaphore = asyncio.Semaphore(self.upload_concurrency)
+
+        delete = self._async_deleter() if self.upload_cache is not None else None
+
+        async def upload(file_obj: dict) -> str:
+            def start_upload() -> Awaitable[str]:
+                return self.async_client.upload_file(
                     filename=file_obj["filename"],
                     content=file_obj["content"],
                     content_type=file_obj.get("content_type"),
                 )
-                uploaded_ids.append(file_id)
-
-            payload = {
-                "model": self.model_name,
-                "store": False,
-                "input": prompt,
-                "metadata": {"file_ids": uploaded_ids},
-            }
-            response = self.client.create_response(payload)
-            text = response.get("output_text") or json.dumps(response, ensure_ascii=False)
-            return OpenAIResult(text=text, warnings=warnings)
-        finally:
-            for file_id in uploaded_ids:
+
+            async with semaphore:
+                if self.upload_cache is None:
+                    return await start_upload()
+                return await self.upload_cache.aacquire(upload_key(file_obj), start_upload, delete)
+
+        results = await asyncio.gather(*(upload(file_obj) for file_obj in files), return_exceptions=True)
+        uploaded_ids.extend(result for result in results if not isinstance(result, BaseException))
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            raise errors[0]
+
+    def _async_deleter(self) -> Callable[[str], None]:
+        if isinstance(self.async_client, ThreadedAsyncClient):
+            return self.async_client.client.delete_file
+        loop = asyncio.get_running_loop()
+
+        def delete(file_id: str) -> None:
+            if loop.is_closed():
+                raise RuntimeError("event loop closed before cleanup")
+            asyncio.run_coroutine_threadsafe(self.async_client.delete_file(file_id), loop).result()
+
+        return delete
+
+    def _cache_key(
+        self, prompt: str, files: list[dict], params: dict | None, use_cache: bool, tenant: str | None
+    ) -> str | None:
+        # Answers are only shared within one tenant, never across owners.
+        if not use_cache or self.response_cache is None:
+            return None
+        file_hashes = [hashlib.sha256(file_obj["content"]).hexdigest() for file_obj in files]
+        material = json.dumps([tenant, self.model_name, prompt, file_hashes, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def _payload(self, prompt: str, uploaded_ids: list[str], params: dict | None = None) -> dict:
+        return {
+            **(params or {}),
+            "model": self.model_name,
+            "store": False,
+            "input": prompt,
+            "metadata": {"file_ids": uploaded_ids},
+        }
+
+    def chat(
+        self,
+        *,
+        prompt: str,
+        files: list[dict],
+        params: dict | None = None,
+        use_cache: bool = True,
+        tenant: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> OpenAIResult:
+        cache_key = self._cache_key(prompt, files, params, use_cache, tenant)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return OpenAIResult(text=cached, cache_hits=1)
+        self._check_breaker()
+        uploaded_ids: list[str] = []
+        warnings: list[str] = []
+        with self._admit(tenant, priority) as admission:
+            try:
+                self._upload(files, uploaded_ids)
+                response = self._create_response(self._payload(prompt, uploaded_ids, params), warnings)
+            finally:
+                cleanup = self._release(uploaded_ids, self.client.delete_file)
+        return self._finish(_response_text(response), warnings, cleanup, cache_key, admission)
+
+    async def achat(
+        self,
+        *,
+        prompt: str,
+        files: list[dict],
+        params: dict | None = None,
+        use_cache: bool = True,
+        tenant: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> OpenAIResult:
+        cache_key = self._cache_key(prompt, files, params, use_cache, tenant)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return OpenAIResult(text=cached, cache_hits=1)
+        self._check_breaker()
+        uploaded_ids: list[str] = []
+        warnings: list[str] = []
+        async with self._aadmit(tenant, priority) as admission:
+            try:
+                await self._aupload(files, uploaded_ids)
+                response = await self._acreate_response(self._payload(prompt, uploaded_ids, params), warnings)
+            finally:
+                cleanup = self._release(uploaded_ids, self._async_deleter())
+        return self._finish(_response_text(response), warnings, cleanup, cache_key, admission)
+
+    def _finish(
+        self, text: str, warnings: list[str], cleanup: CleanupTicket, cache_key: str | None, admission: Admission
+    ) -> OpenAIResult:
+        result = OpenAIResult(text=text, warnings=warnings, cleanup=cleanup, queued_seconds=admission.queued_seconds)
+        if cache_key is not None:
+            self.response_cache.put(cache_key, text)
+            result.cache_misses = 1
+        return result
+
+    def chat_stream(
+        self, *, prompt: str, files: list[dict], tenant: str | None = None, priority: int = PRIORITY_INTERACTIVE
+    ) -> "OpenAIStream":
+        return OpenAIStream(self, prompt, files, tenant, priority)
+
+    def close(self) -> None:
+        for client in (self.async_client, self.client):
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+
+
+class OpenAIStream:
+    # Iterating yields text deltas; text and cleanup are final once iteration finishes.
+    def __init__(
+        self,
+        runner: OpenAIRunner,
+        prompt: str,
+        files: list[dict],
+        tenant: str | None = None,
+        priority: int = PRIORITY_INTERACTIVE,
+    ):
+        self.runner = runner
+        self.prompt = prompt
+        self.files = files
+        self.tenant = tenant
+        self.priority = priority
+        self.warnings: list[str] = []
+        self.cleanup = CleanupTicket()
+        self.queued_seconds = 0.0
+        self._chunks: list[str] = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def __iter__(self) -> Iterator[str]:
+        # A stream is never retried once deltas may have reached the client; it only feeds the circuit breaker.
+        client = self.runner.client
+        policy = self.runner.policy
+        if policy is not None:
+            policy.breaker.before_call()
+        uploaded_ids: list[str] = []
+        error: BaseException | None = None
+        try:
+            with self.runner._admit(self.tenant, self.priority) as admission:
+                self.queued_seconds = admission.queued_seconds
                 try:
-                    self.client.delete_file(file_id)
-                except Exception as exc:  # noqa: BLE001
-                    warnings.append(f"cleanup failed for {file_id}: {exc}")
+                    self.runner._upload(self.files, uploaded_ids)
+                    payload = self.runner._payload(self.prompt, uploaded_ids)
+                    stream_response = getattr(client, "stream_response", None)
+                    if stream_response is None:
+                        response = client.create_response(payload)
+                        deltas: Iterator[str] = iter([_response_text(response)])
+                    else:
+                        deltas = stream_response(payload)
+                    for delta in deltas:
+                        self._chunks.append(delta)
+                        yield delta
+                finally:
+                    self.cleanup = self.runner._release(uploaded_ids, client.delete_file)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            if policy is not None:
+                policy.observe(error)
+
+
+def build_runner(base_url: str | None = OPENAI_BASE_URL, api_key: str | None = OPENAI_API_KEY) -> OpenAIRunner:
+    client = None
+    if base_url or api_key:
+        client = HTTPOpenAIClient(HTTPConnectionPool(base_url or DEFAULT_OPENAI_BASE_URL), api_key)
+    return OpenAIRunner(
+        client,
+        upload_cache=upload_cache,
+        response_cache=response_cache,
+        admission=admission_scheduler,
+        policy=call_policy,
+    )
+
+
+_runner: OpenAIRunner | None = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> OpenAIRunner:
+    # One runner per process, so every request shares its connection pool and caches.
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = build_runner()
+    return _runner
+
+
+def close_runner() -> None:
+    global _runner
+    with _runner_lock:
+        runner, _runner = _runner, None
+    if runner is None:
+        return
+    # Uploads cached by this runner would otherwise stay on the remote account after the process exits.
+    tickets = runner.upload_cache.drain() if runner.upload_cache is not None else []
+    deadline = time.monotonic() + UPLOAD_CACHE_DRAIN_SECONDS
+    for ticket in tickets:
+        ticket.wait(max(0.0, deadline - time.monotonic()))
+    runner.close()
@@ -0,0 +1,42 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi import HTTPException
+from sqlmodel import SelectQuery, Session
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(row: Any, order_field: str) -> str:
+    value: datetime = getattr(row, order_field)
+    raw = json.dumps([value.isoformat(), row.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, row_id = json.loads(raw)
+        return datetime.fromisoformat(value), row_id
+    except (binascii.Error, json.JSONDecodeError, TypeError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail="invalid cursor") from exc
+
+
+def check_limit(limit: int) -> None:
+    if limit < 1 or limit > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def paginate(session: Session, statement: SelectQuery, *, limit: int, cursor: str | None) -> tuple[list, str | None]:
+    check_limit(limit)
+    order_field = statement.order.field_name
+    if cursor:
+        statement = statement.after(*decode_cursor(cursor))
+    rows = session.exec(statement.limit(limit + 1)).all()
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1], order_field)
@@ -0,0 +1,23 @@
+import json
+import threading
+
+from app.models import ConversationRun
+from app.services.openai_runner import CleanupTicket
+from sqlmodel import Session
+
+_append_lock = threading.Lock()
+
+
+def append_run_warning(engine, run_id: str, warning: str) -> None:
+    with _append_lock, Session(engine) as session:
+        run = session.get(ConversationRun, run_id)
+        if not run:
+            return
+        run.warnings_json = json.dumps([*json.loads(run.warnings_json or "[]"), warning])
+        session.add(run)
+        session.commit()
+
+
+def record_cleanup_warnings(engine, run_id: str, cleanup: CleanupTicket) -> None:
+    # Subscribe only after the run is committed: deletions finish in the background and may fail before or after.
+    cleanup.subscribe(lambda warning: append_run_warning(engine, run_id, warning))
@@ -1,7 +1,21 @@
 from __future__ import annotations
 
+import bisect
+import contextlib
+import heapq
+import itertools
+import json
+import operator
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import types
+import typing
 from dataclasses import dataclass
-from typing import Any, Callable
+from datetime import datetime
+from typing import Any, Callable, Iterable, Iterator
 
 
 @dataclass
@@ -9,11 +23,21 @@ class _FieldInfo:
     default: Any = None
     default_factory: Callable[[], Any] | None = None
     primary_key: bool = False
+    index: bool = False
+
+
+class Index:
+    def __init__(self, name: str, *columns: str):
+        self.name = name
+        self.columns = columns
 
 
 class _Metadata:
-    def create_all(self, _engine: Any) -> None:
-        return None
+    def __init__(self) -> None:
+        self.tables: list[type[SQLModel]] = []
+
+    def create_all(self, engine: Any) -> None:
+        engine.create_tables(self.tables)
 
     def clear(self) -> None:
         return None
@@ -26,6 +50,35 @@ class Condition:
         self.operator = operator
 
 
+_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "gt": operator.gt,
+    "le": operator.le,
+    "ge": operator.ge,
+}
+
+
+_RANGE_OPERATORS = ("eq", "lt", "le", "gt", "ge")
+_SCAN_CHUNK = 256
+
+
+def _matches(row: Any, conditions: list[Condition]) -> bool:
+    return all(
+        _OPERATORS[condition.operator](getattr(row, condition.field_name), condition.value) for condition in conditions
+    )
+
+
+def _sort_value(value: Any) -> tuple[bool, Any]:
+    # NULLs sort first, as in SQLite.
+    return (value is not None, value)
+
+
+def _entry_value(entry: tuple[Any, Any]) -> Any:
+    return entry[0]
+
+
 class Order:
     def __init__(self, field_name: str, descending: bool):
         self.field_name = field_name
@@ -67,12 +120,19 @@ class SQLModel:
     def __init_subclass__(cls, table: bool = False, **kwargs: Any):
         super().__init_subclass__(**kwargs)
         cls.__field_defaults__ = {}
+        cls.__primary_key__ = "id"
+        if "__tablename__" not in cls.__dict__:
+            cls.__tablename__ = cls.__name__.lower()
+        if table:
+            SQLModel.metadata.tables.append(cls)
         for name in getattr(cls, "__annotations__", {}):
             value = getattr(cls, name, None)
             if isinstance(value, _FieldInfo):
                 cls.__field_defaults__[name] = value
             else:
                 cls.__field_defaults__[name] = _FieldInfo(default=value)
+            if cls.__field_defaults__[name].primary_key:
+                cls.__primary_key__ = name
             setattr(cls, name, QueryField(name))
 
     def __init__(self, **data: Any):
@@ -85,17 +145,688 @@ class SQLModel:
                 value = info.default
             setattr(self, name, value)
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        # Once an object is stored, the first write to each field records its committed value.
+        # The keys double as dirty flags; the values let a rollback restore the object.
+        changes = self.__dict__.get(_CHANGES)
+        if changes is not None and name not in changes and name in self.__field_defaults__:
+            changes[name] = self.__dict__.get(name)
+        object.__setattr__(self, name, value)
+
+
+_CHANGES = "__changes__"
+
+
+def _changed_fields(obj: SQLModel) -> dict[str, Any] | None:
+    return obj.__dict__.get(_CHANGES)
+
+
+def _mark_clean(obj: SQLModel) -> None:
+    obj.__dict__[_CHANGES] = {}
+
+
+_SQL_TYPES: dict[type, str] = {int: "INTEGER", bool: "INTEGER", float: "REAL", str: "TEXT", datetime: "TEXT"}
+_COLUMN_TYPES: dict[type[SQLModel], dict[str, type]] = {}
+
+
+def _column_type(annotation: Any) -> type:
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+    return annotation if annotation in _SQL_TYPES else str
+
+
+def _column_types(model: type[SQLModel]) -> dict[str, type]:
+    columns = _COLUMN_TYPES.get(model)
+    if columns is None:
+        hints = typing.get_type_hints(model)
+        columns = {name: _column_type(hints[name]) for name in model.__field_defaults__}
+        _COLUMN_TYPES[model] = columns
+    return columns
+
+
+def _to_sql(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="microseconds")
+    return value
+
+
+def _sql_literal(value: Any) -> str:
+    value = _to_sql(value)
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _from_sql(column_type: type, value: Any) -> Any:
+    if value is None:
+        return None
+    if column_type is datetime:
+        return datetime.fromisoformat(value)
+    if column_type is bool:
+        return bool(value)
+    return value
+
+
+def _row_image(obj: SQLModel) -> dict[str, Any]:
+    return {
+        "table": type(obj).__tablename__,
+        "values": {name: _to_sql(getattr(obj, name)) for name in _column_types(type(obj))},
+    }
+
+
+def _committed_image(obj: SQLModel) -> dict[str, Any]:
+    # Like _row_image, but fields a session changed without committing keep their committed value. Values are
+    # read before the recorded originals, so a write racing with the copy is still caught.
+    image = _row_image(obj)
+    changes = dict(_changed_fields(obj) or {})
+    for name, value in changes.items():
+        image["values"][name] = _to_sql(value)
+    return image
+
+
+def _from_row_image(model: type[SQLModel], values: dict[str, Any]) -> SQLModel:
+    columns = _column_types(model)
+    return model(**{name: _from_sql(columns[name], value) for name, value in values.items() if name in columns})
+
+
+class _WriteAheadLog:
+    def __init__(self, path: str, sync_interval: float, snapshot_every: int):
+        self.path = path
+        self.snapshot_path = f"{path}.snapshot"
+        # The log segment a snapshot in progress covers; removed once that snapshot is durable.
+        self.rotated_path = f"{path}.rotated"
+        self.sync_interval = sync_interval
+        self.snapshot_every = snapshot_every
+        self.records_since_snapshot = 0
+        self._lock = threading.Lock()
+        self._unsynced = False
+        self._stopped = threading.Event()
+        self._file = open(path, "a", encoding="utf-8")
+        self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    def append(self, objects: list[SQLModel]) -> None:
+        line = json.dumps({"rows": [_row_image(obj) for obj in objects]}, ensure_ascii=False)
+        with self._lock:
+            # Each commit is one line, so a torn tail on crash drops a whole commit, never half of one.
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._unsynced = True
+            self.records_since_snapshot += 1
+
+    def replay(self) -> Iterator[dict[str, Any]]:
+        for path in (self.snapshot_path, self.rotated_path, self.path):
+            if not os.path.exists(path):
+                continue
+            valid_length = 0
+            with open(path, "rb") as log_file:
+                for line in log_file:
+                    try:
+                        entry = json.loads(line) if line.endswith(b"\n") else None
+                    except json.JSONDecodeError:
+                        entry = None
+                    if entry is None:
+                        break
+                    valid_length += len(line)
+                    yield from entry["rows"]
+            if path == self.path:
+                # Drop a torn tail so later appends do not land on the end of a partial line.
+                with self._lock:
+                    self._file.truncate(valid_length)
+
+    def rotate(self) -> None:
+        # Caller has stopped writers. Commits continue into a fresh log while the snapshot is written elsewhere.
+        with self._lock:
+            self._file.flush()
+            if os.path.exists(self.rotated_path):
+                # An earlier snapshot never finished; its segment is still needed, so this one joins it.
+                with open(self.path, "rb") as current, open(self.rotated_path, "ab") as rotated:
+                    shutil.copyfileobj(current, rotated)
+                self._file.truncate(0)
+                self._file.seek(0)
+            else:
+                os.replace(self.path, self.rotated_path)
+                self._file.close()
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._unsynced = False
+            self.records_since_snapshot = 0
+
+    def write_snapshot(self, images: Iterable[dict[str, Any]]) -> None:
+        # Runs off the commit path. Replay reads snapshot, rotated segment, then log, so a crash at any point
+        # here still recovers every commit.
+        rotated = os.open(self.rotated_path, os.O_RDONLY)
+        try:
+            os.fsync(rotated)
+        finally:
+            os.close(rotated)
+        temporary_path = f"{self.snapshot_path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as snapshot_file:
+            for image in images:
+                snapshot_file.write(json.dumps({"rows": [image]}, ensure_ascii=False) + "\n")
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_path, self.snapshot_path)
+        os.remove(self.rotated_path)
+
+    def sync(self) -> None:
+        with self._lock:
+            if not self._unsynced:
+                return
+            self._unsynced = False
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._flusher.join()
+        self.sync()
+        self._file.close()
+
+    def _flush_loop(self) -> None:
+        # Group commit: commits only write to the OS buffer; one fsync here covers every commit since the last.
+        while not self._stopped.wait(self.sync_interval):
+            self.sync()
+
+
+class _HashIndex:
+    def __init__(self, field_name: str):
+        self.field_name = field_name
+        self.buckets: dict[Any, dict[Any, SQLModel]] = {}
+        self.keys: dict[Any, Any] = {}
+
+    def put(self, row_key: Any, row: SQLModel) -> None:
+        value = getattr(row, self.field_name)
+        if row_key in self.keys:
+            previous = self.keys[row_key]
+            if previous != value:
+                self._discard(previous, row_key)
+        self.buckets.setdefault(value, {})[row_key] = row
+        self.keys[row_key] = value
+
+    def lookup(self, value: Any) -> dict[Any, SQLModel]:
+        return self.buckets.get(value, {})
+
+    def _discard(self, value: Any, row_key: Any) -> None:
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            return
+        bucket.pop(row_key, None)
+        if not bucket:
+            del self.buckets[value]
+
+
+class _OrderedGroup:
+    def __init__(self) -> None:
+        self.keys: list[tuple[Any, Any]] = []
+        self.rows: list[SQLModel] = []
+        # Seqlock: odd while a writer is mid-update. Readers retry instead of blocking.
+        self.version = 0
+
+
+class _OrderedIndex:
+    def __init__(self, name: str, columns: tuple[str, ...]):
+        self.name = name
+        self.columns = set(columns)
+        self.prefix = columns[:-1]
+        self.order_field = columns[-1]
+        # Entries are sorted on (order value, primary key) so ties have a stable, seekable order.
+        self.groups: dict[tuple[Any, ...], _OrderedGroup] = {}
+        self.entries: dict[Any, tuple[tuple[Any, ...], tuple[Any, Any]]] = {}
+
+    def put(self, row_key: Any, row: SQLModel) -> None:
+        prefix = tuple(getattr(row, name) for name in self.prefix)
+        sort_key = (_sort_value(getattr(row, self.order_field)), row_key)
+        entry = self.entries.get(row_key)
+        if entry is not None:
+            if entry == (prefix, sort_key):
+                group = self.groups[prefix]
+                group.rows[bisect.bisect_left(group.keys, sort_key)] = row
+                return
+            self._discard(*entry)
+        group = self.groups.get(prefix)
+        if group is None:
+            group = self.groups[prefix] = _OrderedGroup()
+        position = bisect.bisect_left(group.keys, sort_key)
+        group.version += 1
+        group.keys.insert(position, sort_key)
+        group.rows.insert(position, row)
+        group.version += 1
+        self.entries[row_key] = (prefix, sort_key)
+
+    def scan(
+        self,
+        prefix: tuple[Any, ...],
+        bounds: list[Condition],
+        descending: bool = False,
+        after: tuple[Any, Any] | None = None,
+    ) -> Iterator[SQLModel]:
+        group = self.groups.get(prefix)
+        if group is None:
+            return iter(())
+        resume = None if after is None else (_sort_value(after[0]), after[1])
+        return self._iterate(group, bounds, descending, resume)
+
+    def _iterate(
+        self, group: _OrderedGroup, bounds: list[Condition], descending: bool, resume: tuple[Any, Any] | None
+    ) -> Iterator[SQLModel]:
+        # Copy small chunks under the seqlock and continue from the last key seen, so concurrent
+        # inserts never make a scan skip or repeat a row and large ranges are never copied whole.
+        while True:
+            version = group.version
+            if version % 2:
+                time.sleep(0)
+                continue
+            keys = group.keys
+            lo, hi = self._window(keys, bounds)
+            if resume is not None and descending:
+                hi = min(hi, bisect.bisect_left(keys, resume))
+            elif resume is not None:
+                lo = max(lo, bisect.bisect_right(keys, resume))
+            start, stop = (max(lo, hi - _SCAN_CHUNK), hi) if descending else (lo, min(hi, lo + _SCAN_CHUNK))
+            chunk_keys = keys[start:stop]
+            chunk_rows = group.rows[start:stop]
+            if group.version != version:
+                continue
+            if not chunk_rows:
+                return
+            if descending:
+                chunk_keys.reverse()
+                chunk_rows.reverse()
+            yield from chunk_rows
+            if (descending and start == lo) or (not descending and stop == hi):
+                return
+            resume = chunk_keys[-1]
+
+    @staticmethod
+    def _window(keys: list[tuple[Any, Any]], bounds: list[Condition]) -> tuple[int, int]:
+        lo, hi = 0, len(keys)
+        for condition in bounds:
+            value = _sort_value(condition.value)
+            if condition.operator in ("gt", "ge", "eq"):
+                search = bisect.bisect_right if condition.operator == "gt" else bisect.bisect_left
+                lo = max(lo, search(keys, value, key=_entry_value))
+            if condition.operator in ("lt", "le", "eq"):
+                search = bisect.bisect_left if condition.operator == "lt" else bisect.bisect_right
+                hi = min(hi, search(keys, value, key=_entry_value))
+            if condition.operator in ("lt", "le"):
+                # NULL never satisfies a comparison, so skip the leading NULL block.
+                lo = max(lo, bisect.bisect_right(keys, _sort_value(None), key=_entry_value))
+        return lo, hi
+
+    def _discard(self, prefix: tuple[Any, ...], sort_key: tuple[Any, Any]) -> None:
+        group = self.groups[prefix]
+        position = bisect.bisect_left(group.keys, sort_key)
+        group.version += 1
+        del group.keys[position]
+        del group.rows[position]
+        group.version += 1
+        if not group.keys:
+            del self.groups[prefix]
+
 
 class Engine:
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        wal_path: str | None = None,
+        wal_sync_interval: float = 0.005,
+        snapshot_every: int = 10_000,
+    ):
         self.url = url
-        self.storage: dict[type[SQLModel], list[SQLModel]] = {}
+        # Rows are keyed by primary key so lookups by id never scan a table.
+        self.storage: dict[type[SQLModel], dict[Any, SQLModel]] = {}
         self.counters: dict[type[SQLModel], int] = {}
+        self.indexes: dict[type[SQLModel], dict[str, _HashIndex]] = {}
+        self.ordered_indexes: dict[type[SQLModel], list[_OrderedIndex]] = {}
+        self.wal = _WriteAheadLog(wal_path, wal_sync_interval, snapshot_every) if wal_path else None
+        self._recovered = False
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread: threading.Thread | None = None
+        # Writers take striped per-table locks (always in id order); readers take none and work from
+        # atomic copies of buckets or seqlock-checked chunks of ordered indexes.
+        self._table_locks: dict[type[SQLModel], threading.RLock] = {}
+        self._table_locks_guard = threading.Lock()
+        self._catalog_lock = threading.Lock()
+
+    def indexes_for(self, model: type[SQLModel]) -> dict[str, _HashIndex]:
+        indexes = self.indexes.get(model)
+        if indexes is None:
+            with self._catalog_lock:
+                indexes = self.indexes.get(model)
+                if indexes is None:
+                    fields = model.__field_defaults__.items()
+                    indexes = {name: _HashIndex(name) for name, info in fields if info.index}
+                    self.indexes[model] = indexes
+        return indexes
+
+    def ordered_indexes_for(self, model: type[SQLModel]) -> list[_OrderedIndex]:
+        indexes = self.ordered_indexes.get(model)
+        if indexes is None:
+            with self._catalog_lock:
+                indexes = self.ordered_indexes.get(model)
+                if indexes is None:
+                    table_args = getattr(model, "__table_args__", ())
+                    indexes = [_OrderedIndex(arg.name, arg.columns) for arg in table_args if isinstance(arg, Index)]
+                    self.ordered_indexes[model] = indexes
+        return indexes
+
+    def lock_for(self, model: type[SQLModel]) -> threading.RLock:
+        lock = self._table_locks.get(model)
+        if lock is None:
+            with self._table_locks_guard:
+                lock = self._table_locks.setdefault(model, threading.RLock())
+        return lock
+
+    def put(self, obj: SQLModel) -> bool:
+        model = type(obj)
+        rows = self.storage.setdefault(model, {})
+        key_name = model.__primary_key__
+        row_key = getattr(obj, key_name, None)
+        changes = _changed_fields(obj)
+        if changes is not None and row_key is not None and rows.get(row_key) is obj:
+            if not changes:
+                return False
+            changed: set[str] | None = set(changes)
+        else:
+            changed = None
+            if row_key is None:
+                row_key = self.counters.get(model, 0) + 1
+                self.counters[model] = row_key
+                setattr(obj, key_name, row_key)
+            rows[row_key] = obj
+        for index in self.indexes_for(model).values():
+            if changed is None or index.field_name in changed:
+                index.put(row_key, obj)
+        for ordered_index in self.ordered_indexes_for(model):
+            if changed is None or not ordered_index.columns.isdisjoint(changed):
+                ordered_index.put(row_key, obj)
+        _mark_clean(obj)
+        return True
+
+    def create_tables(self, models: list[type[SQLModel]]) -> None:
+        if self.wal is None or self._recovered:
+            return
+        self._recovered = True
+        models_by_table = {model.__tablename__: model for model in models}
+        for image in self.wal.replay():
+            model = models_by_table.get(image["table"])
+            if model is None:
+                continue
+            row = _from_row_image(model, image["values"])
+            row_key = getattr(row, model.__primary_key__)
+            if isinstance(row_key, int):
+                self.counters[model] = max(self.counters.get(model, 0), row_key)
+            self.put(row)
+
+    def write(self, objects: list[SQLModel]) -> None:
+        locks = [self.lock_for(model) for model in sorted({type(obj) for obj in objects}, key=id)]
+        with contextlib.ExitStack() as stack:
+            for lock in locks:
+                stack.enter_context(lock)
+            written = [obj for obj in objects if self.put(obj)]
+            if self.wal is not None and written:
+                self.wal.append(written)
+        if self.wal is not None and self.wal.records_since_snapshot >= self.wal.snapshot_every:
+            self.snapshot(wait=False)
+
+    def snapshot(self, wait: bool = True) -> None:
+        if self.wal is None:
+            return
+        with self._snapshot_lock:
+            running = self._snapshot_thread
+            if running is not None and running.is_alive():
+                if not wait:
+                    return
+                running.join()
+            # Writers stop only while the log is switched. The images are copied afterwards without locks, so the
+            # snapshot is fuzzy: a row committed during the copy may appear in either state. Replay applies the
+            # rotated segment and then the new log on top, and each record is a full row image, so every such row
+            # ends up at its last committed value.
+            with self._table_locks_guard, contextlib.ExitStack() as stack:
+                for model in sorted(self._table_locks, key=id):
+                    stack.enter_context(self._table_locks[model])
+                self.wal.rotate()
+            thread = self._snapshot_thread = threading.Thread(
+                target=self._write_snapshot, name="wal-snapshot", daemon=True
+            )
+            thread.start()
+        if wait:
+            thread.join()
+
+    def _write_snapshot(self) -> None:
+        rows = [row for table in list(self.storage.values()) for row in list(table.values())]
+        self.wal.write_snapshot(_committed_image(row) for row in rows)
+
+    def close(self) -> None:
+        if self.wal is not None:
+            with self._snapshot_lock:
+                if self._snapshot_thread is not None:
+                    self._snapshot_thread.join()
+            self.wal.close()
+
+    def get(self, model: type[SQLModel], row_id: Any) -> SQLModel | None:
+        return self.storage.get(model, {}).get(row_id)
+
+    def select(self, query: SelectQuery) -> list[SQLModel]:
+        if query.after_position is not None and query.order is None:
+            raise ValueError("after() requires order_by()")
+        candidates, conditions, presorted = self._plan(query)
+        rows = (row for row in candidates if _matches(row, conditions))
+        start = query.offset_count
+        stop = None if query.limit_count is None else start + query.limit_count
+        order = query.order
+        if order is None or presorted:
+            return list(itertools.islice(rows, start, stop))
+
+        key_name = query.model.__primary_key__
+
+        def sort_key(row: SQLModel) -> tuple[tuple[bool, Any], Any]:
+            return (_sort_value(getattr(row, order.field_name)), getattr(row, key_name))
+
+        if query.after_position is not None:
+            position = (_sort_value(query.after_position[0]), query.after_position[1])
+            if order.descending:
+                rows = (row for row in rows if sort_key(row) < position)
+            else:
+                rows = (row for row in rows if sort_key(row) > position)
+        if stop is None:
+            return sorted(rows, key=sort_key, reverse=order.descending)[start:]
+        # Top-k: keep only offset + limit rows in a heap instead of sorting every match.
+        pick = heapq.nlargest if order.descending else heapq.nsmallest
+        return pick(stop, rows, key=sort_key)[start:]
+
+    def _plan(self, query: SelectQuery) -> tuple[Iterable[SQLModel], list[Condition], bool]:
+        ordered_plan = self._plan_ordered(query)
+        if ordered_plan is not None:
+            return ordered_plan
+        # Start from the smallest indexed equality bucket; only the remaining conditions are filtered.
+        indexes = self.indexes_for(query.model)
+        best: dict[Any, SQLModel] | None = None
+        best_condition: Condition | None = None
+        for condition in query.conditions:
+            index = indexes.get(condition.field_name)
+            if index is None or condition.operator != "eq":
+                continue
+            try:
+                bucket = index.lookup(condition.value)
+            except TypeError:
+                continue
+            if best is None or len(bucket) < len(best):
+                best, best_condition = bucket, condition
+        if best is None:
+            return list(self.storage.get(query.model, {}).values()), list(query.conditions), False
+        remaining = [condition for condition in query.conditions if condition is not best_condition]
+        return list(best.values()), remaining, False
+
+    def _plan_ordered(self, query: SelectQuery) -> tuple[Iterator[SQLModel], list[Condition], bool] | None:
+        # A composite index applies when its leading columns are all pinned by equality and the query
+        # orders by (or does not order at all) its last column; range bounds then become bisects.
+        for index in self.ordered_indexes_for(query.model):
+            if query.order is not None and query.order.field_name != index.order_field:
+                continue
+            pinned: dict[str, Condition] = {}
+            for condition in query.conditions:
+                if condition.operator == "eq" and condition.field_name in index.prefix:
+                    pinned.setdefault(condition.field_name, condition)
+            if len(pinned) != len(index.prefix):
+                continue
+            bounds = [
+                condition
+                for condition in query.conditions
+                if condition.field_name == index.order_field and condition.operator in _RANGE_OPERATORS
+            ]
+            descending = query.order is not None and query.order.descending
+            try:
+                # scan() looks the pinned prefix up right away; an unhashable value falls back like the hash planner.
+                rows = index.scan(
+                    tuple(pinned[name].value for name in index.prefix), bounds, descending, query.after_position
+                )
+            except TypeError:
+                continue
+            used = {id(condition) for condition in [*pinned.values(), *bounds]}
+            remaining = [condition for condition in query.conditions if id(condition) not in used]
+            return rows, remaining, True
+        return None
+
+
+_SQL_OPERATORS = {"eq": "IS", "ne": "IS NOT", "lt": "<", "gt": ">", "le": "<=", "ge": ">="}
 
 
-def create_engine(database_url: str, echo: bool = False) -> Engine:
+class SQLiteEngine:
+    def __init__(self, url: str):
+        self.url = url
+        self.path = url.removeprefix("sqlite://").removeprefix("/") or ":memory:"
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        if self.path != ":memory:":
+            # WAL journaling lets per-thread reader connections run while the writer commits.
+            self.connection.execute("PRAGMA journal_mode=WAL")
+
+    def create_tables(self, models: list[type[SQLModel]]) -> None:
+        with self._lock, self.connection:
+            for model in models:
+                table = model.__tablename__
+                definitions = []
+                for name, column_type in _column_types(model).items():
+                    definition = f"[{name}] {_SQL_TYPES[column_type]}"
+                    if name == model.__primary_key__:
+                        definition += " PRIMARY KEY"
+                    definitions.append(definition)
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS [{table}] ({', '.join(definitions)})")
+                self._add_missing_columns(model)
+                indexes = [
+                    (f"ix_{table}_{name}", (name,)) for name, info in model.__field_defaults__.items() if info.index
+                ]
+                table_args = getattr(model, "__table_args__", ())
+                indexes.extend((arg.name, arg.columns) for arg in table_args if isinstance(arg, Index))
+                for index_name, columns in indexes:
+                    column_list = ", ".join(f"[{column}]" for column in columns)
+                    self.connection.execute(f"CREATE INDEX IF NOT EXISTS [{index_name}] ON [{table}] ({column_list})")
+
+    def _add_missing_columns(self, model: type[SQLModel]) -> None:
+        # Tables created by an older model keep their rows; new fields are added with the field default.
+        table = model.__tablename__
+        existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info([{table}])")}
+        for name, column_type in _column_types(model).items():
+            if name in existing:
+                continue
+            definition = f"[{name}] {_SQL_TYPES[column_type]}"
+            info = model.__field_defaults__[name]
+            if info.default_factory is None and info.default is not None:
+                definition += f" DEFAULT {_sql_literal(info.default)}"
+            self.connection.execute(f"ALTER TABLE [{table}] ADD COLUMN {definition}")
+
+    def close(self) -> None:
+        for reader in self._readers:
+            reader.close()
+        self.connection.close()
+
+    def _reader(self) -> tuple[sqlite3.Connection, Any]:
+        if self.path == ":memory:":
+            return self.connection, self._lock
+        reader = getattr(self._local, "connection", None)
+        if reader is None:
+            reader = sqlite3.connect(self.path, check_same_thread=False)
+            self._local.connection = reader
+            with self._lock:
+                self._readers.append(reader)
+        return reader, contextlib.nullcontext()
+
+    def write(self, objects: list[SQLModel]) -> None:
+        with self._lock, self.connection:
+            for obj in objects:
+                if _changed_fields(obj) != {}:
+                    self._upsert(obj)
+                    _mark_clean(obj)
+
+    def _upsert(self, obj: SQLModel) -> None:
+        model = type(obj)
+        key_name = model.__primary_key__
+        names = [name for name in _column_types(model) if name != key_name or getattr(obj, name) is not None]
+        column_list = ", ".join(f"[{name}]" for name in names)
+        placeholders = ", ".join("?" for _ in names)
+        updates = ", ".join(f"[{name}] = excluded.[{name}]" for name in names if name != key_name)
+        conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+        cursor = self.connection.execute(
+            f"INSERT INTO [{model.__tablename__}] ({column_list}) VALUES ({placeholders}) "
+            f"ON CONFLICT([{key_name}]) {conflict}",
+            [_to_sql(getattr(obj, name)) for name in names],
+        )
+        if getattr(obj, key_name) is None:
+            setattr(obj, key_name, cursor.lastrowid)
+
+    def get(self, model: type[SQLModel], row_id: Any) -> SQLModel | None:
+        rows = self._fetch(model, f"WHERE [{model.__primary_key__}] = ?", [row_id])
+        return rows[0] if rows else None
+
+    def select(self, query: SelectQuery) -> list[SQLModel]:
+        model = query.model
+        key_name = model.__primary_key__
+        clauses: list[str] = []
+        params: list[Any] = []
+        for condition in query.conditions:
+            clauses.append(f"[{condition.field_name}] {_SQL_OPERATORS[condition.operator]} ?")
+            params.append(_to_sql(condition.value))
+        order = query.order
+        if query.after_position is not None:
+            if order is None:
+                raise ValueError("after() requires order_by()")
+            comparison = "<" if order.descending else ">"
+            clauses.append(f"([{order.field_name}], [{key_name}]) {comparison} (?, ?)")
+            params.extend(_to_sql(value) for value in query.after_position)
+        sql = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        if order is not None:
+            direction = "DESC" if order.descending else "ASC"
+            sql += f" ORDER BY [{order.field_name}] {direction}, [{key_name}] {direction}"
+        if query.limit_count is not None or query.offset_count:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if query.limit_count is None else query.limit_count, query.offset_count])
+        return self._fetch(model, sql, params)
+
+    def _fetch(self, model: type[SQLModel], sql: str, params: list[Any]) -> list[SQLModel]:
+        columns = _column_types(model)
+        column_list = ", ".join(f"[{name}]" for name in columns)
+        reader, guard = self._reader()
+        with guard:
+            records = reader.execute(f"SELECT {column_list} FROM [{model.__tablename__}] {sql}", params).fetchall()
+        rows = [model(**dict(zip(columns, map(_from_sql, columns.values(), record)))) for record in records]
+        for row in rows:
+            _mark_clean(row)
+        return rows
+
+
+def create_engine(
+    database_url: str, echo: bool = False, backend: str = "memory", wal_path: str | None = None
+) -> Engine | SQLiteEngine:
     _ = echo
-    return Engine(database_url)
+    if backend == "sqlite":
+        if not database_url.startswith("sqlite://"):
+            raise ValueError(f"sqlite backend requires a sqlite:// URL, got {database_url!r}")
+        return SQLiteEngine(database_url)
+    return Engine(database_url, wal_path=wal_path)
 
 
 class SelectQuery:
@@ -103,6 +834,9 @@ class SelectQuery:
         self.model = model
         self.conditions: list[Condition] = []
         self.order: Order | None = None
+        self.limit_count: int | None = None
+        self.offset_count = 0
+        self.after_position: tuple[Any, Any] | None = None
 
     def where(self, *conditions: Condition) -> SelectQuery:
         self.conditions.extend(conditions)
@@ -112,6 +846,19 @@ class SelectQuery:
         self.order = order
         return self
 
+    def limit(self, count: int) -> SelectQuery:
+        self.limit_count = count
+        return self
+
+    def offset(self, count: int) -> SelectQuery:
+        self.offset_count = count
+        return self
+
+    def after(self, order_value: Any, row_key: Any) -> SelectQuery:
+        # Keyset seek: start strictly after (order value, primary key) in the query's order.
+        self.after_position = (order_value, row_key)
+        return self
+
 
 class Result:
     def __init__(self, rows: list[SQLModel]):
@@ -126,59 +873,62 @@ class Result:
         return self._rows[0]
 
 
+class _Transaction:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def __enter__(self) -> Session:
+        return self.session
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _ = (exc, tb)
+        if exc_type is None:
+            self.session.commit()
+        else:
+            self.session.rollback()
+
+
 class Session:
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine | SQLiteEngine):
         self.engine = engine
-        self._pending: list[SQLModel] = []
+        # Keyed by object identity so adding the same object again is a no-op.
+        self._pending: dict[int, SQLModel] = {}
 
     def __enter__(self) -> Session:
         return self
 
     def __exit__(self, exc_type, exc, tb) -> None:
         _ = (exc_type, exc, tb)
+        # Like SQLAlchemy's close(), uncommitted work never outlives the session.
+        self.rollback()
+
+    def begin(self) -> _Transaction:
+        return _Transaction(self)
 
     def add(self, obj: SQLModel) -> None:
-        self._pending.append(obj)
+        self._pending[id(obj)] = obj
 
     def commit(self) -> None:
-        for obj in self._pending:
-            model = type(obj)
-            rows = self.engine.storage.setdefault(model, [])
-            if getattr(obj, "id", None) is None:
-                next_id = self.engine.counters.get(model, 0) + 1
-                self.engine.counters[model] = next_id
-                setattr(obj, "id", next_id)
-            if obj not in rows:
-                rows.append(obj)
+        # Unit of work: every pending insert/update reaches the engine as one batch.
+        self.engine.write(list(self._pending.values()))
+        self._pending.clear()
+
+    def rollback(self) -> None:
+        for obj in self._pending.values():
+            changes = _changed_fields(obj)
+            if changes:
+                obj.__dict__.update(changes)
+                _mark_clean(obj)
         self._pending.clear()
 
     def refresh(self, _obj: SQLModel) -> None:
         return None
 
-    def get(self, model: type[SQLModel], row_id: int) -> SQLModel | None:
-        for row in self.engine.storage.get(model, []):
-            if getattr(row, "id", None) == row_id:
-                return row
-        return None
+    def get(self, model: type[SQLModel], row_id: Any) -> SQLModel | None:
+        return self.engine.get(model, row_id)
 
     def exec(self, query: SelectQuery) -> Result:
-        rows = list(self.engine.storage.get(query.model, []))
-        for condition in query.conditions:
-            if condition.operator == "eq":
-                rows = [row for row in rows if getattr(row, condition.field_name) == condition.value]
-            elif condition.operator == "ne":
-                rows = [row for row in rows if getattr(row, condition.field_name) != condition.value]
-            elif condition.operator == "lt":
-                rows = [row for row in rows if getattr(row, condition.field_name) < condition.value]
-            elif condition.operator == "gt":
-                rows = [row for row in rows if getattr(row, condition.field_name) > condition.value]
-            elif condition.operator == "le":
-                rows = [row for row in rows if getattr(row, condition.field_name) <= condition.value]
-            elif condition.operator == "ge":
-                rows = [row for row in rows if getattr(row, condition.field_name) >= condition.value]
-        if query.order is not None:
-            rows.sort(key=lambda row: getattr(row, query.order.field_name), reverse=query.order.descending)
-        return Result(rows)
+        return Result(self.engine.select(query))
 
 
 def Field(
@@ -186,8 +936,9 @@ def Field(
     default: Any = None,
     default_factory: Callable[[], Any] | None = None,
     primary_key: bool = False,
+    index: bool = False,
 ) -> _FieldInfo:
-    return _FieldInfo(default=default, default_factory=default_factory, primary_key=primary_key)
+    return _FieldInfo(default=default, default_factory=default_factory, primary_key=primary_key, index=index)
 
 
 def select(model: type[SQLModel]) -> SelectQuery:
@@ -27,7 +27,7 @@ def test_create_and_list_workspaces(tmp_path: Path) -> None:
         created = main.create_workspace(main.WorkspaceCreate(name="demo"), session)
         assert created.name == "demo"
 
-        workspaces = main.list_workspaces(session)
+        workspaces = main.list_workspaces(session).items
         assert len(workspaces) == 1
         assert workspaces[0].name == "demo"
 
@@ -139,3 +139,23 @@ def test_get_artifact_version_chain(tmp_path: Path) -> None:
         assert chain.previous_artifact.id == v1.id
         assert chain.next_artifact is not None
         assert chain.next_artifact.id == v3.id
+
+
+def test_list_workspaces_paginates_with_cursor(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        names = [f"page-{index}" for index in range(5)]
+        for name in names:
+            main.create_workspace(main.WorkspaceCreate(name=name), session)
+
+        seen: list[str] = []
+        cursor = None
+        while True:
+            page = main.list_workspaces(session, limit=2, cursor=cursor)
+            seen.extend(workspace.name for workspace in page.items if workspace.name in names)
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+
+        assert seen == list(reversed(names))
@@ -1,10 +1,32 @@
+import asyncio
 import importlib
+import json
 import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from types import ModuleType
 
-from sqlmodel import Session, SQLModel
+import pytest
+
+from app.models import ConversationMessage, ConversationRun
+from app.services import content_service, conversation_service
+from app.services.admission import PRIORITY_INTERACTIVE, AdmissionScheduler
+from app.services.call_policy import CallPolicy
+from app.services.content_service import message_text
+from app.services.conversation_service import (
+    create_message_with_assistant,
+    load_path_window,
+    message_path_cache,
+    regenerate_message,
+    stream_message_with_assistant,
+)
+from app.services.message_tree import ancestor_at_depth, is_ancestor, list_children, lowest_common_ancestor
+from app.services.openai_runner import FileDeletionQueue, OpenAIRunner, StubOpenAIClient, TieredResponseCache
+from app.services.pagination import DEFAULT_PAGE_SIZE
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, select
 
 
 def load_main(tmp_path: Path) -> ModuleType:
@@ -25,10 +47,13 @@ def test_conversation_message_path_and_selected_leaf(tmp_path: Path) -> None:
 
     with Session(main.engine) as session:
         conversation = main.create_conversation(main.ConversationCreate(title="spec review"), session)
-        first = main.create_conversation_message(
-            conversation.id,
-            main.ConversationMessageCreate(text="hello"),
-            session,
+        first = asyncio.run(
+            main.create_conversation_message(
+                conversation.id,
+                main.ConversationMessageCreate(text="hello"),
+                session,
+                main.get_runner(),
+            )
         )
 
         detail = main.get_conversation(conversation.id, session)
@@ -44,13 +69,16 @@ def test_regenerate_creates_sibling_assistant(tmp_path: Path) -> None:
 
     with Session(main.engine) as session:
         conversation = main.create_conversation(main.ConversationCreate(title="regenerate"), session)
-        created = main.create_conversation_message(
-            conversation.id,
-            main.ConversationMessageCreate(text="original"),
-            session,
+        created = asyncio.run(
+            main.create_conversation_message(
+                conversation.id,
+                main.ConversationMessageCreate(text="original"),
+                session,
+                main.get_runner(),
+            )
         )
 
-        regenerated = main.regenerate_message(created.user_message_id, session)
+        regenerated = asyncio.run(main.regenerate_message(created.user_message_id, session, main.get_runner()))
 
         assert regenerated.parent_message_id == created.user_message_id
         assert regenerated.id != created.assistant_message_id
@@ -61,16 +89,22 @@ def test_branch_creates_user_and_assistant_path(tmp_path: Path) -> None:
 
     with Session(main.engine) as session:
         conversation = main.create_conversation(main.ConversationCreate(title="branch"), session)
-        created = main.create_conversation_message(
-            conversation.id,
-            main.ConversationMessageCreate(text="seed"),
-            session,
+        created = asyncio.run(
+            main.create_conversation_message(
+                conversation.id,
+                main.ConversationMessageCreate(text="seed"),
+                session,
+                main.get_runner(),
+            )
         )
 
-        branched = main.branch_from_message(
-            created.user_message_id,
-            main.BranchCreate(text="another route"),
-            session,
+        branched = asyncio.run(
+            main.branch_from_message(
+                created.user_message_id,
+                main.BranchCreate(text="another route"),
+                session,
+                main.get_runner(),
+            )
         )
 
         detail = main.get_conversation(conversation.id, session)
@@ -100,10 +134,523 @@ def test_files_include_and_summary_visible_in_right_panel(tmp_path: Path) -> Non
         included = main.include_file(conversation.id, registered.id, session)
         assert included.included_in_context is True
 
-        summary = main.summarize_file(conversation.id, registered.id, session)
+        summary = asyncio.run(main.summarize_file(conversation.id, registered.id, session, main.get_runner()))
         assert summary.summary_type == "short"
 
-        right = main.get_conversation_right_panel(conversation.id, session)
+        right = main.get_conversation_right_panel(conversation.id, session, main.get_runner())
         assert len(right.files) == 1
+        assert right.files_next_cursor is None
         assert right.agent["store"] is False
         assert len(right.results["latest_runs"]) >= 1
+
+        for index in range(DEFAULT_PAGE_SIZE):
+            main.register_file(
+                main.FileRegisterCreate(
+                    conversation_id=conversation.id,
+                    filename=f"extra-{index}.md",
+                    storage_backend="local",
+                    storage_key=f"conversations/extra-{index}.md",
+                ),
+                session,
+            )
+        right = main.get_conversation_right_panel(conversation.id, session, main.get_runner())
+        assert len(right.files) == DEFAULT_PAGE_SIZE
+        rest = main.list_conversation_files(conversation.id, session, cursor=right.files_next_cursor)
+        assert rest.next_cursor is None
+        assert len({f.id for f in right.files} | {f.id for f in rest.items}) == DEFAULT_PAGE_SIZE + 1
+
+
+class FailingRunner:
+    model_name = "test-model"
+
+    def chat(self, *, prompt: str, files: list[dict], **_options):
+        raise RuntimeError("upstream unavailable")
+
+
+def test_failed_model_call_leaves_no_partial_turn(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="atomic"), session)
+
+        try:
+            create_message_with_assistant(
+                session,
+                conversation_id=conversation.id,
+                text="hello",
+                parent_message_id=None,
+                runner=FailingRunner(),
+            )
+        except RuntimeError:
+            pass
+
+        messages = session.exec(
+            select(ConversationMessage).where(ConversationMessage.conversation_id == conversation.id)
+        ).all()
+        runs = session.exec(select(ConversationRun).where(ConversationRun.conversation_id == conversation.id)).all()
+
+        assert messages == []
+        assert runs == []
+        assert conversation.selected_leaf_message_id is None
+
+
+def test_large_message_text_stays_out_of_the_message_row(tmp_path: Path, monkeypatch) -> None:
+    main = load_main(tmp_path)
+    monkeypatch.setattr(content_service, "INLINE_PART_LIMIT", 64)
+    text = "x" * 10_000
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="large"), session)
+        created = asyncio.run(
+            main.create_conversation_message(
+                conversation.id, main.ConversationMessageCreate(text=text), session, main.get_runner()
+            )
+        )
+        user = session.get(ConversationMessage, created.user_message_id)
+        assert user.plain_text is None
+        assert len(user.content_json) < 200
+
+        detail = main.get_conversation(conversation.id, session)
+        assert detail.selected_path_messages[0].text == text
+
+
+def test_selected_path_is_served_from_incremental_cache(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="cached path"), session)
+        first = asyncio.run(
+            main.create_conversation_message(
+                conversation.id, main.ConversationMessageCreate(text="one"), session, main.get_runner()
+            )
+        )
+        second = asyncio.run(
+            main.create_conversation_message(
+                conversation.id, main.ConversationMessageCreate(text="two"), session, main.get_runner()
+            )
+        )
+        regenerated = asyncio.run(main.regenerate_message(second.user_message_id, session, main.get_runner()))
+
+        expected = (first.user_message_id, first.assistant_message_id, second.user_message_id, regenerated.id)
+        assert message_path_cache.get(regenerated.id) == expected
+
+        detail = main.get_conversation(conversation.id, session)
+        assert tuple(message.id for message in detail.selected_path_messages) == expected
+
+        message_path_cache.clear()
+        detail = main.get_conversation(conversation.id, session)
+        assert tuple(message.id for message in detail.selected_path_messages) == expected
+        assert message_path_cache.get(regenerated.id) == expected
+
+
+def test_skip_pointers_answer_ancestry_queries(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="deep"), session)
+        turns = [
+            asyncio.run(
+                main.create_conversation_message(
+                    conversation.id, main.ConversationMessageCreate(text=str(i)), session, main.get_runner()
+                )
+            )
+            for i in range(20)
+        ]
+        fork = turns[6].user_message_id
+        branch = asyncio.run(
+            main.branch_from_message(fork, main.BranchCreate(text="detour"), session, main.get_runner())
+        )
+        leaf = session.get(ConversationMessage, turns[-1].assistant_message_id)
+        branch_leaf = session.get(ConversationMessage, branch.assistant_message_id)
+        fork_message = session.get(ConversationMessage, fork)
+
+        assert leaf.depth == 39
+        path, _, _ = load_path_window(session, leaf, limit=40)
+        assert [ancestor_at_depth(session, leaf, depth).id for depth in range(40)] == [m.id for m in path]
+        assert is_ancestor(session, fork_message, leaf)
+        assert is_ancestor(session, fork_message, branch_leaf)
+        assert not is_ancestor(session, branch_leaf, leaf)
+        assert lowest_common_ancestor(session, leaf, branch_leaf).id == fork_message.id
+
+        comparison = main.compare_branches(leaf.id, branch_leaf.id, session)
+        assert comparison.common_ancestor_id == fork
+        assert comparison.message_distance == 39 - fork_message.depth
+        assert comparison.other_distance == 2
+        assert not comparison.message_is_ancestor
+
+
+def test_startup_backfills_pointers_for_legacy_messages(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="legacy"), session)
+        turns = [
+            asyncio.run(
+                main.create_conversation_message(
+                    conversation.id, main.ConversationMessageCreate(text=str(i)), session, main.get_runner()
+                )
+            )
+            for i in range(3)
+        ]
+        branch = asyncio.run(
+            main.branch_from_message(
+                turns[0].user_message_id, main.BranchCreate(text="detour"), session, main.get_runner()
+            )
+        )
+        messages = session.exec(select(ConversationMessage)).all()
+        expected = {message.id: (message.depth, message.skip_ids_json) for message in messages}
+        # Rows from before depth/skip pointers existed come back with the column defaults.
+        for message in messages:
+            message.depth = 0
+            message.skip_ids_json = "[]"
+            session.add(message)
+        session.commit()
+
+        main.init_db()
+
+        restored = session.exec(select(ConversationMessage)).all()
+        assert {message.id: (message.depth, message.skip_ids_json) for message in restored} == expected
+        leaf = session.get(ConversationMessage, turns[-1].assistant_message_id)
+        branch_leaf = session.get(ConversationMessage, branch.assistant_message_id)
+        assert lowest_common_ancestor(session, leaf, branch_leaf).id == turns[0].user_message_id
+        message_path_cache.clear()
+        window, before_cursor, _ = load_path_window(session, leaf, limit=4)
+        assert len(window) == 4 and before_cursor == window[0].id
+        assert [m.id for m in load_path_window(session, leaf, limit=10)[0]] == [
+            turns[0].user_message_id,
+            turns[0].assistant_message_id,
+            turns[1].user_message_id,
+            turns[1].assistant_message_id,
+            turns[2].user_message_id,
+            turns[2].assistant_message_id,
+        ]
+
+        followup = asyncio.run(
+            main.create_conversation_message(
+                conversation.id, main.ConversationMessageCreate(text="more"), session, main.get_runner()
+            )
+        )
+        assert session.get(ConversationMessage, followup.assistant_message_id).depth == branch_leaf.depth + 2
+
+
+def test_selected_path_is_windowed_with_cursors(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="window"), session)
+        for i in range(5):
+            asyncio.run(
+                main.create_conversation_message(
+                    conversation.id, main.ConversationMessageCreate(text=str(i)), session, main.get_runner()
+                )
+            )
+        full = [m.id for m in main.get_conversation(conversation.id, session).selected_path_messages]
+        assert len(full) == 10
+
+        for cached in (True, False):
+            if not cached:
+                message_path_cache.clear()
+            last = main.get_conversation(conversation.id, session, limit=4)
+            assert [m.id for m in last.selected_path_messages] == full[6:]
+            assert last.before_cursor == full[6]
+            assert last.after_cursor is None
+
+            older = main.get_conversation(conversation.id, session, limit=4, before=last.before_cursor)
+            assert [m.id for m in older.selected_path_messages] == full[2:6]
+            assert older.after_cursor == full[5]
+
+            oldest = main.get_conversation(conversation.id, session, limit=4, before=older.before_cursor)
+            assert [m.id for m in oldest.selected_path_messages] == full[:2]
+            assert oldest.before_cursor is None
+
+            newer = main.get_conversation(conversation.id, session, limit=3, after=full[1])
+            assert [m.id for m in newer.selected_path_messages] == full[2:5]
+            assert newer.after_cursor == full[4]
+
+        with pytest.raises(HTTPException) as exc_info:
+            main.get_conversation(conversation.id, session, limit=4, before="not-on-path")
+        assert exc_info.value.status_code == 400
+
+
+def test_path_siblings_report_regenerate_alternatives(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="siblings"), session)
+        created = asyncio.run(
+            main.create_conversation_message(
+                conversation.id, main.ConversationMessageCreate(text="q"), session, main.get_runner()
+            )
+        )
+        second = asyncio.run(main.regenerate_message(created.user_message_id, session, main.get_runner()))
+        third = asyncio.run(main.regenerate_message(created.user_message_id, session, main.get_runner()))
+        assert [m.id for m in list_children(session, conversation.id, created.user_message_id)] == [
+            created.assistant_message_id,
+            second.id,
+            third.id,
+        ]
+
+        siblings = main.get_path_siblings(conversation.id, session)
+        root, leaf = siblings.items
+
+        assert (root.message_id, root.sibling_count, root.ordinal) == (created.user_message_id, 1, 1)
+        assert (leaf.message_id, leaf.sibling_count, leaf.ordinal) == (third.id, 3, 3)
+        assert leaf.previous_sibling_id == second.id
+        assert leaf.next_sibling_id is None
+
+
+class ChunkedClient(StubOpenAIClient):
+    def __init__(self, chunks: list[str], fail_after: int | None = None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+
+    def stream_response(self, payload: dict):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise RuntimeError("stream interrupted")
+            yield chunk
+
+
+def test_streaming_turn_is_visible_and_coalesced(tmp_path: Path, monkeypatch) -> None:
+    main = load_main(tmp_path)
+    monkeypatch.setattr(conversation_service, "STREAM_FLUSH_CHARS", 4)
+    monkeypatch.setattr(conversation_service, "STREAM_FLUSH_SECONDS", 60.0)
+    runner = OpenAIRunner(client=ChunkedClient(["He", "llo", " wor", "ld"]))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="stream"), session)
+        created, events = stream_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+        assistant = session.get(ConversationMessage, created.assistant_message_id)
+        assert assistant.status == "streaming"
+        assert conversation.selected_leaf_message_id == assistant.id
+
+        seen = []
+        for event, data in events:
+            seen.append((event, data))
+            if len(seen) == 3:
+                assert assistant.status == "streaming"
+                assert assistant.plain_text == "Hello"
+
+        assert [data["text"] for event, data in seen if event == "delta"] == ["He", "llo", " wor", "ld"]
+        assert seen[-1][0] == "done"
+        assert assistant.status == "completed"
+        assert message_text(assistant.content_json) == "Hello world"
+        run = session.get(ConversationRun, created.run_id)
+        assert run.status == "completed"
+
+
+def test_streaming_flushes_back_off_and_respect_the_inline_limit(tmp_path: Path, monkeypatch) -> None:
+    main = load_main(tmp_path)
+    monkeypatch.setattr(conversation_service, "STREAM_FLUSH_CHARS", 2)
+    monkeypatch.setattr(conversation_service, "STREAM_FLUSH_SECONDS", 60.0)
+    monkeypatch.setattr(content_service, "INLINE_PART_LIMIT", 10)
+    runner = OpenAIRunner(client=ChunkedClient(["abcd"] * 10))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="long stream"), session)
+        created, events = stream_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+        assistant = session.get(ConversationMessage, created.assistant_message_id)
+        previews = []
+        for event, _ in events:
+            if event == "delta" and assistant.plain_text not in previews:
+                previews.append(assistant.plain_text)
+
+        assert previews == ["", "abcd", "abcdabcd", "abcdabcdab"]
+        assert assistant.plain_text is None
+        assert session.get(ConversationMessage, assistant.id).status == "completed"
+        assert main.get_conversation(conversation.id, session).selected_path_messages[-1].text == "abcd" * 10
+
+
+def test_streaming_failure_keeps_partial_text(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(client=ChunkedClient(["partial", " text"], fail_after=1))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="stream fail"), session)
+        created, events = stream_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+        assert list(events)[-1] == ("error", {"detail": "stream interrupted"})
+
+        assistant = session.get(ConversationMessage, created.assistant_message_id)
+        assert assistant.status == "failed"
+        assert assistant.plain_text == "partial"
+        assert session.get(ConversationRun, created.run_id).status == "failed"
+
+
+def test_client_disconnect_finalizes_the_stream(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(client=ChunkedClient(["partial", " text", " more"]))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="disconnect"), session)
+        created, events = stream_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+        assert next(events) == ("delta", {"text": "partial"})
+        events.close()
+
+        assistant = session.get(ConversationMessage, created.assistant_message_id)
+        run = session.get(ConversationRun, created.run_id)
+        assert assistant.status == "cancelled"
+        assert assistant.plain_text == "partial"
+        assert (run.status, run.summary) == ("cancelled", "chat cancelled by client")
+        assert run.finished_at is not None
+
+
+def test_disconnect_right_after_created_event_finalizes_the_stream(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(client=ChunkedClient(["never", " sent"]))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="early disconnect"), session)
+        response = main.stream_conversation_message(
+            conversation.id, main.ConversationMessageCreate(text="hi"), session, runner
+        )
+        first = next(response.content)
+        response.content.close()
+
+        created = json.loads(first.split("data: ", 1)[1])
+        assistant = session.get(ConversationMessage, created["assistant_message_id"])
+        run = session.get(ConversationRun, created["run_id"])
+        assert first.startswith("event: created\n")
+        assert (assistant.status, assistant.plain_text) == ("cancelled", "")
+        assert (run.status, run.summary) == ("cancelled", "chat cancelled by client")
+
+
+def test_stream_endpoint_emits_sse(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="sse"), session)
+        response = main.stream_conversation_message(
+            conversation.id, main.ConversationMessageCreate(text="ping"), session, main.get_runner()
+        )
+        body = "".join(response.content)
+
+    assert response.media_type == "text/event-stream"
+    assert body.startswith("event: created\ndata: ")
+    assert "event: delta\n" in body
+    assert body.rstrip().split("\n")[-2] == "event: done"
+
+
+class FlakyDeleteClient(StubOpenAIClient):
+    def delete_file(self, file_id: str) -> None:
+        raise RuntimeError("remote unavailable")
+
+
+def test_cleanup_failures_are_recorded_on_the_run(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(client=FlakyDeleteClient(), deletions=FileDeletionQueue(max_attempts=2, retry_delay=0))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="cleanup"), session)
+        registered = main.register_file(
+            main.FileRegisterCreate(
+                conversation_id=conversation.id,
+                filename="notes.txt",
+                storage_backend="local",
+                storage_key="conversations/notes.txt",
+                mime_type="text/plain",
+                size_bytes=10,
+            ),
+            session,
+        )
+        main.include_file(conversation.id, registered.id, session)
+        created = create_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+
+        run = session.get(ConversationRun, created.run_id)
+        for _ in range(100):
+            if run.warnings_json != "[]":
+                break
+            time.sleep(0.01)
+        assert json.loads(run.warnings_json) == [
+            "cleanup failed for stub-notes.txt after 2 attempts: remote unavailable"
+        ]
+
+
+def test_chat_and_regenerate_bypass_response_cache(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(response_cache=TieredResponseCache(directory=None))
+
+    with Session(main.engine) as session:
+        alice = main.create_conversation(main.ConversationCreate(title="alice"), session)
+        bob = main.create_conversation(main.ConversationCreate(title="bob"), session)
+        bob.owner_user_id = "bob"
+        session.add(bob)
+        session.commit()
+        created = create_message_with_assistant(
+            session, conversation_id=alice.id, text="yes", parent_message_id=None, runner=runner
+        )
+        elsewhere = asyncio.run(
+            conversation_service.acreate_message_with_assistant(
+                session, conversation_id=bob.id, text="yes", parent_message_id=None, runner=runner
+            )
+        )
+        regenerated = regenerate_message(session, created.user_message_id, runner)
+
+        runs = [
+            session.get(ConversationRun, created.run_id),
+            session.get(ConversationRun, elsewhere.run_id),
+            session.exec(select(ConversationRun).where(ConversationRun.message_id == regenerated.id)).first(),
+        ]
+        assert [(run.response_cache_hits, run.response_cache_misses) for run in runs] == [(0, 0)] * 3
+
+
+def test_queue_wait_is_recorded_on_the_run(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    scheduler = AdmissionScheduler(max_concurrency=1, tenant_rate=0)
+    runner = OpenAIRunner(admission=scheduler)
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="queue"), session)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with scheduler.admit("someone-else"):
+                pending = pool.submit(
+                    create_message_with_assistant,
+                    Session(main.engine),
+                    conversation_id=conversation.id,
+                    text="hi",
+                    parent_message_id=None,
+                    runner=runner,
+                )
+                time.sleep(0.1)
+            created = pending.result(timeout=5)
+        run = session.get(ConversationRun, created.run_id)
+
+        assert run.queue_wait_ms >= 50
+        assert run.queue_priority == PRIORITY_INTERACTIVE
+
+
+class FlakyResponseClient(StubOpenAIClient):
+    def __init__(self):
+        self.failures = 1
+
+    def create_response(self, payload: dict) -> dict:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionResetError("connection reset by upstream")
+        return super().create_response(payload)
+
+
+def test_retries_are_recorded_in_run_warnings(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    runner = OpenAIRunner(client=FlakyResponseClient(), policy=CallPolicy(retry_base=0.001))
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="retry"), session)
+        created = create_message_with_assistant(
+            session, conversation_id=conversation.id, text="hi", parent_message_id=None, runner=runner
+        )
+        run = session.get(ConversationRun, created.run_id)
+        warnings = json.loads(run.warnings_json)
+
+        assert run.status == "completed"
+        assert len(warnings) == 1
+        assert warnings[0].startswith("model call attempt 1 failed (connection reset by upstream); retrying in")
@@ -0,0 +1,89 @@
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlmodel import Field, Index, Session, SQLModel, create_engine, select
+
+
+class Event(SQLModel, table=True):
+    __table_args__ = (Index("ix_event_stream_at", "stream", "at"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    stream: str = Field(index=True)
+    at: datetime
+
+
+def run_threads(count: int, target) -> None:
+    threads = [threading.Thread(target=target, args=(number,)) for number in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_writers_get_unique_ids() -> None:
+    engine = create_engine("sqlite:///unused.db")
+    base = datetime(2026, 1, 1)
+
+    def write(number: int) -> None:
+        with Session(engine) as session:
+            for offset in range(200):
+                session.add(Event(stream=f"s{number % 2}", at=base + timedelta(seconds=offset)))
+                session.commit()
+
+    run_threads(8, write)
+
+    with Session(engine) as session:
+        events = session.exec(select(Event)).all()
+    assert len(events) == 1600
+    assert len({event.id for event in events}) == 1600
+
+
+def test_readers_see_consistent_ordered_scans_during_writes() -> None:
+    engine = create_engine("sqlite:///unused.db")
+    base = datetime(2026, 1, 1)
+    stop = threading.Event()
+    failures: list[str] = []
+
+    def write(number: int) -> None:
+        with Session(engine) as session:
+            for offset in range(500):
+                session.add(Event(stream="hot", at=base + timedelta(microseconds=offset * 8 + number)))
+                session.commit()
+
+    def read(_number: int) -> None:
+        with Session(engine) as session:
+            while not stop.is_set():
+                rows = session.exec(select(Event).where(Event.stream == "hot").order_by(Event.at.asc())).all()
+                keys = [(row.at, row.id) for row in rows]
+                if keys != sorted(set(keys)):
+                    failures.append("scan returned rows out of order or twice")
+
+    readers = [threading.Thread(target=read, args=(number,)) for number in range(2)]
+    for reader in readers:
+        reader.start()
+    run_threads(4, write)
+    stop.set()
+    for reader in readers:
+        reader.join()
+
+    assert failures == []
+
+
+def test_sqlite_readers_use_their_own_connections(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'concurrent.db'}", backend="sqlite")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Event(stream="a", at=datetime(2026, 1, 1)))
+        session.commit()
+
+    counts: list[int] = []
+
+    def read(_number: int) -> None:
+        with Session(engine) as session:
+            counts.append(len(session.exec(select(Event).where(Event.stream == "a")).all()))
+
+    run_threads(4, read)
+    engine.close()
+
+    assert counts == [1, 1, 1, 1]
@@ -1,7 +1,9 @@
+import asyncio
 import importlib
 import json
 import os
 import sys
+import threading
 from pathlib import Path
 
 import pytest
@@ -31,7 +33,7 @@ class FakeRunner:
     def __init__(self):
         self.calls: list[dict] = []
 
-    def chat(self, *, prompt: str, files: list[dict]) -> OpenAIResult:
+    def chat(self, *, prompt: str, files: list[dict], **_options) -> OpenAIResult:
         self.calls.append({"prompt": prompt, "files": files})
         return OpenAIResult(text="summary body", warnings=["cleanup failed for tmp: boom"])
 
@@ -52,7 +54,7 @@ def test_summarize_file_requires_included_binding(tmp_path: Path) -> None:
         )
 
         with pytest.raises(HTTPException) as exc_info:
-            main.summarize_file(conversation.id, file_record.id, session)
+            asyncio.run(main.summarize_file(conversation.id, file_record.id, session, main.get_runner()))
 
         assert exc_info.value.status_code == 400
 
@@ -88,3 +90,131 @@ def test_summarize_file_persists_runner_warnings(tmp_path: Path) -> None:
         assert len(runner.calls) == 1
         assert runner.calls[0]["files"][0]["filename"] == "spec.md"
         assert json.loads(runs[0].warnings_json) == ["cleanup failed for tmp: boom"]
+
+
+def register_included(main, session, conversation_id: str, **fields):
+    file_record = main.register_file(
+        main.FileRegisterCreate(
+            conversation_id=conversation_id,
+            filename="spec.md",
+            storage_backend="local",
+            storage_key="shared/spec.md",
+            mime_type="text/markdown",
+            **fields,
+        ),
+        session,
+    )
+    main.include_file(conversation_id, file_record.id, session)
+    return file_record
+
+
+def test_summarize_file_reuses_existing_summary_unless_forced(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    from app.services.file_service import summarize_file
+
+    runner = FakeRunner()
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="reuse"), session)
+        file_record = register_included(main, session, conversation.id)
+
+        first = summarize_file(session, conversation.id, file_record.id, runner)
+        second = summarize_file(session, conversation.id, file_record.id, runner)
+        forced = summarize_file(session, conversation.id, file_record.id, runner, force=True)
+
+        assert second.id == first.id
+        assert forced.id != first.id
+        assert len(runner.calls) == 2
+
+
+def test_summary_is_shared_across_conversations_by_content_hash(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    from app.services.file_service import summarize_file
+
+    runner = FakeRunner()
+
+    with Session(main.engine) as session:
+        first_conversation = main.create_conversation(main.ConversationCreate(title="one"), session)
+        second_conversation = main.create_conversation(main.ConversationCreate(title="two"), session)
+        original = register_included(main, session, first_conversation.id, content_sha256="abc")
+        same_bytes = register_included(main, session, second_conversation.id, content_sha256="abc")
+        changed = register_included(main, session, second_conversation.id, content_sha256="def")
+
+        summarize_file(session, first_conversation.id, original.id, runner)
+        copied = summarize_file(session, second_conversation.id, same_bytes.id, runner)
+        assert len(runner.calls) == 1
+        assert copied.conversation_id == second_conversation.id
+        assert copied.content == "summary body"
+
+        summarize_file(session, second_conversation.id, changed.id, runner)
+        assert len(runner.calls) == 2
+
+
+def test_precomputed_summary_is_served_without_a_model_call(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    from app.services.file_service import schedule_summary_precompute
+
+    runner = FakeRunner()
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="precompute"), session)
+        file_record = register_included(main, session, conversation.id)
+
+        precomputed = schedule_summary_precompute(main.engine, file_record.id, runner).result(timeout=5)
+        summary = asyncio.run(main.summarize_file(conversation.id, file_record.id, session, main.get_runner()))
+
+        assert summary.id == precomputed.id
+        assert len(runner.calls) == 1
+
+
+class BlockingRunner(FakeRunner):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def chat(self, *, prompt: str, files: list[dict], **options) -> OpenAIResult:
+        self.release.wait(5)
+        return super().chat(prompt=prompt, files=files, **options)
+
+
+def test_summarize_stops_waiting_for_a_stuck_precompute(tmp_path: Path, monkeypatch) -> None:
+    main = load_main(tmp_path)
+    from app.services import file_service
+
+    monkeypatch.setattr(file_service, "FILE_SUMMARY_PRECOMPUTE_WAIT_SECONDS", 0.05)
+    stuck = BlockingRunner()
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="stuck"), session)
+        file_record = register_included(main, session, conversation.id)
+        future = file_service.schedule_summary_precompute(main.engine, file_record.id, stuck)
+
+        runner = FakeRunner()
+        summary = file_service.summarize_file(session, conversation.id, file_record.id, runner)
+        assert summary.content == "summary body"
+        assert len(runner.calls) == 1
+        assert not future.done()
+        stuck.release.set()
+        future.result(timeout=5)
+
+
+class FailingRunner(FakeRunner):
+    def chat(self, *, prompt: str, files: list[dict], **_options) -> OpenAIResult:
+        raise RuntimeError("upstream unavailable")
+
+
+def test_precompute_failure_is_recorded_on_a_run(tmp_path: Path) -> None:
+    main = load_main(tmp_path)
+    from app.services.file_service import schedule_summary_precompute
+
+    with Session(main.engine) as session:
+        conversation = main.create_conversation(main.ConversationCreate(title="failing"), session)
+        file_record = register_included(main, session, conversation.id)
+
+        with pytest.raises(RuntimeError):
+            schedule_summary_precompute(main.engine, file_record.id, FailingRunner()).result(timeout=5)
+
+        right = main.get_conversation_right_panel(conversation.id, session, main.get_runner())
+        [run] = right.results["latest_runs"]
+        assert run["status"] == "failed"
+        assert run["error_text"] == "upstream unavailable"
@@ -0,0 +1,233 @@
+import asyncio
+import http.client
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services import openai_runner
+from app.services.openai_http import HTTPConnectionPool, HTTPOpenAIClient, OpenAIHTTPError
+from app.services.openai_runner import OpenAIRunner, ThreadedAsyncClient, build_runner, close_runner, get_runner
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *_args) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Drop the socket without announcing it, like an upstream closing an idle keep-alive connection.
+        self.close_connection = self.server.drop_after_reply
+
+    def _record(self) -> bytes:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.requests.append(
+            {"method": self.command, "path": self.path, "auth": self.headers.get("Authorization"), "body": body}
+        )
+        return body
+
+    def do_POST(self) -> None:
+        body = self._record()
+        if self.path == "/v1/files":
+            self._reply(200, json.dumps({"id": f"file-{len(self.server.requests)}"}).encode())
+            return
+        payload = json.loads(body)
+        if self.server.fail_with:
+            self._reply(self.server.fail_with, b'{"error": "busy"}')
+            return
+        text = f"echo: {payload['input']}"
+        if payload.get("stream"):
+            events = [
+                {"type": "response.output_text.delta", "delta": word} for word in ("echo:", " ", payload["input"])
+            ]
+            events.append({"type": "response.completed"})
+            stream = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            self._reply(200, stream.encode(), "text/event-stream")
+            return
+        output = [{"type": "message", "content": [{"type": "output_text", "text": text}]}]
+        self._reply(200, json.dumps({"id": "resp-1", "output": output}).encode())
+
+    def do_DELETE(self) -> None:
+        self._record()
+        self._reply(200, json.dumps({"deleted": True}).encode())
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.requests = []
+    server.drop_after_reply = False
+    server.fail_with = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_runner_reuses_one_keep_alive_connection(stand_in) -> None:
+    pool = HTTPConnectionPool(base_url(stand_in), max_connections=1)
+    runner = OpenAIRunner(HTTPOpenAIClient(pool, api_key="sk-test"))
+    files = [{"filename": "spec.md", "content": b"# spec", "content_type": "text/markdown"}]
+
+    results = [runner.chat(prompt=f"q{index}", files=files) for index in range(3)]
+    for result in results:
+        assert result.cleanup.wait(timeout=5)
+    runner.close()
+
+    assert [result.text for result in results] == ["echo: q0", "echo: q1", "echo: q2"]
+    assert pool.connections_opened == 1
+    assert {request["auth"] for request in stand_in.requests} == {"Bearer sk-test"}
+    assert [request["method"] for request in stand_in.requests].count("DELETE") == 3
+
+
+def test_pool_replaces_connections_closed_by_the_server(stand_in) -> None:
+    stand_in.drop_after_reply = True
+    pool = HTTPConnectionPool(base_url(stand_in))
+    client = HTTPOpenAIClient(pool)
+
+    assert client.create_response({"input": "one"})["output_text"] == "echo: one"
+    time.sleep(0.05)
+    assert client.create_response({"input": "two"})["output_text"] == "echo: two"
+    assert pool.connections_opened == 2
+    assert len(stand_in.requests) == 2
+
+
+def test_pool_reuses_connections_with_descriptors_above_1024(stand_in) -> None:
+    padding = [open(os.devnull) for _ in range(1100)]
+    try:
+        pool = HTTPConnectionPool(base_url(stand_in), max_connections=1)
+        client = HTTPOpenAIClient(pool)
+        for index in range(3):
+            assert client.create_response({"input": str(index)})["output_text"] == f"echo: {index}"
+        assert pool.connections_opened == 1
+    finally:
+        for handle in padding:
+            handle.close()
+
+
+def test_checkout_failure_releases_the_slot(stand_in, monkeypatch) -> None:
+    pool = HTTPConnectionPool(base_url(stand_in), max_connections=1)
+
+    def broken_connect():
+        raise OSError("no route")
+
+    monkeypatch.setattr(pool, "_connect", broken_connect)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            pool.request("POST", "/responses", body=b"{}")
+    monkeypatch.undo()
+    assert HTTPOpenAIClient(pool).create_response({"input": "ok"})["output_text"] == "echo: ok"
+
+
+class DroppedConnection:
+    # A pooled connection whose request went out but whose server vanished before answering.
+    sock = None
+
+    def request(self, *_args, **_kwargs) -> None:
+        pass
+
+    def getresponse(self):
+        raise http.client.RemoteDisconnected("closed")
+
+    def close(self) -> None:
+        pass
+
+
+def test_only_idempotent_requests_are_resent_after_a_dropped_connection(stand_in) -> None:
+    pool = HTTPConnectionPool(base_url(stand_in))
+    client = HTTPOpenAIClient(pool)
+
+    pool._idle.append((time.monotonic(), DroppedConnection()))
+    client.delete_file("file-1")
+    assert [request["method"] for request in stand_in.requests] == ["DELETE"]
+
+    pool._idle.append((time.monotonic(), DroppedConnection()))
+    with pytest.raises(http.client.RemoteDisconnected):
+        client.create_response({"input": "once"})
+    assert len(stand_in.requests) == 1
+
+
+def test_upload_filename_cannot_break_the_multipart_body(stand_in) -> None:
+    client = HTTPOpenAIClient(HTTPConnectionPool(base_url(stand_in)))
+
+    client.upload_file(filename='仕様"\r\nX-Injected: 1.md', content=b"body", content_type="text/markdown")
+
+    body = stand_in.requests[0]["body"]
+    assert b"\r\nX-Injected" not in body
+    assert b'filename="_____X-Injected: 1.md"' in body
+    assert b"filename*=UTF-8''%E4%BB%95%E6%A7%98%22%0D%0AX-Injected%3A%201.md" in body
+    assert b"Content-Type: text/markdown\r\n" in body
+
+    client.upload_file(filename="a.md", content=b"body", content_type="text/plain\r\nX-Injected: 1")
+    body = stand_in.requests[1]["body"]
+    assert b"X-Injected" not in body
+    assert b"Content-Type: application/octet-stream\r\n" in body
+
+
+def test_stream_and_errors_go_through_the_pool(stand_in) -> None:
+    pool = HTTPConnectionPool(base_url(stand_in), max_connections=1)
+    runner = OpenAIRunner(HTTPOpenAIClient(pool))
+
+    stream = runner.chat_stream(prompt="ping", files=[])
+    assert list(stream) == ["echo:", " ", "ping"]
+    assert stream.text == "echo: ping"
+
+    stand_in.fail_with = 503
+    with pytest.raises(OpenAIHTTPError) as exc_info:
+        runner.client.create_response({"input": "again"})
+    assert exc_info.value.status == 503
+    assert pool.connections_opened == 1
+
+
+def test_async_adapter_runs_on_an_executor_sized_to_the_pool(stand_in) -> None:
+    pool = HTTPConnectionPool(base_url(stand_in), max_connections=2)
+    client = HTTPOpenAIClient(pool)
+    threads: set[str] = set()
+    blocking_create = client.create_response
+
+    def create_response(payload: dict) -> dict:
+        threads.add(threading.current_thread().name)
+        time.sleep(0.02)
+        return blocking_create(payload)
+
+    client.create_response = create_response
+    adapter = ThreadedAsyncClient(client)
+
+    async def run_all() -> list[dict]:
+        return await asyncio.gather(*(adapter.create_response({"input": str(i)}) for i in range(6)))
+
+    results = asyncio.run(run_all())
+    adapter.close()
+
+    assert adapter.workers == 2
+    assert [result["output_text"] for result in results] == [f"echo: {i}" for i in range(6)]
+    assert len(threads) <= 2 and all(name.startswith("model-client") for name in threads)
+    assert pool.connections_opened <= 2
+
+
+def test_get_runner_is_process_wide(stand_in, monkeypatch) -> None:
+    monkeypatch.setattr(openai_runner, "build_runner", lambda: build_runner(base_url(stand_in), "sk-test"))
+    close_runner()
+    try:
+        runner = get_runner()
+        assert get_runner() is runner
+        assert isinstance(runner.client, HTTPOpenAIClient)
+        assert runner.upload_cache is openai_runner.upload_cache
+        close_runner()
+        assert get_runner() is not runner
+    finally:
+        close_runner()
@@ -1,8 +1,27 @@
+import asyncio
 import json
+import threading
+import time
 
-from app.services.content_service import message_text, serialize_message_text
-from app.services.conversation_service import build_message_path
-from app.services.openai_runner import OpenAIRunner
+import pytest
+
+from app.models import ConversationMessage
+from app.schemas import ContentPart
+from app.services import content_service, openai_runner
+from app.services.admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, AdmissionScheduler
+from app.services.call_policy import CallPolicy, CircuitBreaker
+from app.services.content_service import message_text, serialize_message_text, stored_message_text
+from app.services.conversation_service import MessagePathCache, build_message_path
+from app.services.openai_http import OpenAIHTTPError
+from app.services.openai_runner import (
+    FileDeletionQueue,
+    OpenAIRunner,
+    TieredResponseCache,
+    UploadCache,
+    close_runner,
+    get_runner,
+)
+from fastapi import HTTPException
 
 
 class DummyMessage:
@@ -46,7 +65,8 @@ def test_content_json_serialization_is_safe() -> None:
 
 def test_openai_runner_cleanup_warning_lifecycle() -> None:
     client = FakeClient()
-    runner = OpenAIRunner(client=client, model_name="test-model")
+    deletions = FileDeletionQueue(max_attempts=2, retry_delay=0)
+    runner = OpenAIRunner(client=client, model_name="test-model", deletions=deletions)
     result = runner.chat(
         prompt="hello",
         files=[
@@ -55,5 +75,477 @@ def test_openai_runner_cleanup_warning_lifecycle() -> None:
         ],
     )
     assert result.text == "ok"
-    assert any("cleanup failed" in warning for warning in result.warnings)
-    assert client.deleted == ["file-ok.txt", "file-fail.txt"]
+    assert result.cleanup.wait(timeout=5)
+    assert result.cleanup.warnings == ["cleanup failed for file-fail.txt after 2 attempts: cannot delete"]
+    assert client.deleted == ["file-ok.txt", "file-fail.txt", "file-fail.txt"]
+
+    late: list[str] = []
+    result.cleanup.subscribe(late.append)
+    assert late == result.cleanup.warnings
+
+
+def test_message_path_cache_extends_and_evicts() -> None:
+    cache = MessagePathCache(max_entries=2)
+    cache.extend(None, "a")
+    cache.extend("a", "b")
+    cache.extend("missing", "x")
+    assert cache.get("b") == ("a", "b")
+    assert cache.get("x") is None
+
+    cache.extend("b", "c")
+    assert cache.get("a") is None
+    assert cache.get("c") == ("a", "b", "c")
+
+
+def test_stored_message_text_prefers_denormalized_column() -> None:
+    message = ConversationMessage(conversation_id="c", role="user", content_json="not json", plain_text="cached")
+    assert stored_message_text(message) == "cached"
+
+    legacy = ConversationMessage(conversation_id="c", role="user", content_json=serialize_message_text("legacy"))
+    assert stored_message_text(legacy) == "legacy"
+
+    for malformed in ('{"parts": null}', '{"parts": ["x"]}', '["x"]', '{"parts": [{"text": 1}]}'):
+        row = ConversationMessage(conversation_id="c", role="user", content_json=malformed)
+        assert stored_message_text(row) == malformed
+
+
+def test_large_parts_are_stored_out_of_line(monkeypatch) -> None:
+    monkeypatch.setattr(content_service, "INLINE_PART_LIMIT", 8)
+    parts = [
+        ContentPart(type="text", text="short"),
+        ContentPart(type="image", data="aGVsbG8gd29ybGQ=", mime_type="image/png"),
+        ContentPart(type="text", text="long enough to move"),
+    ]
+    content_json, rows = content_service.serialize_message_parts("m1", parts)
+
+    stored = json.loads(content_json)["parts"]
+    assert stored[0] == {"type": "text", "text": "short"}
+    assert stored[1] == {"type": "image", "ref": rows[0].id, "size": 16}
+    assert stored[2] == {"type": "text", "ref": rows[1].id, "size": 19}
+
+    by_id = {row.id: row.text for row in rows}
+    assert message_text(content_json) == "short"
+    assert message_text(content_json, by_id.__getitem__) == "short\nlong enough to move"
+
+
+class AsyncFakeClient:
+    def __init__(self):
+        self.deleted: list[str] = []
+
+    async def create_response(self, payload: dict) -> dict:
+        await asyncio.sleep(0)
+        return {"output_text": f"async {payload['input']}"}
+
+    async def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        return f"file-{filename}"
+
+    async def delete_file(self, file_id: str) -> None:
+        self.deleted.append(file_id)
+        if "fail" in file_id:
+            raise RuntimeError("cannot delete")
+
+
+def test_async_runner_matches_sync_lifecycle() -> None:
+    client = AsyncFakeClient()
+    runner = OpenAIRunner(
+        async_client=client, model_name="test-model", deletions=FileDeletionQueue(max_attempts=1, retry_delay=0)
+    )
+
+    async def chat_and_drain():
+        result = await runner.achat(
+            prompt="hello",
+            files=[
+                {"filename": "ok.txt", "content": b"ok", "content_type": "text/plain"},
+                {"filename": "fail.txt", "content": b"bad", "content_type": "text/plain"},
+            ],
+        )
+        await asyncio.to_thread(result.cleanup.wait, 5)
+        return result
+
+    result = asyncio.run(chat_and_drain())
+    assert result.text == "async hello"
+    assert any("cleanup failed" in warning for warning in result.cleanup.warnings)
+    assert sorted(client.deleted) == ["file-fail.txt", "file-ok.txt"]
+
+
+class SlowUploadClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        if filename.startswith("bad"):
+            raise RuntimeError("upload rejected")
+        return f"file-{filename}"
+
+
+def test_uploads_fan_out_with_a_bound_and_clean_up_on_failure() -> None:
+    client = SlowUploadClient()
+    runner = OpenAIRunner(client=client, upload_concurrency=3, deletions=FileDeletionQueue(retry_delay=0))
+    files = [{"filename": f"{i}.txt", "content": b"x", "content_type": "text/plain"} for i in range(6)]
+
+    result = runner.chat(prompt="hello", files=files)
+    assert result.cleanup.wait(timeout=5)
+    assert client.peak == 3
+    assert sorted(client.deleted) == sorted(f"file-{i}.txt" for i in range(6))
+
+    client.deleted.clear()
+    with pytest.raises(RuntimeError):
+        runner.chat(prompt="hello", files=[*files[:2], {"filename": "bad.txt", "content": b"", "content_type": None}])
+    time.sleep(0.2)
+    assert sorted(client.deleted) == ["file-0.txt", "file-1.txt"]
+
+
+def test_async_runner_wraps_blocking_client() -> None:
+    client = FakeClient()
+    result = asyncio.run(OpenAIRunner(client=client).achat(prompt="hello", files=[]))
+    assert result.text == "ok"
+
+
+class CountingClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self.uploads = 0
+
+    def upload_file(self, *, filename: str, content: bytes, content_type: str | None) -> str:
+        self.uploads += 1
+        return f"file-{filename}-{self.uploads}"
+
+
+def test_upload_cache_reuses_remote_files_until_idle_ttl() -> None:
+    client = CountingClient()
+    deletions = FileDeletionQueue(retry_delay=0)
+    cache = UploadCache(ttl=60, max_entries=10, deletions=deletions)
+    runner = OpenAIRunner(client=client, upload_cache=cache, deletions=deletions)
+    spec = {"filename": "spec.pdf", "content": b"%PDF", "content_type": "application/pdf"}
+
+    runner.chat(prompt="one", files=[spec])
+    runner.chat(prompt="two", files=[spec])
+    assert client.uploads == 1
+    assert client.deleted == []
+
+    runner.chat(prompt="three", files=[{**spec, "content": b"%PDF v2"}])
+    assert client.uploads == 2
+
+    cache.ttl = 0
+    cache.sweep()
+    for _ in range(100):
+        if len(client.deleted) == 2:
+            break
+        time.sleep(0.01)
+    assert sorted(client.deleted) == ["file-spec.pdf-1", "file-spec.pdf-2"]
+
+
+def test_upload_cache_expires_idle_uploads_without_another_release() -> None:
+    client = CountingClient()
+    deletions = FileDeletionQueue(retry_delay=0)
+    runner = OpenAIRunner(
+        client=client, upload_cache=UploadCache(ttl=0.05, max_entries=10, deletions=deletions), deletions=deletions
+    )
+
+    runner.chat(prompt="once", files=[{"filename": "idle.txt", "content": b"idle", "content_type": None}])
+    assert client.deleted == []
+    for _ in range(100):
+        if client.deleted:
+            break
+        time.sleep(0.01)
+    assert client.deleted == ["file-idle.txt-1"]
+
+
+def test_close_runner_drains_cached_uploads(monkeypatch) -> None:
+    client = CountingClient()
+    deletions = FileDeletionQueue(retry_delay=0)
+    cache = UploadCache(ttl=60, max_entries=10, deletions=deletions)
+    monkeypatch.setattr(
+        openai_runner, "build_runner", lambda: OpenAIRunner(client=client, upload_cache=cache, deletions=deletions)
+    )
+    close_runner()
+
+    get_runner().chat(prompt="hi", files=[{"filename": "kept.txt", "content": b"kept", "content_type": None}])
+    assert client.deleted == []
+    close_runner()
+    assert client.deleted == ["file-kept.txt-1"]
+
+
+def test_upload_cache_evicts_least_recently_idle_beyond_capacity() -> None:
+    client = CountingClient()
+    deletions = FileDeletionQueue(retry_delay=0)
+    runner = OpenAIRunner(
+        client=client, upload_cache=UploadCache(ttl=60, max_entries=1, deletions=deletions), deletions=deletions
+    )
+
+    runner.chat(prompt="a", files=[{"filename": "a.txt", "content": b"a", "content_type": None}])
+    runner.chat(prompt="b", files=[{"filename": "b.txt", "content": b"b", "content_type": None}])
+    for _ in range(100):
+        if client.deleted:
+            break
+        time.sleep(0.01)
+    assert client.deleted == ["file-a.txt-1"]
+
+
+def test_upload_cache_shares_one_in_flight_upload() -> None:
+    client = SlowUploadClient()
+    deletions = FileDeletionQueue(retry_delay=0)
+    runner = OpenAIRunner(client=client, upload_cache=UploadCache(deletions=deletions), deletions=deletions)
+    spec = {"filename": "shared.txt", "content": b"same bytes", "content_type": None}
+    threads = [threading.Thread(target=runner.chat, kwargs={"prompt": "hi", "files": [spec]}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.calls == 1
+
+
+class CountingResponseClient(FakeClient):
+    def __init__(self):
+        super().__init__()
+        self.responses = 0
+
+    def create_response(self, payload: dict) -> dict:
+        self.responses += 1
+        return {"output_text": f"answer {self.responses}"}
+
+
+def test_response_cache_keys_on_prompt_files_and_params(tmp_path) -> None:
+    client = CountingResponseClient()
+    runner = OpenAIRunner(client=client, response_cache=TieredResponseCache(directory=str(tmp_path)))
+    spec = [{"filename": "spec.md", "content": b"v1", "content_type": None}]
+
+    first = runner.chat(prompt="summarize", files=spec)
+    second = runner.chat(prompt="summarize", files=spec)
+    assert (first.text, first.cache_misses) == ("answer 1", 1)
+    assert (second.text, second.cache_hits) == ("answer 1", 1)
+
+    assert runner.chat(prompt="summarize", files=[{**spec[0], "content": b"v2"}]).cache_misses == 1
+    assert runner.chat(prompt="summarize", files=spec, params={"temperature": 0}).cache_misses == 1
+    assert runner.chat(prompt="summarize", files=spec, use_cache=False).cache_hits == 0
+    assert client.responses == 4
+
+    restarted = OpenAIRunner(client=client, response_cache=TieredResponseCache(directory=str(tmp_path)))
+    assert restarted.chat(prompt="summarize", files=spec).text == "answer 1"
+
+
+def test_response_cache_is_scoped_to_the_tenant() -> None:
+    client = CountingResponseClient()
+    runner = OpenAIRunner(client=client, response_cache=TieredResponseCache(directory=None))
+
+    first = runner.chat(prompt="summarize", files=[], tenant="alice")
+    assert runner.chat(prompt="summarize", files=[], tenant="alice").cache_hits == 1
+    other = runner.chat(prompt="summarize", files=[], tenant="bob")
+
+    assert (first.cache_misses, other.cache_hits, other.cache_misses) == (1, 0, 1)
+    assert (first.text, other.text) == ("answer 1", "answer 2")
+
+
+def test_response_cache_expires_and_trims(tmp_path) -> None:
+    cache = TieredResponseCache(directory=str(tmp_path), ttl=60, max_entries=1, max_disk_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+    assert len(list(tmp_path.glob("*.json"))) == 2
+    assert cache.get("c") == "C"
+
+    cache.ttl = -1
+    cache.put("d", "D")
+    assert cache.get("d") is None
+
+
+def test_response_cache_tracks_disk_usage_without_rescanning(tmp_path, monkeypatch) -> None:
+    TieredResponseCache(directory=str(tmp_path), ttl=60).put("old", "x" * 100)
+    cache = TieredResponseCache(directory=str(tmp_path), ttl=60, max_disk_bytes=300)
+
+    def no_scan(_path):
+        raise AssertionError("put must not list the cache directory")
+
+    monkeypatch.setattr(openai_runner.os, "scandir", no_scan)
+    cache.put("new", "y" * 100)
+    assert list(cache._disk) == ["old", "new"]
+    cache.put("newer", "z" * 100)
+    monkeypatch.undo()
+
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["new.json", "newer.json"]
+    assert cache._disk_bytes == sum(path.stat().st_size for path in tmp_path.glob("*.json"))
+
+
+def hold_slot(scheduler: AdmissionScheduler, seconds: float) -> threading.Thread:
+    held = threading.Event()
+
+    def hold() -> None:
+        with scheduler.admit("holder"):
+            held.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    held.wait()
+    return thread
+
+
+def test_admission_serves_interactive_work_before_background_work() -> None:
+    scheduler = AdmissionScheduler(max_concurrency=1, tenant_rate=0)
+    order: list[str] = []
+
+    def call(name: str, priority: int) -> None:
+        with scheduler.admit(name, priority):
+            order.append(name)
+
+    holder = hold_slot(scheduler, 0.1)
+    background = threading.Thread(target=call, args=("summary", PRIORITY_BACKGROUND))
+    background.start()
+    while scheduler.queued < 1:
+        time.sleep(0.005)
+    interactive = threading.Thread(target=call, args=("chat", PRIORITY_INTERACTIVE))
+    interactive.start()
+    for thread in (holder, background, interactive):
+        thread.join()
+
+    assert order == ["chat", "summary"]
+
+
+def test_admission_throttles_each_tenant_separately() -> None:
+    scheduler = AdmissionScheduler(max_concurrency=4, tenant_rate=10, tenant_burst=1, timeout=0.5)
+
+    with scheduler.admit("alice") as first:
+        assert first.queued_seconds < 0.01
+    with scheduler.admit("bob") as other:
+        assert other.queued_seconds < 0.01
+    with scheduler.admit("alice") as throttled:
+        assert throttled.queued_seconds >= 0.05
+
+    slow = AdmissionScheduler(max_concurrency=4, tenant_rate=0.1, tenant_burst=1, timeout=0.05)
+    with slow.admit("alice"):
+        pass
+    with pytest.raises(HTTPException) as exc_info:
+        with slow.admit("alice"):
+            pass
+    assert exc_info.value.status_code == 429
+    assert slow.queued == 0 and slow.active == 0
+
+
+def test_runner_reports_queue_time_from_admission() -> None:
+    scheduler = AdmissionScheduler(max_concurrency=1, tenant_rate=0)
+    runner = OpenAIRunner(client=FakeClient(), admission=scheduler)
+
+    holder = hold_slot(scheduler, 0.1)
+    result = asyncio.run(runner.achat(prompt="hello", files=[], tenant="alice"))
+    holder.join()
+
+    assert result.queued_seconds >= 0.05
+    assert runner.chat(prompt="hello", files=[]).queued_seconds < 0.05
+    assert scheduler.active == 0
+
+
+class ScriptedClient(FakeClient):
+    # Each create_response pops the next step: an exception to raise or seconds to sleep before answering.
+    def __init__(self, steps: list):
+        super().__init__()
+        self.steps = list(steps)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def create_response(self, payload: dict) -> dict:
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            step = self.steps.pop(0) if self.steps else 0
+        if isinstance(step, BaseException):
+            raise step
+        time.sleep(step)
+        return {"output_text": f"answer {call}"}
+
+
+def quick_policy(**options) -> CallPolicy:
+    return CallPolicy(**{"retry_base": 0.001, "retry_max": 0.002, "attempt_timeout": 1, "deadline": 5, **options})
+
+
+def test_runner_retries_retryable_errors_and_records_them() -> None:
+    client = ScriptedClient([OpenAIHTTPError(503, "busy"), ConnectionResetError("reset")])
+    runner = OpenAIRunner(client=client, policy=quick_policy())
+
+    result = runner.chat(prompt="hello", files=[])
+
+    assert result.text == "answer 3"
+    assert len(result.warnings) == 2
+    assert result.warnings[0].startswith("model call attempt 1 failed (upstream returned 503: busy); retrying in")
+    assert result.warnings[1].startswith("model call attempt 2 failed (reset)")
+
+    rejected = OpenAIRunner(client=ScriptedClient([OpenAIHTTPError(400, "bad input")]), policy=quick_policy())
+    with pytest.raises(OpenAIHTTPError):
+        rejected.chat(prompt="hello", files=[])
+    assert rejected.client.calls == 1
+
+
+def test_attempt_timeout_and_deadline_bound_a_slow_upstream() -> None:
+    client = ScriptedClient([0.5, 0.5, 0.5])
+    runner = OpenAIRunner(client=client, policy=quick_policy(attempt_timeout=0.05, max_retries=1))
+
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        runner.chat(prompt="hello", files=[])
+    assert time.monotonic() - started < 0.4
+    assert client.calls == 2
+
+
+def test_circuit_breaker_fails_fast_until_a_probe_succeeds() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    client = ScriptedClient([OpenAIHTTPError(502, "down"), OpenAIHTTPError(502, "down")])
+    runner = OpenAIRunner(client=client, policy=quick_policy(max_retries=0, breaker=breaker))
+
+    for _ in range(2):
+        with pytest.raises(OpenAIHTTPError):
+            runner.chat(prompt="hello", files=[])
+    with pytest.raises(HTTPException) as exc_info:
+        runner.chat(prompt="hello", files=[])
+    assert exc_info.value.status_code == 503
+    assert client.calls == 2
+
+    uploads = []
+    client.upload_file = lambda **file_obj: uploads.append(file_obj["filename"]) or "file-x"
+    with pytest.raises(HTTPException):
+        runner.chat(prompt="hello", files=[{"filename": "a.txt", "content": b"a", "content_type": None}])
+    with pytest.raises(HTTPException):
+        asyncio.run(runner.achat(prompt="hello", files=[{"filename": "b.txt", "content": b"b", "content_type": None}]))
+    assert uploads == []
+
+    time.sleep(0.06)
+    assert runner.chat(prompt="hello", files=[]).text == "answer 3"
+    assert breaker.state == "closed"
+
+
+def test_hedged_request_races_a_slow_original() -> None:
+    client = ScriptedClient([0.5, 0])
+    policy = quick_policy(hedge=True, hedge_min_samples=1)
+    policy.latency.add(0.02)
+    runner = OpenAIRunner(client=client, policy=policy)
+
+    result = runner.chat(prompt="hello", files=[])
+    assert result.text == "answer 2"
+    assert result.warnings[0].startswith("hedged model request sent after")
+    assert result.warnings[1] == "hedged model request answered first"
+
+    async_client = ScriptedClient([0.5, 0])
+    async_runner = OpenAIRunner(client=async_client, policy=policy)
+    result = asyncio.run(async_runner.achat(prompt="hello", files=[]))
+    assert result.text == "answer 2"
+    assert result.warnings[-1] == "hedged model request answered first"
+
+
+def test_timed_out_attempts_do_not_pile_up_behind_a_hung_upstream() -> None:
+    client = ScriptedClient([0.3, 0.3, 0.3])
+    runner = OpenAIRunner(client=client, policy=quick_policy(attempt_timeout=0.05, max_retries=0, workers=1))
+
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            runner.chat(prompt="hello", files=[])
+    time.sleep(0.4)
+
+    assert client.calls == 1
@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from app.main import (
+    ConversationCreate,
+    ConversationMessageCreate,
+    RunComplete,
+    RunCreate,
+    WorkspaceCreate,
+    complete_run,
+    create_conversation,
+    create_conversation_message,
+    create_run,
+    create_workspace,
+    get_conversation,
+    get_runner,
+    list_workspaces,
+)
+from app.models import Artifact
+from sqlmodel import Field, Index, Session, SQLModel, create_engine, select
+
+
+class Note(SQLModel, table=True):
+    __table_args__ = (Index("ix_note_topic_rank", "topic", "rank"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    topic: str = Field(index=True)
+    rank: int
+    pinned: bool = False
+    archived_at: datetime | None = None
+
+
+def build_sqlite_engine(tmp_path: Path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'engine.db'}", backend="sqlite")
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_sqlite_engine_persists_rows_across_engines(tmp_path: Path) -> None:
+    with Session(build_sqlite_engine(tmp_path)) as session:
+        note = Note(topic="a", rank=1, pinned=True, archived_at=datetime(2026, 1, 2, 3, 4, 5))
+        session.add(note)
+        session.commit()
+        assert note.id is not None
+
+    with Session(build_sqlite_engine(tmp_path)) as session:
+        loaded = session.get(Note, note.id)
+
+    assert loaded is not None
+    assert loaded.pinned is True
+    assert loaded.archived_at == datetime(2026, 1, 2, 3, 4, 5)
+
+
+def test_sqlite_engine_pushes_down_filters_order_limit_and_seek(tmp_path: Path) -> None:
+    engine = build_sqlite_engine(tmp_path)
+    with Session(engine) as session:
+        for rank in (3, 1, 2, 5, 4):
+            session.add(Note(topic="a", rank=rank))
+        session.add(Note(topic="b", rank=9))
+        session.commit()
+
+        base = select(Note).where(Note.topic == "a", Note.rank < 5)
+        top = session.exec(base.order_by(Note.rank.desc()).limit(2)).all()
+        after = session.exec(
+            select(Note).where(Note.topic == "a").order_by(Note.rank.asc()).after(top[0].rank, top[0].id)
+        ).all()
+
+        assert [note.rank for note in top] == [4, 3]
+        assert [note.rank for note in after] == [5]
+
+    index_names = {row[0] for row in engine.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ix_note_topic", "ix_note_topic_rank"} <= index_names
+
+
+def test_sqlite_engine_updates_rows_in_place(tmp_path: Path) -> None:
+    with Session(build_sqlite_engine(tmp_path)) as session:
+        note = Note(topic="a", rank=1)
+        session.add(note)
+        session.commit()
+
+        note.rank = 2
+        session.add(note)
+        session.commit()
+
+        rows = session.exec(select(Note)).all()
+
+    assert [(row.id, row.rank) for row in rows] == [(note.id, 2)]
+
+
+def test_services_run_unchanged_on_sqlite_engine(tmp_path: Path) -> None:
+    with Session(build_sqlite_engine(tmp_path)) as session:
+        conversation = create_conversation(ConversationCreate(title="durable"), session)
+        created = asyncio.run(
+            create_conversation_message(conversation.id, ConversationMessageCreate(text="hello"), session, get_runner())
+        )
+        detail = get_conversation(conversation.id, session)
+
+        workspace = create_workspace(WorkspaceCreate(name="demo"), session)
+        run = create_run(
+            workspace.id, RunCreate(skill="ppt_revise", prompt="v", input_artifact_ids=[], params={}), session
+        )
+        complete_run(run.id, RunComplete(output_filename="deck.pptx", artifact_type="pptx"), session)
+        complete_run(run.id, RunComplete(output_filename="deck.pptx", artifact_type="pptx"), session)
+        versions = session.exec(select(Artifact).where(Artifact.workspace_id == workspace.id)).all()
+
+        assert detail.selected_leaf_message_id == created.assistant_message_id
+        assert [message.role for message in detail.selected_path_messages] == ["user", "assistant"]
+        assert [workspace.name for workspace in list_workspaces(session).items] == ["demo"]
+        assert sorted(artifact.version_no for artifact in versions) == [1, 2]
+
+
+def test_sqlite_engine_adds_columns_missing_from_older_tables(tmp_path: Path) -> None:
+    path = tmp_path / "engine.db"
+    legacy = sqlite3.connect(path)
+    legacy.execute('CREATE TABLE "note" ("id" INTEGER PRIMARY KEY, "topic" TEXT, "rank" INTEGER)')
+    legacy.execute("INSERT INTO note (id, topic, rank) VALUES (1, 'old', 3)")
+    legacy.commit()
+    legacy.close()
+
+    engine = create_engine(f"sqlite:///{path}", backend="sqlite")
+    with pytest.raises(sqlite3.OperationalError):
+        engine.get(Note, 1)
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        note = session.get(Note, 1)
+        assert (note.topic, note.rank, note.pinned, note.archived_at) == ("old", 3, False, None)
+        note.pinned = True
+        session.add(note)
+        session.commit()
+        assert session.exec(select(Note)).all()[0].pinned is True
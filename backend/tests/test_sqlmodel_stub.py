@@ -1,4 +1,4 @@
-from sqlmodel import Field, Session, SQLModel, create_engine, select
+from sqlmodel import Field, Index, Session, SQLModel, create_engine, select
 
 
 class Item(SQLModel, table=True):
@@ -31,3 +31,231 @@ def test_where_accepts_multiple_conditions() -> None:
 
         rows = session.exec(select(Item).where(Item.value >= 4, Item.value != 4)).all()
         assert [row.value for row in rows] == [5]
+
+
+class Document(SQLModel, table=True):
+    key: str = Field(default_factory=lambda: "doc", primary_key=True)
+    title: str
+
+
+def test_get_uses_primary_key_for_int_and_str_ids() -> None:
+    engine = create_engine("sqlite:///test3.db")
+    with Session(engine) as session:
+        first = Item(value=10)
+        second = Item(value=20)
+        document = Document(key="spec", title="Spec")
+        session.add(first)
+        session.add(second)
+        session.add(document)
+        session.commit()
+
+        assert session.get(Item, second.id) is second
+        assert session.get(Item, 999) is None
+        assert session.get(Document, "spec") is document
+
+
+def test_recommitting_existing_row_does_not_duplicate_it() -> None:
+    engine = create_engine("sqlite:///test4.db")
+    with Session(engine) as session:
+        item = Item(value=1)
+        session.add(item)
+        session.commit()
+
+        item.value = 2
+        session.add(item)
+        session.commit()
+
+        rows = session.exec(select(Item)).all()
+        assert [row.value for row in rows] == [2]
+
+
+class Entry(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    group: str = Field(index=True)
+    kind: str = Field(index=True)
+    value: int = 0
+
+
+def test_indexed_equality_uses_smallest_bucket_and_filters_the_rest() -> None:
+    engine = create_engine("sqlite:///test5.db")
+    with Session(engine) as session:
+        for value in range(5):
+            session.add(Entry(group="big", kind="common", value=value))
+        session.add(Entry(group="small", kind="common", value=10))
+        session.commit()
+
+        rows = session.exec(
+            select(Entry).where(Entry.kind == "common", Entry.group == "small", Entry.value >= 10)
+        ).all()
+        assert [row.value for row in rows] == [10]
+        assert len(engine.indexes[Entry]["group"].lookup("small")) == 1
+
+
+def test_secondary_index_follows_committed_updates() -> None:
+    engine = create_engine("sqlite:///test6.db")
+    with Session(engine) as session:
+        entry = Entry(group="before", kind="k")
+        session.add(entry)
+        session.commit()
+
+        entry.group = "after"
+        session.add(entry)
+        session.commit()
+
+        assert session.exec(select(Entry).where(Entry.group == "before")).all() == []
+        assert session.exec(select(Entry).where(Entry.group == "after")).all() == [entry]
+        assert "before" not in engine.indexes[Entry]["group"].buckets
+
+
+class Version(SQLModel, table=True):
+    __table_args__ = (Index("ix_version_chain", "owner", "group", "number"),)
+
+    id: int | None = Field(default=None, primary_key=True)
+    owner: int
+    group: str
+    number: int
+
+
+def test_composite_index_serves_range_and_order_queries() -> None:
+    engine = create_engine("sqlite:///test7.db")
+    with Session(engine) as session:
+        for number in (3, 1, 4, 2):
+            session.add(Version(owner=1, group="deck", number=number))
+        session.add(Version(owner=2, group="deck", number=9))
+        session.commit()
+
+        base = select(Version).where(Version.owner == 1, Version.group == "deck")
+        latest = session.exec(base.order_by(Version.number.desc())).first()
+        previous = session.exec(
+            select(Version)
+            .where(Version.owner == 1, Version.group == "deck", Version.number < 3)
+            .order_by(Version.number.desc())
+        ).first()
+        following = session.exec(
+            select(Version)
+            .where(Version.owner == 1, Version.group == "deck", Version.number > 3)
+            .order_by(Version.number.asc())
+        ).first()
+        inclusive = session.exec(
+            select(Version).where(Version.owner == 1, Version.group == "deck", Version.number >= 2, Version.number <= 3)
+        ).all()
+
+        assert latest is not None and latest.number == 4
+        assert previous is not None and previous.number == 2
+        assert following is not None and following.number == 4
+        assert [row.number for row in inclusive] == [2, 3]
+        assert [key[0][1] for key in engine.ordered_indexes[Version][0].groups[(1, "deck")].keys] == [1, 2, 3, 4]
+
+
+def test_unhashable_equality_value_falls_back_to_a_scan() -> None:
+    engine = create_engine("sqlite:///test9.db")
+    with Session(engine) as session:
+        session.add(Version(owner=1, group="deck", number=1))
+        session.commit()
+
+        rows = session.exec(select(Version).where(Version.owner == [1], Version.group == "deck")).all()
+        assert rows == []
+
+
+def test_composite_index_follows_committed_updates() -> None:
+    engine = create_engine("sqlite:///test8.db")
+    with Session(engine) as session:
+        moved = Version(owner=1, group="a", number=1)
+        session.add(moved)
+        session.add(Version(owner=1, group="b", number=5))
+        session.commit()
+
+        moved.group = "b"
+        moved.number = 7
+        session.add(moved)
+        session.commit()
+
+        rows = session.exec(
+            select(Version).where(Version.owner == 1, Version.group == "b").order_by(Version.number.desc())
+        ).all()
+        assert [row.number for row in rows] == [7, 5]
+        assert (1, "a") not in engine.ordered_indexes[Version][0].groups
+
+
+def test_limit_and_offset_with_top_k_ordering() -> None:
+    engine = create_engine("sqlite:///test9.db")
+    with Session(engine) as session:
+        for value in (5, 1, 4, 2, 3):
+            session.add(Item(value=value))
+        session.commit()
+
+        top = session.exec(select(Item).order_by(Item.value.desc()).limit(2)).all()
+        page = session.exec(select(Item).order_by(Item.value.asc()).offset(1).limit(2)).all()
+        unordered = session.exec(select(Item).where(Item.value > 1).limit(2)).all()
+
+        assert [row.value for row in top] == [5, 4]
+        assert [row.value for row in page] == [2, 3]
+        assert [row.value for row in unordered] == [5, 4]
+
+
+def test_limit_on_composite_index_walks_only_requested_rows() -> None:
+    engine = create_engine("sqlite:///test10.db")
+    with Session(engine) as session:
+        for number in range(1, 6):
+            session.add(Version(owner=1, group="deck", number=number))
+        session.commit()
+
+        rows = session.exec(
+            select(Version)
+            .where(Version.owner == 1, Version.group == "deck")
+            .order_by(Version.number.desc())
+            .offset(1)
+            .limit(2)
+        ).all()
+
+        assert [row.number for row in rows] == [4, 3]
+
+
+def test_after_seeks_past_cursor_with_primary_key_tie_break() -> None:
+    engine = create_engine("sqlite:///test11.db")
+    with Session(engine) as session:
+        rows = [Version(owner=1, group="deck", number=number) for number in (1, 2, 2, 3)]
+        items = [Item(value=value) for value in (3, 1, 2)]
+        for row in [*rows, *items]:
+            session.add(row)
+        session.commit()
+
+        base = select(Version).where(Version.owner == 1, Version.group == "deck")
+        indexed = session.exec(base.order_by(Version.number.asc()).after(2, rows[1].id)).all()
+        scanned = session.exec(select(Item).order_by(Item.value.desc()).after(3, items[0].id)).all()
+
+        assert [row.id for row in indexed] == [rows[2].id, rows[3].id]
+        assert [row.value for row in scanned] == [2, 1]
+
+
+def test_rollback_discards_new_rows_and_restores_modified_ones() -> None:
+    engine = create_engine("sqlite:///test12.db")
+    with Session(engine) as session:
+        entry = Entry(group="kept", kind="k", value=1)
+        session.add(entry)
+        session.commit()
+
+        entry.group = "changed"
+        entry.value = 2
+        session.add(entry)
+        session.add(Entry(group="new", kind="k"))
+        session.rollback()
+        session.commit()
+
+        assert (entry.group, entry.value) == ("kept", 1)
+        assert session.exec(select(Entry)).all() == [entry]
+
+
+def test_begin_commits_on_success_and_rolls_back_on_error() -> None:
+    engine = create_engine("sqlite:///test13.db")
+    with Session(engine) as session:
+        with session.begin():
+            session.add(Item(value=1))
+        try:
+            with session.begin():
+                session.add(Item(value=2))
+                raise RuntimeError("boom")
+        except RuntimeError:
+            pass
+
+        assert [row.value for row in session.exec(select(Item)).all()] == [1]
@@ -0,0 +1,162 @@
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from sqlmodel import Field, Session, SQLModel, create_engine, select
+
+
+class Ledger(SQLModel, table=True):
+    id: int | None = Field(default=None, primary_key=True)
+    account: str = Field(index=True)
+    amount: int
+    booked_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+def open_engine(wal_path: Path, snapshot_every: int = 10_000):
+    engine = create_engine("sqlite:///unused.db", wal_path=str(wal_path))
+    engine.wal.snapshot_every = snapshot_every
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def test_committed_rows_survive_restart(tmp_path: Path) -> None:
+    wal_path = tmp_path / "engine.wal"
+    engine = open_engine(wal_path)
+    with Session(engine) as session:
+        first = Ledger(account="a", amount=10, booked_at=datetime(2026, 1, 1, 9, 30))
+        session.add(first)
+        session.add(Ledger(account="b", amount=5))
+        session.commit()
+        first.amount = 12
+        session.add(first)
+        session.commit()
+    engine.close()
+
+    restarted = open_engine(wal_path)
+    with Session(restarted) as session:
+        rows = session.exec(select(Ledger).where(Ledger.account == "a")).all()
+        session.add(Ledger(account="c", amount=1))
+        session.commit()
+
+    assert [(row.id, row.amount, row.booked_at) for row in rows] == [(1, 12, datetime(2026, 1, 1, 9, 30))]
+    assert session.get(Ledger, 3) is not None
+    restarted.close()
+
+
+def test_snapshot_compacts_log_and_replay_ignores_torn_tail(tmp_path: Path) -> None:
+    wal_path = tmp_path / "engine.wal"
+    engine = open_engine(wal_path, snapshot_every=2)
+    with Session(engine) as session:
+        for amount in range(3):
+            session.add(Ledger(account="a", amount=amount))
+            session.commit()
+    engine.close()
+
+    assert Path(f"{wal_path}.snapshot").exists()
+    assert len(wal_path.read_text(encoding="utf-8").splitlines()) == 1
+    with wal_path.open("a", encoding="utf-8") as log_file:
+        log_file.write('{"rows": [{"table": "ledger", "val')
+
+    restarted = open_engine(wal_path)
+    with Session(restarted) as session:
+        session.add(Ledger(account="a", amount=3))
+        session.commit()
+    restarted.close()
+
+    recovered = open_engine(wal_path)
+    with Session(recovered) as session:
+        amounts = [row.amount for row in session.exec(select(Ledger).order_by(Ledger.amount.asc())).all()]
+
+    assert amounts == [0, 1, 2, 3]
+    recovered.close()
+
+
+def test_commit_skips_unchanged_objects_and_logs_only_dirty_ones(tmp_path: Path) -> None:
+    wal_path = tmp_path / "engine.wal"
+    engine = open_engine(wal_path)
+    with Session(engine) as session:
+        entry = Ledger(account="a", amount=1)
+        session.add(entry)
+        session.add(entry)
+        session.commit()
+
+        session.add(entry)
+        session.commit()
+        lines_after_noop = len(wal_path.read_text(encoding="utf-8").splitlines())
+
+        entry.amount = 2
+        session.add(entry)
+        session.commit()
+        lines_after_update = len(wal_path.read_text(encoding="utf-8").splitlines())
+
+        entry.account = "b"
+        session.add(entry)
+        session.commit()
+        moved = session.exec(select(Ledger).where(Ledger.account == "b")).all()
+
+    assert lines_after_noop == 1
+    assert lines_after_update == 2
+    assert moved == [entry]
+    engine.close()
+
+
+def test_snapshot_is_written_off_the_commit_path_and_survives_a_crash(tmp_path: Path, monkeypatch) -> None:
+    wal_path = tmp_path / "engine.wal"
+    engine = open_engine(wal_path, snapshot_every=2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def stalled_snapshot(images: list[dict]) -> None:
+        # Simulates a slow disk, then a crash before the snapshot file is replaced.
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(engine.wal, "write_snapshot", stalled_snapshot)
+    with Session(engine) as session:
+        for amount in range(2):
+            session.add(Ledger(account="a", amount=amount))
+            session.commit()
+        assert started.wait(5)
+        for amount in range(2, 5):
+            session.add(Ledger(account="a", amount=amount))
+            session.commit()
+        assert not release.is_set()
+    release.set()
+    engine.close()
+
+    assert not Path(f"{wal_path}.snapshot").exists()
+    assert Path(f"{wal_path}.rotated").exists()
+
+    restarted = open_engine(wal_path)
+    with Session(restarted) as session:
+        assert sorted(row.amount for row in session.exec(select(Ledger)).all()) == [0, 1, 2, 3, 4]
+        session.add(Ledger(account="a", amount=5))
+        session.commit()
+    restarted.snapshot()
+    restarted.close()
+
+    assert not Path(f"{wal_path}.rotated").exists()
+    recovered = open_engine(wal_path)
+    with Session(recovered) as session:
+        assert sorted(row.amount for row in session.exec(select(Ledger)).all()) == [0, 1, 2, 3, 4, 5]
+    recovered.close()
+
+
+def test_snapshot_keeps_committed_values_of_rows_being_edited(tmp_path: Path) -> None:
+    wal_path = tmp_path / "engine.wal"
+    engine = open_engine(wal_path)
+    with Session(engine) as session:
+        entry = Ledger(account="a", amount=1)
+        session.add(entry)
+        session.commit()
+
+        entry.amount = 99
+        engine.snapshot()
+        session.rollback()
+    engine.close()
+
+    assert not Path(f"{wal_path}.rotated").exists()
+    restarted = open_engine(wal_path)
+    with Session(restarted) as session:
+        assert [row.amount for row in session.exec(select(Ledger)).all()] == [1]
+    restarted.close()
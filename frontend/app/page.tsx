@@ -5,7 +5,7 @@ import { useEffect, useMemo, useState } from "react";
 import { ChatPane } from "../components/ChatPane";
 import { ConversationSidebar } from "../components/ConversationSidebar";
 import { RightPaneTab, WorkbenchTabs } from "../components/WorkbenchTabs";
-import { apiGet, apiPost, Conversation, ConversationDetail, FileItem, RightPanel } from "../lib/api";
+import { apiGet, apiPost, Conversation, ConversationDetail, FileItem, Page, RightPanel } from "../lib/api";
 
 export default function HomePage() {
   const [conversations, setConversations] = useState<Conversation[]>([]);
@@ -37,7 +37,12 @@ export default function HomePage() {
   async function loadConversations() {
     setLoading(true);
     try {
-      const list = await apiGet<Conversation[]>("/api/conversations");
+      let page = await apiGet<Page<Conversation>>("/api/conversations");
+      const list = page.items;
+      while (page.next_cursor) {
+        page = await apiGet<Page<Conversation>>(`/api/conversations?cursor=${encodeURIComponent(page.next_cursor)}`);
+        list.push(...page.items);
+      }
       setConversations(list);
       if (!selectedConversationId && list.length > 0) {
         setSelectedConversationId(list[0].id);
@@ -52,10 +57,32 @@ export default function HomePage() {
       apiGet<ConversationDetail>(`/api/conversations/${conversationId}`),
       apiGet<RightPanel>(`/api/conversations/${conversationId}/right-panel`),
     ]);
+    let cursor = panel.files_next_cursor;
+    while (cursor) {
+      const page = await apiGet<Page<FileItem>>(
+        `/api/conversations/${conversationId}/files?cursor=${encodeURIComponent(cursor)}`,
+      );
+      panel.files = [...panel.files, ...page.items];
+      cursor = page.next_cursor;
+    }
     setDetail(conversationDetail);
     setRightPanel(panel);
   }
 
+  async function loadEarlierMessages() {
+    if (!selectedConversationId || !detail?.before_cursor) {
+      return;
+    }
+    const older = await apiGet<ConversationDetail>(
+      `/api/conversations/${selectedConversationId}?before=${encodeURIComponent(detail.before_cursor)}`,
+    );
+    setDetail({
+      ...detail,
+      selected_path_messages: [...older.selected_path_messages, ...detail.selected_path_messages],
+      before_cursor: older.before_cursor,
+    });
+  }
+
   async function handleCreateConversation(event: React.FormEvent<HTMLFormElement>) {
     event.preventDefault();
     if (!newConversationTitle.trim()) {
@@ -145,6 +172,7 @@ export default function HomePage() {
         onSendMessage={handleSendMessage}
         onRegenerate={handleRegenerate}
         onBranch={handleBranch}
+        onLoadEarlier={loadEarlierMessages}
       />
       <WorkbenchTabs
         tab={tab}
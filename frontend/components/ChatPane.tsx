@@ -8,6 +8,7 @@ type Props = {
   onSendMessage: (event: React.FormEvent<HTMLFormElement>) => void;
   onRegenerate: (messageId: string) => void;
   onBranch: (messageId: string) => void;
+  onLoadEarlier: () => void;
 };
 
 export function ChatPane(props: Props) {
@@ -16,6 +17,13 @@ export function ChatPane(props: Props) {
       <h2 className="font-bold">Chat</h2>
       <p className="text-sm text-slate-600">{props.selectedConversation ? props.selectedConversation.title : "会話を選択"}</p>
       <ul className="space-y-2 text-sm max-h-[70vh] overflow-y-auto">
+        {props.detail?.before_cursor ? (
+          <li>
+            <button className="text-xs text-slate-600 w-full" onClick={props.onLoadEarlier} type="button">
+              load earlier messages
+            </button>
+          </li>
+        ) : null}
         {props.detail?.selected_path_messages.map((message) => (
           <li key={message.id} className="border rounded p-2 bg-slate-50">
             <div className="font-semibold text-xs uppercase text-slate-500">{message.role}</div>
@@ -4,12 +4,25 @@ export function createUrl(path: string): string {
   return `${apiBase}${path}`;
 }
 
+export type Page<T> = {
+  items: T[];
+  next_cursor?: string | null;
+};
+
 export type Conversation = {
   id: string;
   title: string;
   selected_leaf_message_id?: string | null;
 };
 
+export type SiblingPosition = {
+  message_id: string;
+  sibling_count: number;
+  ordinal: number;
+  previous_sibling_id?: string | null;
+  next_sibling_id?: string | null;
+};
+
 export type PathMessage = {
   id: string;
   parent_message_id?: string | null;
@@ -22,6 +35,8 @@ export type ConversationDetail = {
   title: string;
   selected_leaf_message_id?: string | null;
   selected_path_messages: PathMessage[];
+  before_cursor?: string | null;
+  after_cursor?: string | null;
 };
 
 export type FileItem = {
@@ -41,6 +56,7 @@ export type RightPanel = {
     latest_artifacts: Array<{ id: string; title: string; artifact_type: string; storage_key: string }>;
   };
   files: FileItem[];
+  files_next_cursor?: string | null;
   summaries: {
     conversation_summary?: string | null;
     branch_summary?: string | null;